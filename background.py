@@ -0,0 +1,23 @@
+import asyncio
+from typing import Coroutine, Set
+
+# The event loop only holds weak references to tasks; a task nobody keeps can
+# be garbage collected before it finishes. Fire-and-forget work lives here.
+_tasks: Set[asyncio.Task] = set()
+
+
+def spawn(coroutine: Coroutine, name: str) -> asyncio.Task:
+    """
+    Run ``coroutine`` in the background. The task is kept until it finishes,
+    and an exception it ends with is printed instead of going unnoticed.
+    """
+    task = asyncio.create_task(coroutine, name=name)
+    _tasks.add(task)
+    task.add_done_callback(_finished)
+    return task
+
+
+def _finished(task: asyncio.Task):
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Background task {task.get_name()} failed: {task.exception()!r}")
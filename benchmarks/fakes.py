@@ -0,0 +1,278 @@
+"""
+In-process stand-ins for the parts of discord.py the ticket cogs touch, so
+the ticket flow can run without a gateway connection.
+
+Every call that would be a REST request goes through ``FakeRest``, which
+adds the configured latency and answers a share of calls with a 429.
+"""
+import asyncio
+import datetime
+import itertools
+import random
+from collections import Counter
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+import discord
+
+# Snowflakes only need to be unique and increase over time.
+_ids = itertools.count(10**17)
+HISTORY_PAGE = 100
+# Interaction responses aren't bound by the bot's rate limits.
+UNLIMITED_ROUTES = ("interaction", "webhook")
+
+
+def snowflake() -> int:
+    return next(_ids)
+
+
+class FakeRest:
+    """Simulated Discord API: latency per request and injected 429s."""
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, rate_limit: float = 0.0,
+                 retry_after: float = 0.5, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.rate_limited = Counter()
+
+    async def call(self, route: str):
+        self.calls[route] += 1
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        await asyncio.sleep(max(0.0, delay))
+        if route not in UNLIMITED_ROUTES and self.rate_limit and self.random.random() < self.rate_limit:
+            self.rate_limited[route] += 1
+            error = discord.HTTPException(SimpleNamespace(status=429, reason="Too Many Requests"), "rate limited")
+            error.retry_after = self.retry_after
+            raise error
+
+    def stats(self) -> dict:
+        return {
+            'calls': sum(self.calls.values()),
+            'rate_limited': sum(self.rate_limited.values()),
+            'by_route': dict(self.calls)
+        }
+
+
+class FakeUser:
+    def __init__(self, rest: FakeRest, name: str, user_id: Optional[int] = None):
+        self.rest = rest
+        self.id = user_id or snowflake()
+        self.name = name
+        self.mention = f"<@{self.id}>"
+        self.dm_messages: List["FakeMessage"] = []
+
+    def __str__(self):
+        return self.name
+
+    async def send(self, content=None, **kwargs):
+        await self.rest.call("dm")
+        message = FakeMessage(None, self, content, **kwargs)
+        self.dm_messages.append(message)
+        return message
+
+
+class FakeRole:
+    def __init__(self, guild: "FakeGuild", name: str, role_id: Optional[int] = None):
+        self.guild = guild
+        self.id = role_id or snowflake()
+        self.name = name
+        self.mention = f"<@&{self.id}>"
+
+
+class FakeMessage:
+    def __init__(self, channel: Optional["FakeTextChannel"], author: FakeUser, content: Optional[str] = None,
+                 embed=None, view=None, file=None, **kwargs):
+        self.id = snowflake()
+        self.channel = channel
+        self.author = author
+        self.content = content or ''
+        self.embed = embed
+        self.view = view
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+        if file is not None:
+            # Read the upload like the HTTP client would.
+            self.attachment_size = len(file.fp.read())
+
+    async def edit(self, **changes):
+        await self.channel.guild.rest.call(f"messages:{self.channel.id}")
+        for name, value in changes.items():
+            setattr(self, name, value)
+        return self
+
+
+class FakeTextChannel:
+    def __init__(self, guild: "FakeGuild", name: str, category_id: Optional[int] = None,
+                 overwrites: Optional[dict] = None, topic: Optional[str] = None):
+        self.guild = guild
+        self.id = snowflake()
+        self.name = name
+        self.category_id = category_id
+        self.overwrites = overwrites or {}
+        self.topic = topic
+        self.mention = f"<#{self.id}>"
+        self.messages: List[FakeMessage] = []
+        self.deleted = asyncio.Event()
+
+    def __str__(self):
+        return self.name
+
+    def post(self, author: FakeUser, content: str) -> FakeMessage:
+        """Add a message without a REST call, as if someone else had sent it."""
+        message = FakeMessage(self, author, content)
+        self.messages.append(message)
+        return message
+
+    async def send(self, content=None, **kwargs):
+        await self.guild.rest.call(f"messages:{self.id}")
+        message = FakeMessage(self, self.guild.me, content, **kwargs)
+        self.messages.append(message)
+        return message
+
+    async def history(self, limit: Optional[int] = 100, oldest_first: bool = False,
+                      before=None, after=None, **kwargs):
+        """Messages a page of HISTORY_PAGE per request, like the real endpoint."""
+        messages = [
+            message for message in self.messages
+            if (after is None or message.id > after.id) and (before is None or message.id < before.id)
+        ]
+        if not oldest_first:
+            messages.reverse()
+        if limit is not None:
+            messages = messages[:limit]
+        for start in range(0, len(messages), HISTORY_PAGE):
+            await self.guild.rest.call(f"messages:{self.id}")
+            for message in messages[start:start + HISTORY_PAGE]:
+                yield message
+
+    async def edit(self, **changes):
+        await self.guild.rest.call(f"channel_edit:{self.id}")
+        if 'category' in changes:
+            category = changes.pop('category')
+            self.category_id = category.id if category else None
+        for name, value in changes.items():
+            setattr(self, name, value)
+        return self
+
+    async def delete(self, reason: Optional[str] = None):
+        await self.guild.rest.call("channel_delete")
+        self.guild.channels.pop(self.id, None)
+        self.deleted.set()
+
+
+class FakeGuild:
+    def __init__(self, rest: FakeRest, name: str):
+        self.rest = rest
+        self.id = snowflake()
+        self.name = name
+        self.default_role = FakeRole(self, "@everyone", self.id)
+        self.me = FakeUser(rest, "TicketBot")
+        self.members: Dict[int, FakeUser] = {}
+        self.channels: Dict[int, object] = {}
+        self.roles: Dict[int, FakeRole] = {}
+
+    def add_member(self, name: str) -> FakeUser:
+        member = FakeUser(self.rest, name)
+        self.members[member.id] = member
+        return member
+
+    def add_role(self, name: str) -> FakeRole:
+        role = FakeRole(self, name)
+        self.roles[role.id] = role
+        return role
+
+    def add_category(self, name: str):
+        category = SimpleNamespace(id=snowflake(), name=name)
+        self.channels[category.id] = category
+        return category
+
+    def add_channel(self, name: str, category_id: Optional[int] = None) -> FakeTextChannel:
+        channel = FakeTextChannel(self, name, category_id)
+        self.channels[channel.id] = channel
+        return channel
+
+    def get_member(self, member_id: int) -> Optional[FakeUser]:
+        return self.members.get(member_id)
+
+    def get_role(self, role_id: int) -> Optional[FakeRole]:
+        return self.roles.get(role_id)
+
+    def get_channel(self, channel_id: Optional[int]):
+        return self.channels.get(channel_id)
+
+    async def create_text_channel(self, name: str, category=None, overwrites=None, topic=None, reason=None):
+        await self.rest.call("channel_create")
+        channel = FakeTextChannel(self, name, category.id if category else None, overwrites, topic)
+        self.channels[channel.id] = channel
+        return channel
+
+
+class FakeResponse:
+    """``interaction.response``; a modal is answered after ``typing`` seconds."""
+
+    def __init__(self, interaction: "FakeInteraction", typing: float = 0.0):
+        self.interaction = interaction
+        self.typing = typing
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _respond(self):
+        if self._done:
+            raise discord.InteractionResponded(self.interaction)
+        self._done = True
+        await self.interaction.guild.rest.call("interaction")
+
+    async def defer(self, **kwargs):
+        await self._respond()
+
+    async def send_message(self, content=None, **kwargs):
+        await self._respond()
+
+    async def send_modal(self, modal: discord.ui.Modal):
+        await self._respond()
+        asyncio.get_running_loop().call_later(self.typing, self._submit, modal)
+
+    @staticmethod
+    def _submit(modal: discord.ui.Modal):
+        for index, item in enumerate(modal.children):
+            if isinstance(item, discord.ui.TextInput):
+                item._value = f"Answer {index + 1}"
+        modal.stop()
+
+
+class FakeFollowup:
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        await self.interaction.guild.rest.call("webhook")
+        return FakeMessage(self.interaction.channel, self.interaction.guild.me, content, **kwargs)
+
+
+class FakeInteraction:
+    def __init__(self, client, guild: FakeGuild, user: FakeUser, channel: FakeTextChannel,
+                 message: Optional[FakeMessage] = None, values: Optional[List[str]] = None,
+                 typing: float = 0.0):
+        self.client = client
+        self.guild = guild
+        self.guild_id = guild.id
+        self.user = user
+        self.channel = channel
+        self.message = message
+        self.data = {'values': values or []}
+        self.response = FakeResponse(self, typing)
+        self.followup = FakeFollowup(self)
+
+
+class FakeBot:
+    """Holds the same services ``setup_hook`` attaches to the real bot."""
+
+    def __init__(self):
+        self.guilds: Dict[int, FakeGuild] = {}
+
+    def get_guild(self, guild_id: int) -> Optional[FakeGuild]:
+        return self.guilds.get(guild_id)
@@ -0,0 +1,298 @@
+"""
+Offline load test of the ticket flow: N users at once against a temporary
+database and the fake Discord layer in ``fakes``.
+
+Stages, run one after another:
+
+    autocomplete   TicketCommands.panel_autocomplete
+    send_panel     TicketCommands.send_panel
+    ticket_open    TicketSelect.callback (modal answered after --typing seconds)
+    close_enqueue  TicketCommands.handle_ticket_closure returning
+    closure        ...until the closure job has deleted the channel
+
+Each stage reports throughput and p50/p95/p99 latency; the whole run is
+saved as JSON, and ``--baseline`` compares against an earlier file. The
+usual REST_*, CLOSURE_*, DB_* and CHANNEL_POOL_* settings apply. Run with:
+
+    python -m cogs.benchmarks.load_test --users 200 --guilds 4 --latency 80 --rate-limit 0.02
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import tempfile
+import time
+from typing import Dict, List
+
+from .. import config
+from ..channel_pool import ChannelPool
+from ..closure_jobs import ClosureQueue
+from ..panel_cache import PanelCache
+from ..panel_io import insert_panel
+from ..rest_scheduler import RestScheduler
+from ..ticket_views import TicketSelect, compiled_options
+from ..ticketcommands import TicketCommands
+from ..transcript_capture import TranscriptCapture
+from .fakes import FakeBot, FakeGuild, FakeInteraction, FakeRest
+
+STAGES = ('autocomplete', 'send_panel', 'ticket_open', 'close_enqueue', 'closure')
+
+
+def percentile(samples: List[float], p: float) -> float:
+    """Nearest-rank percentile of sorted ``samples``."""
+    if not samples:
+        return 0.0
+    return samples[max(0, math.ceil(p / 100 * len(samples)) - 1)]
+
+
+class Stage:
+    def __init__(self, name: str):
+        self.name = name
+        self.samples: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.seconds = 0.0
+
+    async def measure(self, awaitable):
+        started = time.perf_counter()
+        try:
+            result = await awaitable
+        except Exception as e:
+            key = type(e).__name__
+            self.errors[key] = self.errors.get(key, 0) + 1
+            return None
+        self.samples.append(time.perf_counter() - started)
+        return result
+
+    async def run(self, awaitables):
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self.measure(awaitable) for awaitable in awaitables))
+        self.seconds += time.perf_counter() - started
+        return results
+
+    def report(self) -> dict:
+        samples = sorted(self.samples)
+        return {
+            'count': len(samples),
+            'errors': self.errors,
+            'seconds': round(self.seconds, 3),
+            'throughput': round(len(samples) / self.seconds, 2) if self.seconds else 0.0,
+            'p50_ms': round(percentile(samples, 50) * 1000, 2),
+            'p95_ms': round(percentile(samples, 95) * 1000, 2),
+            'p99_ms': round(percentile(samples, 99) * 1000, 2),
+            'max_ms': round(samples[-1] * 1000, 2) if samples else 0.0
+        }
+
+
+async def open_database():
+    # bot.py starts the client on import when a token is set; only its schema is wanted here.
+    os.environ["DISCORD_BOT_TOKEN"] = ""
+    from .. import bot as bot_module
+    return await bot_module.database_db()
+
+
+async def build_guild(bot, rest: FakeRest, index: int, args) -> dict:
+    guild = FakeGuild(rest, f"guild-{index}")
+    bot.guilds[guild.id] = guild
+    staff = guild.add_role("staff")
+    category = guild.add_category("tickets")
+    log_channel = guild.add_channel("ticket-logs")
+    panel_channel = guild.add_channel("support")
+    moderator = guild.add_member(f"mod-{index}")
+
+    async def create(connection):
+        return [
+            await insert_panel(connection, guild.id, {
+                'panel_name': f"panel-{number:03d}",
+                'embed_title': "Support",
+                'embed_description': "Pick a ticket type below.",
+                'log_channel_id': log_channel.id,
+                'options': [
+                    {
+                        'name': f"option-{option}",
+                        'category_id': category.id,
+                        'roles': [staff.id],
+                        'embed_title': f"Option {option}",
+                        'embed_description': "Thanks, someone will be with you shortly.",
+                        'questions': ["What do you need help with?", "Anything else we should know?"]
+                    }
+                    for option in range(args.options)
+                ]
+            })
+            for number in range(args.panels)
+        ]
+
+    panels = await bot.database.transaction(create)
+    return {
+        'guild': guild,
+        'panel_channel': panel_channel,
+        'moderator': moderator,
+        'panel': panels[0],
+        'panel_names': [panel['panel_name'] for panel in panels]
+    }
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    rest = FakeRest(args.latency / 1000, args.jitter / 1000, args.rate_limit, args.retry_after, args.seed)
+
+    bot = FakeBot()
+    bot.database = await open_database()
+    bot.rest = RestScheduler()
+    bot.panel_cache = PanelCache(bot)
+    bot.transcript_capture = TranscriptCapture(bot, enabled=args.capture)
+    bot.channel_pool = ChannelPool(bot)
+    bot.closures = ClosureQueue(bot, workers=args.closure_workers)
+    cog = TicketCommands(bot)
+    await bot.closures.start()
+
+    guilds = [await build_guild(bot, rest, index, args) for index in range(args.guilds)]
+    users = []
+    for index in range(args.users):
+        setup = guilds[index % len(guilds)]
+        users.append((setup, setup['guild'].add_member(f"user-{index}")))
+
+    stages = {name: Stage(name) for name in STAGES}
+
+    def interaction(setup, user, **kwargs):
+        return FakeInteraction(bot, setup['guild'], user, setup['panel_channel'], typing=args.typing, **kwargs)
+
+    await stages['autocomplete'].run(
+        cog.panel_autocomplete(interaction(setup, user), rng.choice(setup['panel_names'])[:rng.randint(0, 9)])
+        for setup, user in users
+    )
+    await stages['send_panel'].run(
+        cog.send_panel.callback(cog, interaction(setup, user), setup['panel']['panel_name'])
+        for setup, user in users
+    )
+
+    async def open_tickets(setup, user):
+        panel = setup['panel']
+        message = setup['panel_channel'].messages[-1]
+        for _ in range(args.tickets):
+            value = rng.choice(list(compiled_options(panel)))
+            await stages['ticket_open'].measure(
+                TicketSelect(panel['id']).callback(interaction(setup, user, message=message, values=[value]))
+            )
+
+    started = time.perf_counter()
+    await asyncio.gather(*(open_tickets(setup, user) for setup, user in users))
+    stages['ticket_open'].seconds = time.perf_counter() - started
+
+    tickets = await bot.database.fetchall(
+        "SELECT guild_id, channel_id, user_id, log_channel_id FROM tickets WHERE closed = 0"
+    )
+    by_guild = {setup['guild'].id: setup for setup in guilds}
+    closing = []
+    for guild_id, channel_id, user_id, log_channel_id in tickets:
+        setup = by_guild[guild_id]
+        channel = setup['guild'].get_channel(channel_id)
+        creator = setup['guild'].get_member(user_id)
+        for number in range(args.history):
+            bot.transcript_capture.add_message(channel.post(creator, f"message {number} " + "x" * 80))
+        closing.append((setup, channel, user_id, log_channel_id))
+    await bot.transcript_capture.flush()
+
+    async def close(setup, channel, creator_id, log_channel_id):
+        started = time.perf_counter()
+        await stages['close_enqueue'].measure(cog.handle_ticket_closure(
+            channel, setup['moderator'], "Load test", creator_id, log_channel_id, force_close=True
+        ))
+        await asyncio.wait_for(channel.deleted.wait(), args.timeout)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(close(*ticket) for ticket in closing), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    stages['close_enqueue'].seconds = stages['closure'].seconds = elapsed
+    for result in results:
+        if isinstance(result, Exception):
+            name = type(result).__name__
+            stages['closure'].errors[name] = stages['closure'].errors.get(name, 0) + 1
+        else:
+            stages['closure'].samples.append(result)
+
+    # The job records its last state just after the channel goes; let it land before shutting down.
+    while await bot.database.fetchone(
+        "SELECT 1 FROM closure_jobs WHERE state IN ('pending', 'transcript', 'notified') LIMIT 1"
+    ):
+        await asyncio.sleep(0.05)
+    bot.closures.stop()
+    report = {
+        'settings': {
+            **{name: value for name, value in vars(args).items() if name not in ('output', 'baseline')},
+            'rest_guild_rate': config.REST_GUILD_RATE,
+            'rest_route_rate': config.REST_ROUTE_RATE,
+            'channel_pool_max': config.CHANNEL_POOL_MAX,
+            'python': platform.python_version()
+        },
+        'stages': {name: stage.report() for name, stage in stages.items()},
+        'rest': {'simulated': rest.stats(), 'scheduler': bot.rest.queue_stats()},
+        'database': bot.database.write_stats()
+    }
+    await bot.database.close()
+    return report
+
+
+def print_report(report: dict, baseline: dict = None):
+    print(f"{'stage':<14} {'count':>6} {'errors':>6} {'per sec':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stage in report['stages'].items():
+        line = (f"{name:<14} {stage['count']:>6} {sum(stage['errors'].values()):>6} {stage['throughput']:>9.1f}"
+                f" {stage['p50_ms']:>9.1f} {stage['p95_ms']:>9.1f} {stage['p99_ms']:>9.1f}")
+        previous = (baseline or {}).get('stages', {}).get(name)
+        if previous and previous['p95_ms']:
+            line += f"   p95 {(stage['p95_ms'] / previous['p95_ms'] - 1) * 100:+.0f}% vs baseline"
+        print(line)
+    simulated = report['rest']['simulated']
+    print(f"REST calls: {simulated['calls']}, answered with 429: {simulated['rate_limited']}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100, help="concurrent users")
+    parser.add_argument("--guilds", type=int, default=1, help="guilds the users are spread over")
+    parser.add_argument("--tickets", type=int, default=1, help="tickets each user opens, one after another")
+    parser.add_argument("--panels", type=int, default=20, help="panels per guild")
+    parser.add_argument("--options", type=int, default=5, help="ticket options per panel")
+    parser.add_argument("--history", type=int, default=150, help="messages posted in each ticket before it closes")
+    parser.add_argument("--latency", type=float, default=50.0, help="REST latency in ms")
+    parser.add_argument("--jitter", type=float, default=20.0, help="REST latency jitter in ms")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="share of REST calls answered with a 429")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="retry_after of injected 429s, seconds")
+    parser.add_argument("--typing", type=float, default=0.0, help="seconds before a modal is submitted")
+    parser.add_argument("--closure-workers", type=int, default=config.CLOSURE_WORKERS)
+    parser.add_argument("--capture", action="store_true", help="capture transcripts live instead of crawling history")
+    parser.add_argument("--timeout", type=float, default=300.0, help="longest wait for one closure, seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="load_test.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="earlier results file to compare p95 latency against")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    output = os.path.abspath(args.output)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        # database_db() opens database.db in the working directory.
+        os.chdir(directory)
+        try:
+            report = await run(args)
+        finally:
+            os.chdir(cwd)
+
+    print_report(report, baseline)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+"""
+Per-message cost of routing chat messages to pending setup-wizard steps,
+by number of concurrent wizards.
+
+Compares WaiterRegistry with the predicate scan ``bot.wait_for`` does (every
+message is checked against every pending listener). Run with:
+
+    python -m cogs.benchmarks.wizard_dispatch
+"""
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from ..setup_waiters import WaiterRegistry
+
+WIZARD_COUNTS = (1, 10, 100, 1000, 10000)
+MESSAGES = 20000
+# Share of traffic coming from channels where a wizard is running.
+WIZARD_TRAFFIC = 0.01
+
+
+def make_messages(wizards, count):
+    messages = []
+    for _ in range(count):
+        if random.random() < WIZARD_TRAFFIC:
+            channel_id, user_id = random.choice(wizards)
+            # Mostly other people talking in the wizard's channel.
+            if random.random() < 0.5:
+                user_id += 1
+        else:
+            channel_id, user_id = random.randrange(10**6, 10**7), random.randrange(10**6)
+        messages.append(SimpleNamespace(channel=SimpleNamespace(id=channel_id), author=SimpleNamespace(id=user_id)))
+    return messages
+
+
+def predicate_scan(listeners, message):
+    """What Client.dispatch does for wait_for listeners."""
+    for future, check in listeners:
+        if not future.done() and check(message):
+            return True
+    return False
+
+
+async def run(count):
+    loop = asyncio.get_running_loop()
+    wizards = [(channel_id, channel_id * 7) for channel_id in range(1, count + 1)]
+    messages = make_messages(wizards, MESSAGES)
+
+    listeners = []
+    for channel_id, user_id in wizards:
+        def check(m, channel_id=channel_id, user_id=user_id):
+            return m.author.id == user_id and m.channel.id == channel_id
+        listeners.append((loop.create_future(), check))
+
+    started = time.perf_counter()
+    for message in messages:
+        predicate_scan(listeners, message)
+    scan = (time.perf_counter() - started) / MESSAGES
+
+    registry = WaiterRegistry()
+    tasks = [asyncio.create_task(registry.wait(channel_id, user_id)) for channel_id, user_id in wizards]
+    await asyncio.sleep(0)
+    # Keep every step pending so each message sees the full registry.
+    pending = set(wizards)
+    messages = [m for m in messages if (m.channel.id, m.author.id) not in pending]
+    started = time.perf_counter()
+    for message in messages:
+        registry.dispatch(message)
+    indexed = (time.perf_counter() - started) / len(messages)
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return scan, indexed
+
+
+async def main():
+    random.seed(0)
+    print(f"{'wizards':>8} {'wait_for scan':>15} {'registry':>10}")
+    for count in WIZARD_COUNTS:
+        scan, indexed = await run(count)
+        print(f"{count:>8} {scan * 1e6:>12.2f} us {indexed * 1e6:>7.2f} us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
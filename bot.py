@@ -1,12 +1,116 @@
 import discord
 from discord.ext import commands
-import aiosqlite
 import os
+import json
+import time
+import hashlib
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from cogs.panel_cache import PanelCache
+from cogs.transcript_capture import TranscriptCapture
+from cogs.channel_pool import ChannelPool
+from cogs.rest_scheduler import RestScheduler
+from cogs.closure_jobs import ClosureQueue
+from cogs.close_timers import CloseTimers
+from cogs.ticket_archive import TicketArchive
+from cogs import config
+from cogs.database import Database
+from cogs.transcripts import compress_transcript, save_blob, transcript_lines
+from cogs.transcript_search import index_transcript
+from cogs.ticket_stats import rebuild_rollups
+from cogs.query_plans import check_query_plans
+from cogs.metrics import metrics, start_server
+from cogs.background import spawn
 
-async def execute_query(self, query: str, parameters: tuple = ()):
-    async with self.bot.database.execute(query, parameters) as cursor:
-        return await cursor.fetchall()
+async def add_column(database, table: str, column: str, definition: str):
+    """ALTER TABLE ... ADD COLUMN, skipped when the column already exists."""
+    cursor = await database.execute(f"PRAGMA table_info({table})")
+    if column not in [row[1] for row in await cursor.fetchall()]:
+        await database.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+async def migrate_transcripts(database):
+    """Move in-row transcripts into transcript_blobs, one batch per commit."""
+    while True:
+        cursor = await database.execute(
+            "SELECT id, transcript FROM tickets WHERE transcript IS NOT NULL LIMIT ?",
+            (config.TRANSCRIPT_MIGRATION_BATCH,)
+        )
+        rows = await cursor.fetchall()
+        if not rows:
+            break
+
+        for ticket_id, transcript in rows:
+            digest, raw_size, data = compress_transcript(transcript)
+            await save_blob(database, digest, raw_size, data)
+            await database.execute(
+                """UPDATE tickets
+                   SET transcript = NULL,
+                       transcript_hash = ?,
+                       transcript_size = ?,
+                       transcript_stored_size = ?
+                   WHERE id = ?""",
+                (digest, raw_size, len(data), ticket_id)
+            )
+        await database.commit()
+        print(f"Moved {len(rows)} transcripts out of the tickets table")
+
+async def backfill_transcript_index(database):
+    """Index the transcripts of every closed ticket, streaming each from its blob."""
+    last_id = 0
+    while True:
+        cursor = await database.execute(
+            """SELECT t.id, t.guild_id, t.transcript, b.codec, b.data
+               FROM tickets t
+               JOIN transcript_blobs b ON b.hash = t.transcript_hash
+               WHERE t.closed = 1 AND t.id > ?
+               ORDER BY t.id LIMIT ?""",
+            (last_id, config.TRANSCRIPT_MIGRATION_BATCH)
+        )
+        rows = await cursor.fetchall()
+        if not rows:
+            break
+
+        for ticket_id, guild_id, legacy, codec, data in rows:
+            await index_transcript(database, ticket_id, guild_id, transcript_lines(legacy, codec, data))
+        await database.commit()
+        last_id = rows[-1][0]
+
+async def split_option_columns(database):
+    """Copy the comma-joined roles/ticket_question columns into child tables."""
+    cursor = await database.execute(
+        "SELECT id, roles, ticket_question FROM ticket_options WHERE roles IS NOT NULL OR ticket_question IS NOT NULL"
+    )
+    roles = []
+    questions = []
+    for option_id, role_csv, question_csv in await cursor.fetchall():
+        role_ids = [role_id for role_id in (role_csv or '').split(',') if role_id.strip().isdigit()]
+        roles.extend((option_id, position, int(role_id)) for position, role_id in enumerate(role_ids))
+        if question_csv:
+            questions.extend((option_id, position, question) for position, question in enumerate(question_csv.split(',')))
+
+    await database.executemany(
+        "INSERT OR IGNORE INTO ticket_option_roles (option_id, position, role_id) VALUES (?, ?, ?)",
+        roles
+    )
+    await database.executemany(
+        "INSERT OR IGNORE INTO ticket_option_questions (option_id, position, question) VALUES (?, ?, ?)",
+        questions
+    )
+    await database.execute("UPDATE ticket_options SET roles = NULL, ticket_question = NULL")
+
+async def enable_incremental_vacuum(database):
+    """
+    Let the archiver hand freed pages back to the filesystem. Switching an
+    existing database over takes a full VACUUM, so it only happens once
+    archiving is turned on, and is tried again on the next start if it fails.
+    """
+    cursor = await database.execute("PRAGMA auto_vacuum")
+    if (await cursor.fetchone())[0] == 2:
+        return
+    await database.commit()
+    with startup.phase("db vacuum"):
+        await database.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        await database.execute("VACUUM")
 
 async def update_database_schema(database):
     try:
@@ -24,13 +128,13 @@ async def update_database_schema(database):
             version = (1,)
             
         if version[0] < 2:
-            await database.execute("ALTER TABLE tickets ADD COLUMN reason TEXT")
+            await add_column(database, "tickets", "reason", "TEXT")
             await database.execute("UPDATE db_version SET version = 2")
             
         if version[0] < 3:
-            await database.execute("ALTER TABLE ticket_options ADD COLUMN embed_title TEXT")
-            await database.execute("ALTER TABLE ticket_options ADD COLUMN embed_description TEXT")
-            await database.execute("ALTER TABLE ticket_options ADD COLUMN ticket_question TEXT")
+            await add_column(database, "ticket_options", "embed_title", "TEXT")
+            await add_column(database, "ticket_options", "embed_description", "TEXT")
+            await add_column(database, "ticket_options", "ticket_question", "TEXT")
             await database.execute("UPDATE db_version SET version = 3")
             
         if version[0] < 4:
@@ -58,7 +162,190 @@ async def update_database_schema(database):
             
             await database.execute("UPDATE db_version SET version = 4")
             await database.commit()
-            
+
+        if version[0] < 5:
+            # Transcripts live compressed in their own table; tickets keep a reference
+            await database.execute("""
+                CREATE TABLE IF NOT EXISTS transcript_blobs (
+                    hash TEXT PRIMARY KEY,
+                    codec TEXT NOT NULL,
+                    raw_size INTEGER NOT NULL,
+                    stored_size INTEGER NOT NULL,
+                    data BLOB NOT NULL
+                )
+            """)
+            await add_column(database, "tickets", "transcript_hash", "TEXT")
+            await add_column(database, "tickets", "transcript_size", "INTEGER")
+            await add_column(database, "tickets", "transcript_stored_size", "INTEGER")
+            await database.commit()
+
+            await migrate_transcripts(database)
+
+            await database.execute("UPDATE db_version SET version = 5")
+            await database.commit()
+
+        if version[0] < 6:
+            # Full-text search over closed-ticket transcripts
+            await add_column(database, "tickets", "option_name", "TEXT")
+            # Tickets used to be stored without a guild; recover it from the panel's log channel
+            await database.execute("""
+                UPDATE tickets
+                SET guild_id = (
+                    SELECT p.guild_id FROM panels p
+                    WHERE p.log_channel_id = tickets.log_channel_id
+                    LIMIT 1
+                )
+                WHERE guild_id IS NULL
+            """)
+            # Contentless: the transcripts stay compressed in transcript_blobs
+            await database.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS transcript_fts
+                USING fts5(guild, content, content='')
+            """)
+            await database.execute("""
+                CREATE INDEX IF NOT EXISTS idx_tickets_guild_closed
+                ON tickets(guild_id, closed_at)
+            """)
+            await database.commit()
+
+            await backfill_transcript_index(database)
+
+            await database.execute("UPDATE db_version SET version = 6")
+            await database.commit()
+
+        if version[0] < 7:
+            # Restore the panels primary key lost by the v4 rebuild
+            cursor = await database.execute("SELECT COUNT(*) FROM panels WHERE id IS NULL")
+            unkeyed_panels = (await cursor.fetchone())[0]
+
+            await database.execute("""
+                CREATE TABLE panels_v7 (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    panel_name TEXT NOT NULL,
+                    category_id INTEGER,
+                    log_channel_id INTEGER,
+                    guild_id INTEGER NOT NULL,
+                    embed_title TEXT NOT NULL,
+                    embed_description TEXT NOT NULL,
+                    embed_color TEXT NOT NULL
+                )
+            """)
+            # Keyed rows keep their ids; rows inserted since v4 have none and get new ones last
+            await database.execute("""
+                INSERT INTO panels_v7
+                    (id, panel_name, category_id, log_channel_id, guild_id,
+                     embed_title, embed_description, embed_color)
+                SELECT id, panel_name, category_id, log_channel_id, guild_id,
+                       embed_title, embed_description, embed_color
+                FROM panels
+                ORDER BY id IS NULL, id
+            """)
+            if unkeyed_panels == 1:
+                # Its options were saved with a NULL panel_id; with a single candidate they can be reattached
+                await database.execute("""
+                    UPDATE ticket_options
+                    SET panel_id = (SELECT MAX(id) FROM panels_v7)
+                    WHERE panel_id IS NULL
+                """)
+            elif unkeyed_panels:
+                print(f"Database update: {unkeyed_panels} panels had no id; their options could not be matched")
+            await database.execute("DROP TABLE panels")
+            await database.execute("ALTER TABLE panels_v7 RENAME TO panels")
+
+            # Roles and questions as rows instead of comma-joined strings
+            await database.execute("""
+                CREATE TABLE IF NOT EXISTS ticket_option_roles (
+                    option_id INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    role_id INTEGER NOT NULL,
+                    PRIMARY KEY (option_id, position),
+                    FOREIGN KEY (option_id) REFERENCES ticket_options (id) ON DELETE CASCADE
+                ) WITHOUT ROWID
+            """)
+            await database.execute("""
+                CREATE TABLE IF NOT EXISTS ticket_option_questions (
+                    option_id INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    question TEXT NOT NULL,
+                    PRIMARY KEY (option_id, position),
+                    FOREIGN KEY (option_id) REFERENCES ticket_options (id) ON DELETE CASCADE
+                ) WITHOUT ROWID
+            """)
+            await split_option_columns(database)
+
+            # Covering indexes for the cog queries
+            await database.execute("""
+                CREATE INDEX IF NOT EXISTS idx_panels_guild_name
+                ON panels(guild_id, panel_name)
+            """)
+            await database.execute("""
+                CREATE INDEX IF NOT EXISTS idx_tickets_channel
+                ON tickets(channel_id, closed, user_id, log_channel_id)
+            """)
+            await database.execute("""
+                CREATE INDEX IF NOT EXISTS idx_tickets_open
+                ON tickets(closed, channel_id)
+            """)
+
+            await database.execute("UPDATE db_version SET version = 7")
+            await database.commit()
+
+        if version[0] < 8:
+            # Archival: find old closed tickets, and blobs no ticket points at any more
+            await database.execute("""
+                CREATE INDEX IF NOT EXISTS idx_tickets_closed_at
+                ON tickets(closed, closed_at)
+            """)
+            await database.execute("""
+                CREATE INDEX IF NOT EXISTS idx_tickets_transcript_hash
+                ON tickets(transcript_hash)
+            """)
+            await database.execute("UPDATE db_version SET version = 8")
+            await database.commit()
+
+        if version[0] < 9:
+            # Daily rollups for /ticket_stats, kept up to date as tickets open and close
+            await database.execute("""
+                CREATE TABLE IF NOT EXISTS ticket_rollups (
+                    guild_id INTEGER NOT NULL,
+                    day TEXT NOT NULL,
+                    option_name TEXT NOT NULL,
+                    opened INTEGER NOT NULL DEFAULT 0,
+                    closed INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (guild_id, day, option_name)
+                ) WITHOUT ROWID
+            """)
+            await database.execute("""
+                CREATE TABLE IF NOT EXISTS ticket_closer_rollups (
+                    guild_id INTEGER NOT NULL,
+                    day TEXT NOT NULL,
+                    closer_id INTEGER NOT NULL,
+                    closed INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (guild_id, day, closer_id)
+                ) WITHOUT ROWID
+            """)
+            await database.execute("""
+                CREATE TABLE IF NOT EXISTS ticket_close_times (
+                    guild_id INTEGER NOT NULL,
+                    day TEXT NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    tickets INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (guild_id, day, bucket)
+                ) WITHOUT ROWID
+            """)
+            # Rebuilds find each ticket's closer through its closure job
+            await database.execute("""
+                CREATE INDEX IF NOT EXISTS idx_closure_jobs_ticket
+                ON closure_jobs(ticket_id)
+            """)
+            await rebuild_rollups(database)
+
+            await database.execute("UPDATE db_version SET version = 9")
+            await database.commit()
+
+        if config.ARCHIVE_AFTER_DAYS > 0:
+            await enable_incremental_vacuum(database)
+
         await database.commit()
         
     except Exception as e:
@@ -67,9 +354,38 @@ async def update_database_schema(database):
     except Exception as e:
         print(f"Database update: {e}")
 
+class StartupTimer:
+    """Wall-clock time spent in each startup phase."""
+    def __init__(self):
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def report(self) -> str:
+        total = sum(seconds for _, seconds in self.phases)
+        parts = ', '.join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases)
+        return f"Startup took {total * 1000:.0f}ms ({parts})"
+
+startup = StartupTimer()
+
 async def database_db():
     """Set up the database."""
-    database = await aiosqlite.connect("database.db")
+    db = Database("database.db")
+    with startup.phase("db open"):
+        database = await db.open()
+    await run_migrations(database)
+
+    with startup.phase("db pool"):
+        await db.start()
+    return db
+
+async def run_migrations(database):
 
     await database.execute("""
         CREATE TABLE IF NOT EXISTS tickets (
@@ -114,9 +430,124 @@ async def database_db():
         )
     """)
 
-    await update_database_schema(database)
-    await database.commit()
-    return database
+    await database.execute("""
+        CREATE TABLE IF NOT EXISTS transcript_messages (
+            message_id INTEGER PRIMARY KEY,
+            channel_id INTEGER NOT NULL,
+            created_at TEXT,
+            author TEXT,
+            content TEXT
+        )
+    """)
+
+    await database.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transcript_messages_channel
+        ON transcript_messages(channel_id, message_id)
+    """)
+
+    await database.execute("""
+        CREATE TABLE IF NOT EXISTS channel_pool (
+            channel_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            option_id INTEGER NOT NULL,
+            category_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    await database.execute("""
+        CREATE TABLE IF NOT EXISTS closure_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            channel_name TEXT NOT NULL,
+            ticket_id INTEGER,
+            closer_id INTEGER NOT NULL,
+            creator_id INTEGER,
+            log_channel_id INTEGER,
+            reason TEXT,
+            force_close INTEGER NOT NULL DEFAULT 0,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    await database.execute("CREATE INDEX IF NOT EXISTS idx_closure_jobs_state ON closure_jobs(state, channel_id)")
+
+    await database.execute("""
+        CREATE TABLE IF NOT EXISTS close_requests (
+            message_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            creator_id INTEGER NOT NULL,
+            log_channel_id INTEGER,
+            reason TEXT,
+            deadline REAL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    await database.execute("CREATE INDEX IF NOT EXISTS idx_close_requests_pending ON close_requests(status, deadline)")
+
+    await database.execute("""
+        CREATE TABLE IF NOT EXISTS posted_panels (
+            message_id INTEGER PRIMARY KEY,
+            channel_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            panel_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    await database.execute("CREATE INDEX IF NOT EXISTS idx_posted_panels_panel ON posted_panels(panel_id)")
+
+    await database.execute("""
+        CREATE TABLE IF NOT EXISTS setup_sessions (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            state TEXT NOT NULL,
+            data TEXT NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        )
+    """)
+
+    await database.execute("""
+        CREATE TABLE IF NOT EXISTS bot_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+
+    with startup.phase("migrations"):
+        await update_database_schema(database)
+        await database.commit()
+
+    with startup.phase("query plans"):
+        for name, plan in await check_query_plans(database):
+            print(f"Query plan warning ({name}): {' / '.join(plan)}")
+
+def command_tree_hash(tree) -> str:
+    """Hash of the command payload a global sync would upload."""
+    payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands()),
+        key=lambda command: (command.get('type', 1), command['name'])
+    )
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+async def sync_commands(bot) -> bool:
+    """Sync the global command tree unless it matches what was last synced."""
+    key = f"command_tree_hash:{bot.application_id}"
+    digest = command_tree_hash(bot.tree)
+    row = await bot.database.fetchone("SELECT value FROM bot_state WHERE key = ?", (key,))
+    if row and row[0] == digest and not config.COMMAND_SYNC_FORCE:
+        return False
+
+    await bot.tree.sync()
+    await bot.database.write("INSERT OR REPLACE INTO bot_state (key, value) VALUES (?, ?)", (key, digest))
+    return True
 
 # Initialize bot
 load_dotenv()
@@ -126,14 +557,53 @@ intents.messages = True
 intents.message_content = True
 bot = commands.Bot(command_prefix="!", intents=intents)
 
+async def setup_hook():
+    """One-time startup; unlike on_ready this doesn't rerun on reconnects."""
+    bot.database = await database_db()
+    bot.rest = RestScheduler()
+    bot.panel_cache = PanelCache(bot)
+    bot.transcript_capture = TranscriptCapture(bot)
+    bot.channel_pool = ChannelPool(bot)
+    bot.closures = ClosureQueue(bot)
+    bot.close_timers = CloseTimers(bot)
+    bot.archive = TicketArchive(bot)
+    if config.METRICS_PORT:
+        metrics.gauge("closure_queue_depth", bot.closures.queue_depth, "Closure jobs waiting for a worker.")
+        metrics.gauge("db_write_queue_depth", lambda: bot.database.write_stats()['queued'], "Writes waiting for the writer.")
+        metrics.gauge("rest_queue_depth", lambda: sum(
+            stats['queued'] for name, stats in bot.rest.queue_stats().items() if name != 'guilds'
+        ), "REST calls waiting to be sent.")
+        bot.metrics_server = await start_server(metrics, config.METRICS_HOST, config.METRICS_PORT)
+        print(f"Metrics at http://{config.METRICS_HOST}:{config.METRICS_PORT}/metrics")
+
+    with startup.phase("state load"):
+        await bot.transcript_capture.load()
+
+    with startup.phase("extensions"):
+        await bot.load_extension("cogs.ticketsetup")
+        await bot.load_extension("cogs.ticketcommands")
+
+    with startup.phase("command sync"):
+        synced = await sync_commands(bot)
+    print("Commands synced." if synced else "Command tree unchanged, skipped sync.")
+
+    spawn(start_background_work(), "background startup")
+
+bot.setup_hook = setup_hook
+
+async def start_background_work():
+    """Start the work that needs the guild cache, once it is filled."""
+    await bot.wait_until_ready()
+    with startup.phase("background start"):
+        await bot.channel_pool.load()
+        await bot.closures.start()
+        await bot.close_timers.start()
+        bot.archive.start()
+    print(startup.report())
+
 @bot.event
 async def on_ready():
     print(f"Logged in as {bot.user} ({bot.user.id})")
-    bot.database = await database_db()
-    await bot.load_extension("cogs.ticketsetup")
-    await bot.load_extension("cogs.ticketcommands")
-    await bot.tree.sync()
-    print("Bot is ready and commands are synced.")
 
 # Run bot
 TOKEN = os.getenv("DISCORD_BOT_TOKEN")
@@ -0,0 +1,179 @@
+import asyncio
+import math
+import time
+from typing import Dict, List, Optional, Set
+import discord
+from . import config
+from .ticket_views import ALLOW, DENY, CompiledOption, compiled_options
+from .rest_scheduler import BACKGROUND, USER
+from .background import spawn
+
+
+class ChannelPool:
+    """
+    Keeps a few hidden, pre-created channels in each ticket option's category
+    so opening a ticket is a channel edit instead of a channel create.
+
+    How many channels an option keeps is driven by its recent opening rate:
+    an exponentially decayed count of openings over CHANNEL_POOL_RATE_WINDOW
+    seconds, times CHANNEL_POOL_HEADROOM, clamped to CHANNEL_POOL_MIN and
+    CHANNEL_POOL_MAX. Pooled channels are recorded in ``channel_pool`` so
+    they are reused, not leaked, after a restart. Refills run one guild at a
+    time and pause CHANNEL_POOL_REFILL_DELAY seconds between creates.
+    """
+
+    def __init__(self, bot, enabled: bool = config.CHANNEL_POOL_MAX > 0):
+        self.bot = bot
+        self.enabled = enabled
+        self._channels: Dict[int, List[int]] = {}
+        self._demand: Dict[int, tuple] = {}
+        self._refilling: Set[int] = set()
+        self._wanted: Dict[int, Dict[int, CompiledOption]] = {}
+
+    async def load(self):
+        """
+        Pick up pooled channels from before a restart, drop orphans and, with
+        CHANNEL_POOL_MIN set, start topping up every option's pool.
+        """
+        if not self.enabled:
+            return
+
+        rows = await self.bot.database.fetchall(
+            """SELECT c.channel_id, c.guild_id, c.option_id, t.id
+               FROM channel_pool c
+               LEFT JOIN ticket_options t ON t.id = c.option_id
+               ORDER BY c.channel_id"""
+        )
+        orphans = []
+        for channel_id, guild_id, option_id, existing_option in rows:
+            if existing_option is None:
+                orphans.append((channel_id, guild_id))
+            else:
+                self._channels.setdefault(option_id, []).append(channel_id)
+
+        for channel_id, guild_id in orphans:
+            guild = self.bot.get_guild(guild_id)
+            channel = guild.get_channel(channel_id) if guild else None
+            if channel:
+                try:
+                    await self.bot.rest.run(
+                        guild_id, "channel_delete", BACKGROUND,
+                        lambda: channel.delete(reason="Ticket option no longer exists")
+                    )
+                except discord.HTTPException:
+                    continue
+            await self._forget(channel_id)
+
+        if config.CHANNEL_POOL_MIN > 0:
+            for (guild_id,) in await self.bot.database.fetchall("SELECT DISTINCT guild_id FROM panels"):
+                guild = self.bot.get_guild(guild_id)
+                if guild:
+                    for panel in (await self.bot.panel_cache.get_panels(guild_id)).values():
+                        self.fill_panel(guild, panel)
+
+    def fill_panel(self, guild: discord.Guild, panel: dict):
+        """Schedule a refill for each of the panel's options that is below its target size."""
+        if not self.enabled or guild is None:
+            return
+        for option in compiled_options(panel).values():
+            if option.option_id is not None and self.size(option.option_id) < self.target_size(option.option_id):
+                self.schedule_refill(guild, option)
+
+    def size(self, option_id: int) -> int:
+        return len(self._channels.get(option_id, ()))
+
+    def target_size(self, option_id: int) -> int:
+        count, updated = self._demand.get(option_id, (0.0, time.monotonic()))
+        count *= math.exp(-(time.monotonic() - updated) / config.CHANNEL_POOL_RATE_WINDOW)
+        target = math.ceil(count * config.CHANNEL_POOL_HEADROOM)
+        return max(config.CHANNEL_POOL_MIN, min(config.CHANNEL_POOL_MAX, target))
+
+    def _record_demand(self, option_id: int):
+        now = time.monotonic()
+        count, updated = self._demand.get(option_id, (0.0, now))
+        count *= math.exp(-(now - updated) / config.CHANNEL_POOL_RATE_WINDOW)
+        self._demand[option_id] = (count + 1, now)
+
+    async def claim(self, guild: discord.Guild, option: CompiledOption, name: str,
+                    overwrites: dict, topic: str) -> Optional[discord.TextChannel]:
+        """
+        Turn a pooled channel into a ticket channel. Returns None when the
+        pool is empty or disabled and the caller should create a channel.
+        """
+        if not self.enabled or option.option_id is None:
+            return None
+
+        self._record_demand(option.option_id)
+        channel = None
+        pooled = self._channels.setdefault(option.option_id, [])
+        while pooled and channel is None:
+            channel_id = pooled.pop(0)
+            channel = guild.get_channel(channel_id)
+            if channel is None:
+                await self._forget(channel_id)
+
+        self.schedule_refill(guild, option)
+        if channel is None:
+            return None
+
+        changes = {'name': name, 'overwrites': overwrites, 'topic': topic}
+        if channel.category_id != option.category_id:
+            changes['category'] = guild.get_channel(option.category_id)
+        try:
+            edited = await self.bot.rest.run(
+                guild.id, f"channel_edit:{channel.id}", USER, lambda: channel.edit(**changes)
+            )
+        except discord.NotFound:
+            await self._forget(channel.id)
+            return None
+        except discord.HTTPException:
+            # Still hidden and still recorded; keep it for the next ticket.
+            pooled.append(channel.id)
+            return None
+        await self._forget(channel.id)
+        # edit() returns the updated channel; the cached one still has the pool name.
+        return edited or channel
+
+    def schedule_refill(self, guild: discord.Guild, option: CompiledOption):
+        self._wanted.setdefault(guild.id, {})[option.option_id] = option
+        if guild.id not in self._refilling:
+            self._refilling.add(guild.id)
+            spawn(self._refill_guild(guild), f"channel pool refill {guild.id}")
+
+    async def _refill_guild(self, guild: discord.Guild):
+        try:
+            wanted = self._wanted.get(guild.id, {})
+            while wanted:
+                option_id, option = next(iter(wanted.items()))
+                if self.size(option_id) >= self.target_size(option_id):
+                    del wanted[option_id]
+                    continue
+
+                try:
+                    await self._create(guild, option)
+                except discord.HTTPException as e:
+                    print(f"Channel pool refill failed in {guild.id}: {e}")
+                    await asyncio.sleep(config.CHANNEL_POOL_REFILL_DELAY * 4)
+                    continue
+                await asyncio.sleep(config.CHANNEL_POOL_REFILL_DELAY)
+        finally:
+            self._refilling.discard(guild.id)
+
+    async def _create(self, guild: discord.Guild, option: CompiledOption):
+        channel = await self.bot.rest.run(
+            guild.id, "channel_create", BACKGROUND,
+            lambda: guild.create_text_channel(
+                name=f"pool-{option.option_id}",
+                category=guild.get_channel(option.category_id),
+                overwrites={guild.default_role: DENY, guild.me: ALLOW},
+                reason="Pre-creating a ticket channel"
+            )
+        )
+        await self.bot.database.write(
+            "INSERT INTO channel_pool (channel_id, guild_id, option_id, category_id) VALUES (?, ?, ?, ?)",
+            (channel.id, guild.id, option.option_id, option.category_id)
+        )
+        self._channels.setdefault(option.option_id, []).append(channel.id)
+
+    async def _forget(self, channel_id: int):
+        await self.bot.database.write("DELETE FROM channel_pool WHERE channel_id = ?", (channel_id,))
@@ -0,0 +1,106 @@
+import asyncio
+import heapq
+import time
+from typing import List, Optional, Tuple
+
+PENDING = 'pending'
+CONFIRMED = 'confirmed'
+EXPIRED = 'expired'
+
+REQUEST_COLUMNS = "message_id, guild_id, channel_id, creator_id, log_channel_id, reason, deadline"
+
+
+class CloseTimers:
+    """
+    Close requests posted by /closerequest, stored in ``close_requests``.
+
+    Requests with a timer are kept in one heap of (deadline, message id) and
+    a single task sleeps until the earliest deadline, then closes the ticket
+    through the closure queue. Pending deadlines are reloaded with one query
+    at startup, and the Confirm Close button looks its request up by message
+    id, so both survive a restart without keeping a view per request.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._heap: List[Tuple[float, int]] = []
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        rows = await self.bot.database.fetchall(
+            "SELECT deadline, message_id FROM close_requests WHERE status = ? AND deadline IS NOT NULL",
+            (PENDING,)
+        )
+        # Requests added before the reload are already queued; keep them.
+        queued = {message_id for _, message_id in self._heap}
+        self._heap.extend((deadline, message_id) for deadline, message_id in rows if message_id not in queued)
+        heapq.heapify(self._heap)
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def add(self, message_id: int, guild_id: int, channel_id: int, creator_id: int,
+                  log_channel_id: Optional[int], reason: str, hours: Optional[int] = None):
+        deadline = time.time() + hours * 3600 if hours else None
+        await self.bot.database.write(
+            f"""INSERT OR REPLACE INTO close_requests ({REQUEST_COLUMNS}, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            (message_id, guild_id, channel_id, creator_id, log_channel_id, reason, deadline, PENDING)
+        )
+        if deadline is not None:
+            heapq.heappush(self._heap, (deadline, message_id))
+            if self._heap[0][1] == message_id:
+                self._wake.set()
+
+    async def get(self, message_id: int) -> Optional[tuple]:
+        """The pending request posted as ``message_id``, if there is one."""
+        return await self.bot.database.fetchone(
+            f"SELECT {REQUEST_COLUMNS} FROM close_requests WHERE message_id = ? AND status = ?",
+            (message_id, PENDING)
+        )
+
+    async def resolve(self, message_id: int, status: str) -> bool:
+        """Mark a request done. Returns False if something else already resolved it."""
+        async def update(connection):
+            cursor = await connection.execute(
+                "UPDATE close_requests SET status = ? WHERE message_id = ? AND status = ?",
+                (status, message_id, PENDING)
+            )
+            return cursor.rowcount > 0
+        return await self.bot.database.transaction(update)
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            if not self._heap:
+                await self._wake.wait()
+                continue
+
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, message_id = heapq.heappop(self._heap)
+            try:
+                await self._expire(message_id)
+            except Exception as e:
+                print(f"Close request {message_id} could not be closed: {e}")
+
+    async def _expire(self, message_id: int):
+        request = await self.get(message_id)
+        if not request or not await self.resolve(message_id, EXPIRED):
+            return
+
+        _, guild_id, channel_id, creator_id, log_channel_id, reason, _ = request
+        guild = self.bot.get_guild(guild_id)
+        channel = guild.get_channel(channel_id) if guild else None
+        if channel is None:
+            return
+        await self.bot.closures.enqueue(channel, guild.me, reason, creator_id, log_channel_id)
@@ -0,0 +1,297 @@
+import asyncio
+from typing import List, Optional, Set
+import discord
+from . import config
+from .metrics import metrics
+from .rest_scheduler import BACKGROUND, USER, message_route
+from .transcripts import TranscriptWriter, compress_writer, save_blob, load_transcript
+from .transcript_search import index_transcript
+from .ticket_stats import record_closed
+from .queries import CLOSE_TICKET, INSERT_CLOSURE_JOB
+
+PENDING = 'pending'
+TRANSCRIPT = 'transcript'
+NOTIFIED = 'notified'
+DELETED = 'deleted'
+FAILED = 'failed'
+
+
+class ClosureJob:
+    __slots__ = (
+        'id', 'guild_id', 'channel_id', 'channel_name', 'ticket_id', 'closer_id', 'creator_id',
+        'log_channel_id', 'reason', 'force_close', 'state', 'attempts'
+    )
+
+    def __init__(self, row: tuple):
+        (self.id, self.guild_id, self.channel_id, self.channel_name, self.ticket_id, self.closer_id,
+         self.creator_id, self.log_channel_id, self.reason, force_close, self.state, self.attempts) = row
+        self.force_close = bool(force_close)
+
+
+JOB_COLUMNS = """id, guild_id, channel_id, channel_name, ticket_id, closer_id, creator_id,
+                 log_channel_id, reason, force_close, state, attempts"""
+
+
+class ClosureQueue:
+    """
+    Ticket closures as durable jobs in ``closure_jobs``.
+
+    A job moves pending -> transcript -> notified -> deleted, and each step
+    records its new state in the same commit as its effect, so a job picked
+    up again after a crash carries on from the first unfinished step rather
+    than posting twice or leaving the channel behind. Each step claims its
+    transition with a conditional UPDATE on the job's state, so a stale
+    second run of the same job stops instead of repeating it. CLOSURE_WORKERS
+    workers drain the queue; failed steps are retried with backoff up to
+    CLOSURE_MAX_ATTEMPTS times before the job is marked failed.
+    """
+
+    def __init__(self, bot, workers: int = config.CLOSURE_WORKERS):
+        self.bot = bot
+        self.worker_count = workers
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        # Jobs waiting in the queue, being run, or waiting out a retry.
+        self._queued: Set[int] = set()
+
+    async def start(self):
+        """Queue every unfinished job from before a restart and start the workers."""
+        rows = await self.bot.database.fetchall(
+            "SELECT id FROM closure_jobs WHERE state IN (?, ?, ?) ORDER BY id",
+            (PENDING, TRANSCRIPT, NOTIFIED)
+        )
+        for (job_id,) in rows:
+            self._put(job_id)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.worker_count)]
+
+    def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+
+    async def enqueue(self, channel: discord.TextChannel, closer: discord.abc.User, reason: str,
+                      creator_id: int, log_channel_id: Optional[int], force_close: bool = False) -> Optional[int]:
+        """Record a closure and queue it. Returns None if the channel already has one running."""
+        async def insert(connection):
+            cursor = await connection.execute(
+                "SELECT 1 FROM closure_jobs WHERE channel_id = ? AND state IN (?, ?, ?)",
+                (channel.id, PENDING, TRANSCRIPT, NOTIFIED)
+            )
+            if await cursor.fetchone():
+                return None
+            cursor = await connection.execute(
+                INSERT_CLOSURE_JOB,
+                (channel.guild.id, channel.id, channel.name, channel.id, closer.id, creator_id,
+                 log_channel_id, reason, int(force_close), PENDING)
+            )
+            return cursor.lastrowid
+
+        job_id = await self.bot.database.transaction(insert)
+        if job_id is not None:
+            self._put(job_id)
+        return job_id
+
+    def _put(self, job_id: int):
+        """Queue a job unless it is already queued or running."""
+        if job_id not in self._queued:
+            self._queued.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self.run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if await self._failed(job_id, e):
+                    # Queued again after the backoff; it stays claimed until then.
+                    continue
+            self._queued.discard(job_id)
+
+    async def _failed(self, job_id: int, error: Exception) -> bool:
+        """Record a failed attempt. Returns True if the job will be retried."""
+        row = await self.bot.database.fetchone("SELECT attempts FROM closure_jobs WHERE id = ?", (job_id,))
+        attempts = (row[0] if row else 0) + 1
+        gave_up = attempts >= config.CLOSURE_MAX_ATTEMPTS
+        if gave_up:
+            await self.bot.database.write(
+                "UPDATE closure_jobs SET attempts = ?, error = ?, state = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (attempts, str(error), FAILED, job_id)
+            )
+            print(f"Closure job {job_id} failed after {attempts} attempts: {error}")
+            return False
+        else:
+            await self.bot.database.write(
+                "UPDATE closure_jobs SET attempts = ?, error = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (attempts, str(error), job_id)
+            )
+            delay = config.CLOSURE_RETRY_SECONDS * 2 ** (attempts - 1)
+            asyncio.get_running_loop().call_later(delay, self._queue.put_nowait, job_id)
+            return True
+
+    async def _set_state(self, job: ClosureJob, state: str) -> bool:
+        """Move the job on from the state it was read in. False if something else already did."""
+        async def update(connection):
+            return await self._claim(connection, job, state)
+        if not await self.bot.database.transaction(update):
+            return False
+        job.state = state
+        return True
+
+    @staticmethod
+    async def _claim(connection, job: ClosureJob, state: str) -> bool:
+        cursor = await connection.execute(
+            "UPDATE closure_jobs SET state = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ? AND state = ?",
+            (state, job.id, job.state)
+        )
+        return cursor.rowcount > 0
+
+    async def run(self, job_id: int):
+        row = await self.bot.database.fetchone(f"SELECT {JOB_COLUMNS} FROM closure_jobs WHERE id = ?", (job_id,))
+        if not row:
+            return
+        job = ClosureJob(row)
+        guild = self.bot.get_guild(job.guild_id)
+        channel = guild.get_channel(job.channel_id) if guild else None
+
+        transcript = TranscriptWriter()
+        try:
+            if job.state == PENDING:
+                with metrics.span("ticket_close_seconds", stage="transcript"):
+                    if not await self.store_transcript(job, channel, transcript):
+                        return
+                metrics.inc("tickets_closed_total", guild=job.guild_id)
+            elif job.state == TRANSCRIPT and job.ticket_id is not None:
+                # Resumed after the transcript was saved; rebuild the upload from storage.
+                text = await load_transcript(self.bot.database, job.ticket_id)
+                if text:
+                    transcript.write_line(text)
+
+            if job.state == TRANSCRIPT:
+                if guild:
+                    with metrics.span("ticket_close_seconds", stage="notify"):
+                        await self.notify(job, guild, transcript)
+                if not await self._set_state(job, NOTIFIED):
+                    return
+        finally:
+            transcript.close()
+
+        if job.state == NOTIFIED:
+            if channel:
+                try:
+                    with metrics.span("ticket_close_seconds", stage="delete"):
+                        await self.bot.rest.run(
+                            job.guild_id, "channel_delete", USER,
+                            lambda: channel.delete(reason=self.delete_reason(job, guild))
+                        )
+                except discord.NotFound:
+                    pass
+            await self._set_state(job, DELETED)
+
+    @staticmethod
+    def delete_reason(job: ClosureJob, guild: discord.Guild) -> str:
+        if job.force_close:
+            return f"Ticket force closed by {guild.get_member(job.closer_id) or job.closer_id}"
+        return "Ticket closed by confirmation."
+
+    async def store_transcript(self, job: ClosureJob, channel: Optional[discord.TextChannel],
+                               transcript: TranscriptWriter) -> bool:
+        """
+        Save the transcript and close the ticket row, moving the job to
+        TRANSCRIPT. False if another run already did, in which case nothing
+        is written.
+        """
+        capture = self.bot.transcript_capture
+        if channel:
+            captured = await capture.write_transcript(channel, transcript)
+            if not captured:
+                await transcript.write_history(channel)
+        else:
+            captured = False
+
+        transcript_hash, transcript_size, data = await compress_writer(transcript)
+
+        async def close_row(connection):
+            if not await self._claim(connection, job, TRANSCRIPT):
+                return False
+            await save_blob(connection, transcript_hash, transcript_size, data)
+            await record_closed(connection, job.channel_id, job.closer_id)
+            await connection.execute(
+                CLOSE_TICKET,
+                (job.reason, transcript_hash, transcript_size, len(data), job.channel_id)
+            )
+            if job.ticket_id is not None:
+                # Indexed straight from the spool, a chunk at a time.
+                await index_transcript(connection, job.ticket_id, job.guild_id, transcript.lines())
+            return True
+
+        if not await self.bot.database.transaction(close_row):
+            return False
+        job.state = TRANSCRIPT
+        if captured:
+            await capture.discard(job.channel_id)
+        else:
+            capture.untrack(job.channel_id)
+        return True
+
+    async def notify(self, job: ClosureJob, guild: discord.Guild, transcript: TranscriptWriter):
+        """Post the log entry and DM the creator, each as one message with the transcript."""
+        closer = f"<@{job.closer_id}>"
+        title = "Ticket Forcefully Closed" if job.force_close else "Ticket Closed"
+        color = discord.Color.red() if job.force_close else discord.Color.blue()
+
+        closure_embed = discord.Embed(
+            title=title,
+            description=f"Your ticket in **{guild.name}** has been {'forcefully ' if job.force_close else ''}closed by {closer}\n\n**Reason:** {job.reason}",
+            color=color,
+            timestamp=discord.utils.utcnow()
+        )
+
+        log_embed = discord.Embed(
+            title=title,
+            description=f"**Ticket:** {job.channel_name}\n**Closed by:** {closer}\n**Reason:** {job.reason}",
+            color=color,
+            timestamp=discord.utils.utcnow()
+        )
+
+        # Log and DM go out together, each as one message carrying its transcript
+        deliveries = []
+        if job.log_channel_id:
+            log_channel = guild.get_channel(job.log_channel_id)
+            if log_channel:
+                async def log_message():
+                    return {'embed': log_embed, 'file': await transcript.file(job.channel_name)}
+                deliveries.append(self.deliver(guild.id, message_route(log_channel), log_channel, log_message))
+
+        creator = guild.get_member(job.creator_id)
+        if creator:
+            async def dm_message():
+                return {'embed': closure_embed, 'file': await transcript.file(job.channel_name)}
+            deliveries.append(self.deliver(guild.id, "dm", creator, dm_message))
+
+        await asyncio.gather(*deliveries)
+
+    async def deliver(self, guild_id: int, route: str, destination: discord.abc.Messageable, build) -> bool:
+        """
+        Send one closure notification, retrying transient failures. ``build``
+        is awaited for fresh send kwargs each attempt, since a File can only
+        be read once. Failures are logged rather than raised so one branch can't
+        cancel the other.
+        """
+        for attempt in range(config.CLOSE_NOTIFY_RETRIES + 1):
+            try:
+                kwargs = await build()
+                await self.bot.rest.run(guild_id, route, BACKGROUND, lambda: destination.send(**kwargs))
+                return True
+            except discord.Forbidden:
+                return False
+            except discord.HTTPException as e:
+                if attempt == config.CLOSE_NOTIFY_RETRIES:
+                    print(f"Could not deliver closure notice to {destination}: {e}")
+                    return False
+                await asyncio.sleep(2 ** attempt)
+        return False
@@ -0,0 +1,99 @@
+import os
+from dotenv import load_dotenv
+
+# Loaded here as well as in bot.py so module-level settings see the .env
+# values no matter which module is imported first.
+load_dotenv()
+
+
+def _int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Panel cache
+PANEL_CACHE_MAX_GUILDS = _int("PANEL_CACHE_MAX_GUILDS", 500)
+
+# Transcripts
+TRANSCRIPT_SPOOL_BYTES = _int("TRANSCRIPT_SPOOL_BYTES", 1024 * 1024)
+TRANSCRIPT_GZIP = _bool("TRANSCRIPT_GZIP", False)
+TRANSCRIPT_CAPTURE = _bool("TRANSCRIPT_CAPTURE", False)
+TRANSCRIPT_CAPTURE_FLUSH_ROWS = _int("TRANSCRIPT_CAPTURE_FLUSH_ROWS", 200)
+TRANSCRIPT_CAPTURE_FLUSH_SECONDS = _float("TRANSCRIPT_CAPTURE_FLUSH_SECONDS", 2.0)
+TRANSCRIPT_COMPRESSION_LEVEL = _int("TRANSCRIPT_COMPRESSION_LEVEL", 6)
+TRANSCRIPT_MIGRATION_BATCH = _int("TRANSCRIPT_MIGRATION_BATCH", 200)
+
+# Transcript search: best chunks kept per term, within the guild, before tickets are joined and paged
+SEARCH_CANDIDATES = _int("SEARCH_CANDIDATES", 1000)
+
+# Database
+DB_READERS = _int("DB_READERS", 3)
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()
+DB_BUSY_TIMEOUT_MS = _int("DB_BUSY_TIMEOUT_MS", 5000)
+# Group commit: how long the writer waits for more jobs before committing,
+# and the most jobs it will put in one transaction. 0 ms commits as soon as
+# the queue is empty (lowest latency); a few ms trades latency for fewer fsyncs.
+DB_BATCH_WINDOW_MS = _float("DB_BATCH_WINDOW_MS", 2.0)
+DB_BATCH_MAX = _int("DB_BATCH_MAX", 64)
+# Per-statement timings for /db_stats; statements slower than
+# DB_SLOW_QUERY_MS are logged with their query plan.
+DB_PROFILE = _bool("DB_PROFILE", False)
+DB_SLOW_QUERY_MS = _float("DB_SLOW_QUERY_MS", 100.0)
+
+# Pre-created ticket channels (CHANNEL_POOL_MAX = 0 disables the pool)
+CHANNEL_POOL_MAX = _int("CHANNEL_POOL_MAX", 0)
+CHANNEL_POOL_MIN = _int("CHANNEL_POOL_MIN", 0)
+CHANNEL_POOL_HEADROOM = _float("CHANNEL_POOL_HEADROOM", 0.25)
+CHANNEL_POOL_RATE_WINDOW = _float("CHANNEL_POOL_RATE_WINDOW", 3600.0)
+CHANNEL_POOL_REFILL_DELAY = _float("CHANNEL_POOL_REFILL_DELAY", 5.0)
+
+# Outbound REST scheduling
+REST_GUILD_RATE = _float("REST_GUILD_RATE", 5.0)
+REST_GUILD_BURST = _float("REST_GUILD_BURST", 10.0)
+REST_ROUTE_RATE = _float("REST_ROUTE_RATE", 1.0)
+REST_ROUTE_BURST = _float("REST_ROUTE_BURST", 5.0)
+REST_GUILD_CONCURRENCY = _int("REST_GUILD_CONCURRENCY", 4)
+REST_RETRIES = _int("REST_RETRIES", 2)
+REST_MAX_ROUTES = _int("REST_MAX_ROUTES", 5000)
+
+# Ticket closure
+CLOSE_NOTIFY_RETRIES = _int("CLOSE_NOTIFY_RETRIES", 2)
+CLOSURE_WORKERS = _int("CLOSURE_WORKERS", 2)
+CLOSURE_MAX_ATTEMPTS = _int("CLOSURE_MAX_ATTEMPTS", 5)
+CLOSURE_RETRY_SECONDS = _float("CLOSURE_RETRY_SECONDS", 10.0)
+
+# Startup
+COMMAND_SYNC_FORCE = _bool("COMMAND_SYNC_FORCE", False)
+
+# Setup wizard
+SETUP_STEP_TIMEOUT = _float("SETUP_STEP_TIMEOUT", 300.0)
+SETUP_SESSION_TTL = _float("SETUP_SESSION_TTL", 3600.0)
+SETUP_SESSION_MAX = _int("SETUP_SESSION_MAX", 200)
+
+# Panel import/export
+PANEL_IMPORT_MAX_BYTES = _int("PANEL_IMPORT_MAX_BYTES", 1024 * 1024)
+
+# Metrics (METRICS_PORT = 0 keeps the HTTP endpoint off)
+METRICS_PORT = _int("METRICS_PORT", 0)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_ENABLED = _bool("METRICS_ENABLED", METRICS_PORT > 0)
+
+# Archival of old closed tickets (ARCHIVE_AFTER_DAYS = 0 keeps everything in the database)
+ARCHIVE_AFTER_DAYS = _int("ARCHIVE_AFTER_DAYS", 0)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_INTERVAL_HOURS = _float("ARCHIVE_INTERVAL_HOURS", 6.0)
+ARCHIVE_BATCH = _int("ARCHIVE_BATCH", 200)
+ARCHIVE_SEGMENT_BYTES = _int("ARCHIVE_SEGMENT_BYTES", 64 * 1024 * 1024)
+ARCHIVE_VACUUM_PAGES = _int("ARCHIVE_VACUUM_PAGES", 2000)
@@ -0,0 +1,219 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+import aiosqlite
+from . import config
+from .metrics import metrics, statement_name
+from .query_profiler import ProfiledConnection, QueryProfiler
+
+
+class Database:
+    """
+    SQLite access for the bot: one writer connection fed by a queue, and a
+    small pool of read-only connections.
+
+    The database runs in WAL mode, so reads from the pool never wait on the
+    writer's transactions or commits. All writes are serialized through
+    ``write``/``write_many``/``transaction``. Jobs that queue up together
+    (within DB_BATCH_WINDOW_MS, up to DB_BATCH_MAX) share one transaction
+    and one commit, each isolated by a savepoint; every awaitable resolves
+    only once the commit holding its write has finished.
+    """
+
+    def __init__(self, path: str, readers: int = config.DB_READERS):
+        self.path = path
+        self.reader_count = readers
+        self.writer: Optional[aiosqlite.Connection] = None
+        self._readers: "asyncio.Queue[aiosqlite.Connection]" = asyncio.Queue()
+        self._all_readers: List[aiosqlite.Connection] = []
+        self._jobs: asyncio.Queue = asyncio.Queue()
+        self._writer_task: Optional[asyncio.Task] = None
+        self.profiler = QueryProfiler(self)
+        self.stats = {
+            'batches': 0,
+            'jobs': 0,
+            'failed': 0,
+            'max_batch': 0,
+            'commit_seconds': 0.0,
+            'max_commit_seconds': 0.0
+        }
+
+    async def open(self) -> aiosqlite.Connection:
+        """Open the writer connection. Schema setup runs on it before ``start``."""
+        self.writer = await aiosqlite.connect(self.path)
+        await self.writer.execute("PRAGMA journal_mode = WAL")
+        await self.writer.execute(f"PRAGMA synchronous = {config.DB_SYNCHRONOUS}")
+        await self.writer.execute(f"PRAGMA busy_timeout = {config.DB_BUSY_TIMEOUT_MS}")
+        return self.writer
+
+    async def start(self):
+        """Open the read pool and start draining the write queue."""
+        for _ in range(self.reader_count):
+            reader = await aiosqlite.connect(f"file:{self.path}?mode=ro", uri=True)
+            await reader.execute(f"PRAGMA busy_timeout = {config.DB_BUSY_TIMEOUT_MS}")
+            self._all_readers.append(reader)
+            self._readers.put_nowait(reader)
+        self._writer_task = asyncio.create_task(self._write_loop())
+
+    async def close(self):
+        if self._writer_task:
+            self._writer_task.cancel()
+        for reader in self._all_readers:
+            await reader.close()
+        if self.writer:
+            await self.writer.close()
+
+    # Reads
+
+    @asynccontextmanager
+    async def reader(self):
+        connection = await self._readers.get()
+        try:
+            yield connection
+        finally:
+            self._readers.put_nowait(connection)
+
+    async def fetchall(self, query: str, parameters: tuple = ()) -> List[tuple]:
+        with metrics.span("db_query_seconds", op="fetchall", statement=statement_name(query)):
+            async with self.reader() as connection:
+                started = time.perf_counter()
+                async with connection.execute(query, parameters) as cursor:
+                    rows = await cursor.fetchall()
+                self.profiler.record(query, parameters, time.perf_counter() - started, len(rows))
+                return rows
+
+    async def fetchone(self, query: str, parameters: tuple = ()) -> Optional[tuple]:
+        with metrics.span("db_query_seconds", op="fetchone", statement=statement_name(query)):
+            async with self.reader() as connection:
+                started = time.perf_counter()
+                async with connection.execute(query, parameters) as cursor:
+                    row = await cursor.fetchone()
+                self.profiler.record(query, parameters, time.perf_counter() - started, int(row is not None))
+                return row
+
+    async def iterate(self, query: str, parameters: tuple = (), size: int = 500):
+        """Yield rows in batches of ``size`` without loading the whole result."""
+        async with self.reader() as connection:
+            # Only time spent fetching counts, not the caller's work between batches.
+            seconds = 0.0
+            count = 0
+            started = time.perf_counter()
+            async with connection.execute(query, parameters) as cursor:
+                while True:
+                    rows = await cursor.fetchmany(size)
+                    seconds += time.perf_counter() - started
+                    if not rows:
+                        break
+                    count += len(rows)
+                    for row in rows:
+                        yield row
+                    started = time.perf_counter()
+            self.profiler.record(query, parameters, seconds, count)
+
+    # Writes
+
+    async def transaction(self, job: Callable[[aiosqlite.Connection], Awaitable[Any]]) -> Any:
+        """
+        Run ``job(connection)`` on the writer and wait for it to be committed.
+        Nothing else writes in between; if the job raises, only its own
+        changes are rolled back. Jobs must not commit themselves.
+        """
+        with metrics.span("db_query_seconds", op="transaction", statement=job.__qualname__.replace(".<locals>", "")):
+            return await self._submit(job)
+
+    async def _submit(self, job: Callable[[aiosqlite.Connection], Awaitable[Any]]) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._jobs.put_nowait((job, future))
+        return await future
+
+    async def write(self, query: str, parameters: tuple = ()) -> int:
+        """Run a single statement and wait for its commit. Returns the cursor's lastrowid."""
+        async def job(connection):
+            cursor = await connection.execute(query, parameters)
+            return cursor.lastrowid
+        with metrics.span("db_query_seconds", op="write", statement=statement_name(query)):
+            return await self._submit(job)
+
+    async def write_many(self, query: str, parameters: Iterable[tuple]):
+        parameters = list(parameters)
+        if not parameters:
+            return
+
+        async def job(connection):
+            await connection.executemany(query, parameters)
+        with metrics.span("db_query_seconds", op="write_many", statement=statement_name(query)):
+            await self._submit(job)
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._jobs.get()]
+            if config.DB_BATCH_WINDOW_MS and self._jobs.empty():
+                # Let concurrent writers join this commit.
+                await asyncio.sleep(config.DB_BATCH_WINDOW_MS / 1000)
+            while len(batch) < config.DB_BATCH_MAX and not self._jobs.empty():
+                batch.append(self._jobs.get_nowait())
+            try:
+                await self._run_batch(batch, loop)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The batch couldn't even start or finish cleanly; fail it and keep serving.
+                if self.writer.in_transaction:
+                    await self.writer.rollback()
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _run_batch(self, batch: list, loop: asyncio.AbstractEventLoop):
+        """Run every job in one transaction, each under its own savepoint."""
+        results = []
+        connection = ProfiledConnection(self.writer, self.profiler) if self.profiler.enabled else self.writer
+        await self.writer.execute("BEGIN")
+        for job, future in batch:
+            await self.writer.execute("SAVEPOINT job")
+            try:
+                result = await job(connection)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self.writer.execute("ROLLBACK TO job")
+                await self.writer.execute("RELEASE job")
+                results.append((future, None, e))
+                self.stats['failed'] += 1
+            else:
+                await self.writer.execute("RELEASE job")
+                results.append((future, result, None))
+
+        started = loop.time()
+        try:
+            await self.writer.commit()
+        except Exception as e:
+            await self.writer.rollback()
+            results = [(future, None, error or e) for future, _, error in results]
+        commit_time = loop.time() - started
+        metrics.observe("db_commit_seconds", commit_time)
+
+        self.stats['batches'] += 1
+        self.stats['jobs'] += len(batch)
+        self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+        self.stats['commit_seconds'] += commit_time
+        self.stats['max_commit_seconds'] = max(self.stats['max_commit_seconds'], commit_time)
+
+        for future, result, error in results:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def write_stats(self) -> dict:
+        batches = self.stats['batches']
+        return {
+            **self.stats,
+            'queued': self._jobs.qsize(),
+            'avg_batch': self.stats['jobs'] / batches if batches else 0.0,
+            'avg_commit_ms': self.stats['commit_seconds'] * 1000 / batches if batches else 0.0
+        }
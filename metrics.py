@@ -0,0 +1,200 @@
+import bisect
+import re
+import time
+from typing import Callable, Dict, Optional, Tuple
+from aiohttp import web
+from . import config
+
+# Seconds; covers a fast SQLite read up to a slow modal or upload.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+DESCRIPTIONS = {
+    'ticket_open_seconds': "Time spent in each stage of opening a ticket.",
+    'ticket_close_seconds': "Time spent in each stage of closing a ticket.",
+    'ticket_stage_errors_total': "Ticket stages that raised.",
+    'tickets_opened_total': "Tickets opened.",
+    'tickets_closed_total': "Tickets closed.",
+    'db_query_seconds': "Database calls by statement, including queue and commit waits for writes.",
+    'db_commit_seconds': "Time each group commit took.",
+    'rest_wait_seconds': "Time REST calls spent queued before being sent.",
+    'rest_rate_limited_total': "REST calls answered with a 429.",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(BUCKETS, value)
+        if index < len(BUCKETS):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Span:
+    """Times a ``with`` block into a histogram; a raise also counts as a stage error."""
+    __slots__ = ('metrics', 'name', 'labels', 'started')
+
+    def __init__(self, metrics: "Metrics", name: str, labels: dict):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, kind, error, traceback):
+        self.metrics.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        if kind is not None and issubclass(kind, Exception):
+            self.metrics.inc('ticket_stage_errors_total', metric=self.name, **self.labels)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, error, traceback):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class Metrics:
+    """
+    In-process counters, histograms and gauges, rendered in the Prometheus
+    text format.
+
+    Disabled (the default), ``span`` hands back a shared no-op context
+    manager and ``inc``/``observe`` return straight away, so instrumented
+    code pays a method call and nothing else.
+    """
+
+    def __init__(self, enabled: bool = config.METRICS_ENABLED):
+        self.enabled = enabled
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+
+    def span(self, name: str, **labels):
+        if not self.enabled:
+            return NO_SPAN
+        return Span(self, name, labels)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        series = self._counters.setdefault(name, {})
+        key = _key(labels)
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        if not self.enabled:
+            return
+        series = self._histograms.setdefault(name, {})
+        key = _key(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(seconds)
+
+    def gauge(self, name: str, read: Callable[[], float], description: Optional[str] = None):
+        """Report ``read()`` under ``name`` each time metrics are rendered."""
+        self._gauges[name] = read
+        if description:
+            DESCRIPTIONS[name] = description
+
+    def render(self) -> str:
+        lines = []
+
+        def header(name: str, kind: str):
+            if name in DESCRIPTIONS:
+                lines.append(f"# HELP {name} {DESCRIPTIONS[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name, series in sorted(self._counters.items()):
+            header(name, "counter")
+            for labels, value in series.items():
+                lines.append(f"{name}{_labels(labels)} {value}")
+
+        for name, series in sorted(self._histograms.items()):
+            header(name, "histogram")
+            for labels, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+
+        for name, read in sorted(self._gauges.items()):
+            try:
+                value = read()
+            except Exception:
+                continue
+            header(name, "gauge")
+            lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _key(labels: dict) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+_STATEMENT = re.compile(r"^\s*(\w+)\s+(?:.*?\b(?:FROM|INTO)\s+)?(\w+)", re.IGNORECASE | re.DOTALL)
+_statement_names: Dict[str, str] = {}
+
+
+def statement_name(query: str) -> str:
+    """A short, low-cardinality label for a query: its verb and main table."""
+    name = _statement_names.get(query)
+    if name is None:
+        match = _STATEMENT.match(query)
+        name = f"{match[1].lower()} {match[2]}" if match else "other"
+        if len(_statement_names) < 1000:
+            _statement_names[query] = name
+    return name
+
+
+async def start_server(metrics: Metrics, host: str, port: int) -> web.AppRunner:
+    """Serve ``GET /metrics`` on the aiohttp stack discord.py already uses."""
+    async def handle(request):
+        return web.Response(
+            body=metrics.render().encode("utf-8"),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+metrics = Metrics()
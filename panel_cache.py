@@ -0,0 +1,181 @@
+import asyncio
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from . import config
+from .panel_index import PanelSearchIndex
+from .queries import GUILD_OPTION_QUESTIONS, GUILD_OPTION_ROLES, GUILD_PANELS
+
+
+class PanelCache:
+    """
+    Per-guild cache of panels and their ticket options, parsed once on load,
+    plus a name index per guild for autocomplete.
+
+    Guilds are loaded lazily on first access and evicted least-recently-used
+    once more than ``max_guilds`` are held. Commands that change panels write
+    through with ``put_panel``/``remove_panel``/``clear_guild`` so the cache
+    never has to be re-read after a change.
+    """
+
+    def __init__(self, bot, max_guilds: int = config.PANEL_CACHE_MAX_GUILDS):
+        self.bot = bot
+        self.max_guilds = max_guilds
+        self._guilds: "OrderedDict[int, Dict[str, dict]]" = OrderedDict()
+        self._indexes: Dict[int, PanelSearchIndex] = {}
+        self._loading: Dict[int, asyncio.Future] = {}
+        self._stale: set = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get_panels(self, guild_id: int) -> Dict[str, dict]:
+        """Return ``{panel_name: panel}`` for a guild, loading it if needed."""
+        panels = self._guilds.get(guild_id)
+        if panels is not None:
+            self.hits += 1
+            self._guilds.move_to_end(guild_id)
+            return panels
+
+        self.misses += 1
+        pending = self._loading.get(guild_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[guild_id] = future
+        try:
+            panels = await self._load(guild_id)
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting.
+            future.exception()
+            raise
+        finally:
+            del self._loading[guild_id]
+
+        # A write landed while we were reading; serve this result once but
+        # don't keep it, the next call reloads.
+        if guild_id in self._stale:
+            self._stale.discard(guild_id)
+        else:
+            self._store(guild_id, panels)
+        future.set_result(panels)
+        return panels
+
+    async def get_panel(self, guild_id: int, panel_name: str) -> Optional[dict]:
+        return (await self.get_panels(guild_id)).get(panel_name)
+
+    async def get_panel_by_id(self, guild_id: int, panel_id: int) -> Optional[dict]:
+        for panel in (await self.get_panels(guild_id)).values():
+            if panel['id'] == panel_id:
+                return panel
+        return None
+
+    async def preload(self, guild_ids: List[int]):
+        """Warm the cache for ``guild_ids``, up to its capacity."""
+        for guild_id in guild_ids[:self.max_guilds]:
+            await self.get_panels(guild_id)
+
+    async def search(self, guild_id: int, current: str, limit: int = 25) -> List[str]:
+        """Panel names matching ``current``, prefix matches first."""
+        panels = await self.get_panels(guild_id)
+        index = self._indexes.get(guild_id)
+        if index is None:
+            # The load raced a write and wasn't kept; index this result directly.
+            index = PanelSearchIndex(panels)
+        return index.search(current, limit)
+
+    async def get_options(self, guild_id: int) -> List[dict]:
+        """All ticket options across a guild's panels."""
+        panels = await self.get_panels(guild_id)
+        return [option for panel in panels.values() for option in panel['options']]
+
+    async def _load(self, guild_id: int) -> Dict[str, dict]:
+        rows = await self.bot.database.fetchall(GUILD_PANELS, (guild_id,))
+        roles = await self._load_children(GUILD_OPTION_ROLES, guild_id)
+        questions = await self._load_children(GUILD_OPTION_QUESTIONS, guild_id)
+
+        panels: Dict[str, dict] = {}
+        for row in rows:
+            panel = panels.get(row[1])
+            if panel is None or panel['id'] != row[0]:
+                panel = {
+                    'id': row[0],
+                    'panel_name': row[1],
+                    'embed_title': row[2],
+                    'embed_description': row[3],
+                    'embed_color': row[4],
+                    'category_id': row[5],
+                    'log_channel_id': row[6],
+                    'options': []
+                }
+                panels[row[1]] = panel
+            if row[7] is not None:
+                panel['options'].append(self.build_option(
+                    row[7], row[8], roles.get(row[7], []), row[9], row[10], row[11],
+                    questions.get(row[7], []), panel['log_channel_id']
+                ))
+        return panels
+
+    async def _load_children(self, query: str, guild_id: int) -> Dict[int, list]:
+        children: Dict[int, list] = {}
+        for option_id, value in await self.bot.database.fetchall(query, (guild_id,)):
+            children.setdefault(option_id, []).append(value)
+        return children
+
+    @staticmethod
+    def build_option(option_id, name, roles, category_id, embed_title, embed_description,
+                     questions, log_channel_id) -> dict:
+        return {
+            "id": option_id,
+            "name": name,
+            "roles": [str(role) for role in roles],
+            "category_id": category_id,
+            "embed_title": embed_title,
+            "embed_description": embed_description,
+            "questions": list(questions),
+            "log_channel_id": log_channel_id
+        }
+
+    def _store(self, guild_id: int, panels: Dict[str, dict]):
+        self._guilds[guild_id] = panels
+        self._guilds.move_to_end(guild_id)
+        self._indexes[guild_id] = PanelSearchIndex(panels)
+        while len(self._guilds) > self.max_guilds:
+            evicted, _ = self._guilds.popitem(last=False)
+            del self._indexes[evicted]
+            self.evictions += 1
+
+    def _cached(self, guild_id: int) -> Optional[Dict[str, dict]]:
+        if guild_id in self._loading:
+            self._stale.add(guild_id)
+        return self._guilds.get(guild_id)
+
+    def put_panel(self, guild_id: int, panel: dict):
+        """Insert or replace a panel after it has been written to the database."""
+        panels = self._cached(guild_id)
+        if panels is not None:
+            panels[panel['panel_name']] = panel
+            self._indexes[guild_id].add(panel['panel_name'])
+
+    def remove_panel(self, guild_id: int, panel_name: str):
+        panels = self._cached(guild_id)
+        if panels is not None:
+            panels.pop(panel_name, None)
+            self._indexes[guild_id].remove(panel_name)
+
+    def clear_guild(self, guild_id: int):
+        """The guild's panels were all deleted; remember it as empty."""
+        self._cached(guild_id)
+        self._store(guild_id, {})
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'guilds': len(self._guilds),
+            'max_guilds': self.max_guilds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,101 @@
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Set
+
+GRAM_SIZE = 3
+
+
+def _grams(text: str) -> Set[str]:
+    """Every substring of ``text`` up to GRAM_SIZE characters long."""
+    grams = set()
+    for size in range(1, GRAM_SIZE + 1):
+        for start in range(len(text) - size + 1):
+            grams.add(text[start:start + size])
+    return grams
+
+
+class PanelSearchIndex:
+    """
+    Case-insensitive name index for one guild's panels.
+
+    Prefix lookups bisect a sorted list of lowered names. Substring lookups
+    intersect n-gram posting sets (1 to GRAM_SIZE characters) and only verify
+    the few names that survive. Prefix matches are ranked first.
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self._sorted: List[tuple] = []
+        self._grams: Dict[str, Set[str]] = {}
+        self._lowered: Dict[str, str] = {}
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self._lowered)
+
+    def add(self, name: str):
+        if name in self._lowered:
+            return
+        lowered = name.lower()
+        self._lowered[name] = lowered
+        insort(self._sorted, (lowered, name))
+        for gram in _grams(lowered):
+            self._grams.setdefault(gram, set()).add(name)
+
+    def remove(self, name: str):
+        lowered = self._lowered.pop(name, None)
+        if lowered is None:
+            return
+        index = bisect_left(self._sorted, (lowered, name))
+        if index < len(self._sorted) and self._sorted[index] == (lowered, name):
+            del self._sorted[index]
+        for gram in _grams(lowered):
+            names = self._grams.get(gram)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self._grams[gram]
+
+    def search(self, query: str, limit: int = 25) -> List[str]:
+        query = query.lower()
+        if not query:
+            return [name for _, name in self._sorted[:limit]]
+
+        results = []
+        index = bisect_left(self._sorted, (query,))
+        while index < len(self._sorted) and len(results) < limit:
+            lowered, name = self._sorted[index]
+            if not lowered.startswith(query):
+                break
+            results.append(name)
+            index += 1
+        if len(results) >= limit:
+            return results
+
+        candidates = self._substring_candidates(query)
+        if not candidates:
+            return results
+        prefixed = set(results)
+        matches = sorted(
+            (self._lowered[name], name) for name in candidates
+            if name not in prefixed and query in self._lowered[name]
+        )
+        results.extend(name for _, name in matches[:limit - len(results)])
+        return results
+
+    def _substring_candidates(self, query: str) -> Set[str]:
+        if len(query) <= GRAM_SIZE:
+            return self._grams.get(query, set())
+
+        postings = []
+        for start in range(len(query) - GRAM_SIZE + 1):
+            names = self._grams.get(query[start:start + GRAM_SIZE])
+            if not names:
+                return set()
+            postings.append(names)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for names in postings[1:]:
+            candidates &= names
+            if not candidates:
+                break
+        return candidates
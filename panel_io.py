@@ -0,0 +1,286 @@
+import json
+from typing import Dict, List, Optional, Tuple
+import discord
+from .panel_cache import PanelCache
+
+EXPORT_VERSION = 1
+
+# Discord limits that a panel has to fit to be sendable.
+MAX_OPTIONS = 25            # select menu options
+MAX_QUESTIONS = 5           # text inputs in a modal
+MAX_OPTION_NAME = 100       # select option label
+MAX_EMBED_TITLE = 256
+MAX_EMBED_DESCRIPTION = 4096
+
+PANEL_FIELDS = ('panel_name', 'embed_title', 'embed_description', 'embed_color', 'category_id', 'log_channel_id')
+DEFAULT_COLOR = str(discord.Color.blue().value)
+
+
+def normalize_panel(panel: dict) -> dict:
+    """A panel (cached or imported) in export form: no row ids, role ids as ints."""
+    return {
+        **{field: panel.get(field) for field in PANEL_FIELDS},
+        'embed_color': str(panel.get('embed_color') or DEFAULT_COLOR),
+        'options': [
+            {
+                'name': option['name'],
+                'category_id': option['category_id'],
+                'embed_title': option['embed_title'],
+                'embed_description': option['embed_description'],
+                'roles': [int(role) for role in option.get('roles', [])],
+                'questions': list(option.get('questions', []))
+            }
+            for option in panel['options']
+        ]
+    }
+
+
+def export_panels(panels: Dict[str, dict]) -> dict:
+    """A guild's cached panels as a JSON-ready template."""
+    return {
+        'version': EXPORT_VERSION,
+        'panels': [normalize_panel(panel) for panel in panels.values()]
+    }
+
+
+def _text(errors: List[str], where: str, value, name: str, limit: int, required: bool = True):
+    if value is None and not required:
+        return
+    if not isinstance(value, str) or (required and not value.strip()):
+        errors.append(f"{where}: `{name}` must be a non-empty string")
+    elif len(value) > limit:
+        errors.append(f"{where}: `{name}` is longer than {limit} characters")
+
+
+def _snowflake(errors: List[str], where: str, value, name: str, required: bool = False):
+    if value is None and not required:
+        return
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        errors.append(f"{where}: `{name}` must be a channel/role id")
+
+
+def _in_guild(errors: List[str], where: str, value, name: str, kind: str, lookup):
+    # Only well-formed ids are looked up; _snowflake has already reported the rest.
+    if isinstance(value, int) and not isinstance(value, bool) and value > 0 and not lookup(value):
+        errors.append(f"{where}: `{name}` {value} is not a {kind} in this server")
+
+
+def validate_import(document, guild: Optional[discord.Guild] = None) -> Tuple[List[dict], List[str]]:
+    """
+    Check an export document. Returns its panels and a list of problems.
+    With ``guild``, category, log channel and role ids must also exist there.
+    """
+    errors: List[str] = []
+    if not isinstance(document, dict) or not isinstance(document.get('panels'), list):
+        return [], ["The file must be an object with a `panels` list."]
+    if document.get('version') != EXPORT_VERSION:
+        errors.append(f"Unsupported export version {document.get('version')!r}.")
+
+    def category(channel_id: int) -> bool:
+        channel = guild.get_channel(channel_id)
+        return channel is not None and channel.type == discord.ChannelType.category
+
+    def text_channel(channel_id: int) -> bool:
+        channel = guild.get_channel(channel_id)
+        return channel is not None and channel.type in (discord.ChannelType.text, discord.ChannelType.news)
+
+    seen = set()
+    for index, panel in enumerate(document['panels']):
+        where = f"panels[{index}]"
+        if not isinstance(panel, dict):
+            errors.append(f"{where}: must be an object")
+            continue
+        _text(errors, where, panel.get('panel_name'), 'panel_name', MAX_OPTION_NAME)
+        _text(errors, where, panel.get('embed_title'), 'embed_title', MAX_EMBED_TITLE)
+        _text(errors, where, panel.get('embed_description'), 'embed_description', MAX_EMBED_DESCRIPTION)
+        if not isinstance(panel.get('embed_color'), (str, int, type(None))):
+            errors.append(f"{where}: `embed_color` must be a color value")
+        _snowflake(errors, where, panel.get('category_id'), 'category_id')
+        _snowflake(errors, where, panel.get('log_channel_id'), 'log_channel_id')
+        if guild is not None:
+            _in_guild(errors, where, panel.get('category_id'), 'category_id', "category", category)
+            _in_guild(errors, where, panel.get('log_channel_id'), 'log_channel_id', "text channel", text_channel)
+        # Only strings can be compared; _text has already reported anything else.
+        if isinstance(panel.get('panel_name'), str):
+            if panel['panel_name'] in seen:
+                errors.append(f"{where}: panel `{panel['panel_name']}` appears more than once")
+            seen.add(panel['panel_name'])
+
+        options = panel.get('options')
+        if not isinstance(options, list) or not 1 <= len(options) <= MAX_OPTIONS:
+            errors.append(f"{where}: `options` must list 1 to {MAX_OPTIONS} ticket options")
+            continue
+        names = set()
+        for option_index, option in enumerate(options):
+            option_where = f"{where}.options[{option_index}]"
+            if not isinstance(option, dict):
+                errors.append(f"{option_where}: must be an object")
+                continue
+            _text(errors, option_where, option.get('name'), 'name', MAX_OPTION_NAME)
+            _text(errors, option_where, option.get('embed_title'), 'embed_title', MAX_EMBED_TITLE)
+            _text(errors, option_where, option.get('embed_description'), 'embed_description', MAX_EMBED_DESCRIPTION)
+            _snowflake(errors, option_where, option.get('category_id'), 'category_id', required=True)
+            if guild is not None:
+                _in_guild(errors, option_where, option.get('category_id'), 'category_id', "category", category)
+            roles = option.get('roles', [])
+            if not isinstance(roles, list):
+                errors.append(f"{option_where}: `roles` must be a list of role ids")
+            else:
+                for role in roles:
+                    _snowflake(errors, option_where, role, 'roles', required=True)
+                    if guild is not None:
+                        _in_guild(errors, option_where, role, 'roles', "role", guild.get_role)
+            questions = option.get('questions', [])
+            if not isinstance(questions, list) or len(questions) > MAX_QUESTIONS:
+                errors.append(f"{option_where}: `questions` must list at most {MAX_QUESTIONS} questions")
+            else:
+                for question in questions:
+                    _text(errors, option_where, question, 'questions', MAX_EMBED_TITLE)
+            if isinstance(option.get('name'), str):
+                if option['name'] in names:
+                    errors.append(f"{option_where}: option `{option['name']}` appears more than once")
+                names.add(option['name'])
+
+    return document['panels'], errors
+
+
+def diff_panels(existing: Dict[str, dict], incoming: List[dict]) -> List[str]:
+    """One line per imported panel: whether it is new, changed (and how) or unchanged."""
+    lines = []
+    for panel in incoming:
+        name = panel['panel_name']
+        if name not in existing:
+            lines.append(f"+ {name} ({len(panel['options'])} options)")
+            continue
+        old, new = normalize_panel(existing[name]), normalize_panel(panel)
+        if old == new:
+            lines.append(f"= {name}")
+            continue
+        changed = [field for field in PANEL_FIELDS if old[field] != new[field]]
+        old_options = {option['name']: option for option in old['options']}
+        new_options = {option['name']: option for option in new['options']}
+        added = [option for option in new_options if option not in old_options]
+        removed = [option for option in old_options if option not in new_options]
+        edited = [option for option in new_options
+                  if option in old_options and new_options[option] != old_options[option]]
+        details = []
+        if changed:
+            details.append(f"fields: {', '.join(changed)}")
+        for label, names in (("added", added), ("removed", removed), ("changed", edited)):
+            if names:
+                details.append(f"{label} options: {', '.join(names)}")
+        # Options keep their ids, and so their order, on import; a reorder alone changes nothing.
+        lines.append(f"~ {name} ({'; '.join(details)})" if details else f"= {name}")
+    return lines
+
+
+async def insert_panel(connection, guild_id: int, panel: dict, panel_id: Optional[int] = None) -> dict:
+    """
+    Write ``panel`` and its options on ``connection`` (inside a transaction)
+    and return it as a PanelCache entry. With ``panel_id`` the existing row
+    is updated in place and options are matched by name: kept options keep
+    their ids, which posted select menus carry as values, so those messages
+    keep working. Only removed options are deleted and only new ones added.
+    Options saved with the same name (before imports rejected that) are
+    matched to incoming options of that name in id order; any left over are
+    removed.
+    """
+    values = (
+        panel['panel_name'], panel['embed_title'], panel['embed_description'],
+        str(panel.get('embed_color') or DEFAULT_COLOR),
+        panel.get('category_id'), panel.get('log_channel_id')
+    )
+    existing: Dict[str, List[int]] = {}
+    if panel_id is None:
+        cursor = await connection.execute(
+            """INSERT INTO panels
+               (panel_name, embed_title, embed_description, embed_color, category_id, log_channel_id, guild_id)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            values + (guild_id,)
+        )
+        panel_id = cursor.lastrowid
+    else:
+        await connection.execute(
+            """UPDATE panels
+               SET panel_name = ?, embed_title = ?, embed_description = ?, embed_color = ?,
+                   category_id = ?, log_channel_id = ?
+               WHERE id = ?""",
+            values + (panel_id,)
+        )
+        cursor = await connection.execute(
+            "SELECT option_name, id FROM ticket_options WHERE panel_id = ? ORDER BY id", (panel_id,)
+        )
+        for name, option_id in await cursor.fetchall():
+            existing.setdefault(name, []).append(option_id)
+
+    matched = [existing[option['name']].pop(0) if existing.get(option['name']) else None
+               for option in panel['options']]
+    kept = tuple(option_id for option_id in matched if option_id is not None)
+    removed = tuple(option_id for option_ids in existing.values() for option_id in option_ids)
+    await delete_option_rows(connection, kept, keep_options=True)
+    await delete_option_rows(connection, removed)
+
+    options = []
+    roles = []
+    questions = []
+    for option, option_id in zip(panel['options'], matched):
+        if option_id is None:
+            cursor = await connection.execute(
+                "INSERT INTO ticket_options (panel_id, option_name, category_id, embed_title, embed_description) VALUES (?, ?, ?, ?, ?)",
+                (panel_id, option['name'], option['category_id'], option['embed_title'], option['embed_description'])
+            )
+            option_id = cursor.lastrowid
+        else:
+            await connection.execute(
+                "UPDATE ticket_options SET category_id = ?, embed_title = ?, embed_description = ? WHERE id = ?",
+                (option['category_id'], option['embed_title'], option['embed_description'], option_id)
+            )
+        option_roles = option.get('roles', [])
+        option_questions = option.get('questions', [])
+        roles.extend((option_id, position, int(role_id)) for position, role_id in enumerate(option_roles))
+        questions.extend((option_id, position, question) for position, question in enumerate(option_questions))
+        options.append(PanelCache.build_option(
+            option_id, option['name'], option_roles, option['category_id'], option['embed_title'],
+            option['embed_description'], option_questions, panel.get('log_channel_id')
+        ))
+
+    await connection.executemany(
+        "INSERT INTO ticket_option_roles (option_id, position, role_id) VALUES (?, ?, ?)", roles
+    )
+    await connection.executemany(
+        "INSERT INTO ticket_option_questions (option_id, position, question) VALUES (?, ?, ?)", questions
+    )
+    return {
+        'id': panel_id,
+        'panel_name': panel['panel_name'],
+        'embed_title': panel['embed_title'],
+        'embed_description': panel['embed_description'],
+        'embed_color': values[3],
+        'category_id': panel.get('category_id'),
+        'log_channel_id': panel.get('log_channel_id'),
+        # The cache loads options in id order; match it.
+        'options': sorted(options, key=lambda option: option['id'])
+    }
+
+
+async def delete_option_rows(connection, option_ids: tuple, keep_options: bool = False):
+    """Delete options by id with their roles and questions, or only the latter with ``keep_options``."""
+    if not option_ids:
+        return
+    marks = ','.join('?' * len(option_ids))
+    await connection.execute(f"DELETE FROM ticket_option_roles WHERE option_id IN ({marks})", option_ids)
+    await connection.execute(f"DELETE FROM ticket_option_questions WHERE option_id IN ({marks})", option_ids)
+    if not keep_options:
+        await connection.execute(f"DELETE FROM ticket_options WHERE id IN ({marks})", option_ids)
+
+
+async def delete_options(connection, panel_ids: tuple):
+    marks = ','.join('?' * len(panel_ids))
+    options = f"SELECT id FROM ticket_options WHERE panel_id IN ({marks})"
+    await connection.execute(f"DELETE FROM ticket_option_roles WHERE option_id IN ({options})", panel_ids)
+    await connection.execute(f"DELETE FROM ticket_option_questions WHERE option_id IN ({options})", panel_ids)
+    await connection.execute(f"DELETE FROM ticket_options WHERE panel_id IN ({marks})", panel_ids)
+
+
+def dumps(document: dict) -> bytes:
+    return json.dumps(document, indent=2, ensure_ascii=False).encode("utf-8")
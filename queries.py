@@ -0,0 +1,87 @@
+# Statements the cogs run on a hot path. The call sites and the
+# EXPLAIN QUERY PLAN checks in query_plans.py share these, so the checks
+# always see the SQL that actually runs.
+
+OPEN_TICKET_BY_CHANNEL = "SELECT user_id, log_channel_id FROM tickets WHERE channel_id = ? AND closed = 0"
+
+INSERT_CLOSURE_JOB = """INSERT INTO closure_jobs
+   (guild_id, channel_id, channel_name, ticket_id, closer_id, creator_id,
+    log_channel_id, reason, force_close, state)
+   VALUES (?, ?, ?, (SELECT id FROM tickets WHERE channel_id = ?), ?, ?, ?, ?, ?, ?)"""
+
+CLOSE_TICKET = """UPDATE tickets
+   SET closed = 1,
+       closed_at = CURRENT_TIMESTAMP,
+       reason = ?,
+       transcript_hash = ?,
+       transcript_size = ?,
+       transcript_stored_size = ?
+   WHERE channel_id = ?"""
+
+OPEN_TICKET_FOR_ROLLUP = """SELECT t.guild_id, t.option_name, date('now'),
+       CAST(strftime('%s', 'now') AS INTEGER) - CAST(strftime('%s', t.created_at) AS INTEGER)
+   FROM tickets t
+   WHERE t.channel_id = ? AND t.closed = 0"""
+
+OPEN_TICKET_CHANNELS = """SELECT t.channel_id, MAX(m.message_id)
+   FROM tickets t
+   LEFT JOIN transcript_messages m ON m.channel_id = t.channel_id
+   WHERE t.closed = 0
+   GROUP BY t.channel_id"""
+
+CAPTURED_TRANSCRIPT = """SELECT created_at, author, content FROM transcript_messages
+   WHERE channel_id = ? ORDER BY message_id"""
+
+GUILD_PANELS = """SELECT p.id, p.panel_name, p.embed_title, p.embed_description, p.embed_color,
+          p.category_id, p.log_channel_id,
+          t.id, t.option_name, t.category_id, t.embed_title, t.embed_description
+   FROM panels p
+   LEFT JOIN ticket_options t ON t.panel_id = p.id
+   WHERE p.guild_id = ?
+   ORDER BY p.id, t.id"""
+
+GUILD_OPTION_ROLES = """SELECT r.option_id, r.role_id
+   FROM panels p
+   JOIN ticket_options t ON t.panel_id = p.id
+   JOIN ticket_option_roles r ON r.option_id = t.id
+   WHERE p.guild_id = ?
+   ORDER BY r.option_id, r.position"""
+
+GUILD_OPTION_QUESTIONS = """SELECT q.option_id, q.question
+   FROM panels p
+   JOIN ticket_options t ON t.panel_id = p.id
+   JOIN ticket_option_questions q ON q.option_id = t.id
+   WHERE p.guild_id = ?
+   ORDER BY q.option_id, q.position"""
+
+PANEL_BY_NAME = "SELECT * FROM panels WHERE panel_name = ? AND guild_id = ?"
+
+ARCHIVE_COLUMNS = ('id', 'ticket_name', 'user_id', 'channel_id', 'guild_id', 'log_channel_id',
+                   'option_name', 'reason', 'created_at', 'closed_at')
+
+ARCHIVABLE_TICKETS = f"""SELECT {', '.join('t.' + column for column in ARCHIVE_COLUMNS)},
+          t.transcript, t.transcript_hash, b.codec, b.data
+   FROM tickets t
+   LEFT JOIN transcript_blobs b ON b.hash = t.transcript_hash
+   WHERE t.closed = 1 AND t.closed_at < datetime('now', ?)
+   ORDER BY t.closed, t.closed_at
+   LIMIT ?"""
+
+STATS_PER_DAY = """SELECT day, SUM(opened), SUM(closed) FROM ticket_rollups
+   WHERE guild_id = ? AND day >= date('now', ?)
+   GROUP BY day ORDER BY day"""
+
+STATS_PER_OPTION = """SELECT option_name, SUM(opened), SUM(closed) FROM ticket_rollups
+   WHERE guild_id = ? AND day >= date('now', ?)
+   GROUP BY option_name ORDER BY SUM(opened) DESC"""
+
+STATS_PER_CLOSER = """SELECT closer_id, SUM(closed) FROM ticket_closer_rollups
+   WHERE guild_id = ? AND day >= date('now', ?)
+   GROUP BY closer_id ORDER BY SUM(closed) DESC"""
+
+STATS_CLOSE_TIMES = """SELECT bucket, SUM(tickets) FROM ticket_close_times
+   WHERE guild_id = ? AND day >= date('now', ?)
+   GROUP BY bucket"""
+
+# Open tickets have no closed_at, so this reads only the backlog's own index entries.
+STATS_BACKLOG = "SELECT COUNT(*) FROM tickets WHERE guild_id = ? AND closed_at IS NULL AND closed = 0"
@@ -0,0 +1,44 @@
+from typing import List, Tuple
+from . import queries
+
+# Every query the cogs run on a hot path, with placeholder parameters.
+# check_query_plans() flags any of them that SQLite would answer with a table scan.
+HOT_QUERIES: List[Tuple[str, str, tuple]] = [
+    ("open ticket by channel", queries.OPEN_TICKET_BY_CHANNEL, (0,)),
+    ("insert closure job", queries.INSERT_CLOSURE_JOB, (0, 0, '', 0, 0, 0, 0, '', 0, '')),
+    ("close ticket", queries.CLOSE_TICKET, ('', '', 0, 0, 0)),
+    ("open ticket channels", queries.OPEN_TICKET_CHANNELS, ()),
+    ("guild panels", queries.GUILD_PANELS, (0,)),
+    ("guild option roles", queries.GUILD_OPTION_ROLES, (0,)),
+    ("guild option questions", queries.GUILD_OPTION_QUESTIONS, (0,)),
+    ("panel by name", queries.PANEL_BY_NAME, ('', 0)),
+    ("archivable tickets", queries.ARCHIVABLE_TICKETS, ('-30 days', 1)),
+    ("open ticket for closure rollup", queries.OPEN_TICKET_FOR_ROLLUP, (0,)),
+    ("ticket stats per day", queries.STATS_PER_DAY, (0, '-13 days')),
+    ("ticket stats per option", queries.STATS_PER_OPTION, (0, '-13 days')),
+    ("ticket stats per closer", queries.STATS_PER_CLOSER, (0, '-13 days')),
+    ("ticket stats close times", queries.STATS_CLOSE_TIMES, (0, '-13 days')),
+    ("ticket stats backlog", queries.STATS_BACKLOG, (0,)),
+    ("captured transcript", queries.CAPTURED_TRANSCRIPT, (0,)),
+]
+
+
+async def explain(database, query: str, parameters: tuple = ()) -> List[str]:
+    async with database.execute(f"EXPLAIN QUERY PLAN {query}", parameters) as cursor:
+        return [row[3] for row in await cursor.fetchall()]
+
+
+def is_table_scan(step: str) -> bool:
+    # Any SCAN step that reads the table itself. A scan through an index,
+    # covering or not ("SCAN t USING INDEX ..."), is accepted.
+    return step.startswith("SCAN") and "INDEX" not in step
+
+
+async def check_query_plans(database) -> List[Tuple[str, List[str]]]:
+    """Return ``(name, plan)`` for every hot query that scans a table."""
+    problems = []
+    for name, query, parameters in HOT_QUERIES:
+        plan = await explain(database, query, parameters)
+        if any(is_table_scan(step) for step in plan):
+            problems.append((name, plan))
+    return problems
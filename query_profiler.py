@@ -0,0 +1,129 @@
+import re
+import time
+from typing import Dict, List, Optional
+from . import config
+from .query_plans import explain
+from .background import spawn
+
+# Distinct statements tracked; anything past this is folded into one row.
+MAX_STATEMENTS = 1000
+OVERFLOW = "(other statements)"
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN \(\?(?:, ?\?)+\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(query: str) -> str:
+    """``query`` with literals as ``?``, IN lists folded and whitespace collapsed."""
+    query = _STRING.sub("?", query)
+    query = _NUMBER.sub("?", query)
+    query = _WHITESPACE.sub(" ", query).strip()
+    return _IN_LIST.sub("IN (?, ...)", query)
+
+
+class StatementStats:
+    __slots__ = ('calls', 'seconds', 'max_seconds', 'rows', 'slow')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.slow = 0
+
+
+class QueryProfiler:
+    """
+    Per-statement timings for the Database, keyed by normalized SQL.
+
+    Only the statement itself is timed, not the wait for a reader or for
+    the writer's queue. Statements slower than DB_SLOW_QUERY_MS are logged
+    with their EXPLAIN QUERY PLAN, looked up once per statement on a read
+    connection so the writer isn't held up.
+    """
+
+    def __init__(self, database, enabled: bool = config.DB_PROFILE,
+                 slow_ms: float = config.DB_SLOW_QUERY_MS):
+        self.database = database
+        self.enabled = enabled
+        self.slow_seconds = slow_ms / 1000
+        self.statements: Dict[str, StatementStats] = {}
+        self.plans: Dict[str, List[str]] = {}
+        self._normalized: Dict[str, str] = {}
+        self.started = time.time()
+
+    def record(self, query: str, parameters, seconds: float, rows: Optional[int]):
+        if not self.enabled:
+            return
+        key = self._normalized.get(query)
+        if key is None:
+            key = normalize_sql(query)
+            if len(self._normalized) < MAX_STATEMENTS * 4:
+                self._normalized[query] = key
+
+        stats = self.statements.get(key)
+        if stats is None:
+            if len(self.statements) >= MAX_STATEMENTS:
+                key = OVERFLOW
+                stats = self.statements.setdefault(key, StatementStats())
+            else:
+                stats = self.statements[key] = StatementStats()
+        stats.calls += 1
+        stats.seconds += seconds
+        stats.max_seconds = max(stats.max_seconds, seconds)
+        if rows is not None and rows > 0:
+            stats.rows += rows
+
+        if seconds >= self.slow_seconds and key != OVERFLOW:
+            stats.slow += 1
+            spawn(self._log_slow(key, query, parameters, seconds, rows), "slow query log")
+
+    async def _log_slow(self, key: str, query: str, parameters, seconds: float, rows: Optional[int]):
+        plan = self.plans.get(key)
+        if plan is None:
+            try:
+                async with self.database.reader() as connection:
+                    plan = await explain(connection, query, parameters)
+            except Exception as e:
+                plan = [f"(no plan: {e})"]
+            self.plans[key] = plan
+        print(f"Slow query ({seconds * 1000:.1f}ms, {rows if rows is not None else '?'} rows): {key}")
+        for step in plan:
+            print(f"    {step}")
+
+    def top(self, limit: int = 10) -> List[tuple]:
+        """``(sql, stats)`` for the statements with the most total time."""
+        ranked = sorted(self.statements.items(), key=lambda item: item[1].seconds, reverse=True)
+        return ranked[:limit]
+
+    def reset(self):
+        self.statements.clear()
+        self.plans.clear()
+        self.started = time.time()
+
+
+class ProfiledConnection:
+    """The writer connection as write jobs see it while profiling is on."""
+
+    def __init__(self, connection, profiler: QueryProfiler):
+        self._connection = connection
+        self._profiler = profiler
+
+    async def execute(self, query: str, parameters=()):
+        started = time.perf_counter()
+        cursor = await self._connection.execute(query, parameters)
+        self._profiler.record(query, parameters, time.perf_counter() - started, cursor.rowcount)
+        return cursor
+
+    async def executemany(self, query: str, parameters):
+        parameters = list(parameters)
+        started = time.perf_counter()
+        cursor = await self._connection.executemany(query, parameters)
+        self._profiler.record(query, parameters[0] if parameters else (),
+                              time.perf_counter() - started, cursor.rowcount)
+        return cursor
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
@@ -0,0 +1,234 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import discord
+from . import config
+from .metrics import metrics
+from .background import spawn
+
+# Lower runs first. Ticket openings (the channel and its first message) are
+# USER; logs, DMs, transcripts and pool refills are BACKGROUND.
+USER = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {USER: 'user', BACKGROUND: 'background'}
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """How long until a token is available; 0 if one is now."""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+    def idle(self) -> bool:
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.capacity
+
+
+class RestScheduler:
+    """
+    Central queue for the REST calls the ticket cogs make.
+
+    Every guild gets its own queues and dispatcher, so one guild's
+    transcript uploads never hold up another guild's ticket openings.
+    Each call needs a token from its guild's bucket and from the guild's
+    bucket for its route (for example ``channel_create`` or
+    ``messages:<channel id>``) before it starts, which keeps bursts under
+    Discord's limits instead of finding them through 429s. Work waits in a
+    queue per route; the dispatcher always starts the most urgent call
+    whose route has a token, so BACKGROUND work waiting on a busy route
+    never holds up USER work, and it picks again after every wait. 429s
+    that still happen are retried after retry_after.
+    """
+
+    def __init__(self):
+        # guild -> route -> heap of (priority, sequence, queued_at, route, call, future)
+        self._queues: Dict[int, Dict[str, List[tuple]]] = {}
+        self._wakeups: Dict[int, asyncio.Event] = {}
+        self._dispatchers: Dict[int, asyncio.Task] = {}
+        self._running: Dict[int, asyncio.Semaphore] = {}
+        self._guild_buckets: Dict[int, TokenBucket] = {}
+        self._route_buckets: Dict[Tuple[int, str], TokenBucket] = {}
+        self._sequence = itertools.count()
+        self.stats = {
+            name: {'submitted': 0, 'completed': 0, 'failed': 0, 'rate_limited': 0,
+                   'wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+            for name in PRIORITY_NAMES.values()
+        }
+
+    async def run(self, guild_id: Optional[int], route: str, priority: int,
+                  call: Callable[[], Awaitable[Any]]) -> Any:
+        """Queue ``call()`` and return its result once it has been sent."""
+        guild_id = guild_id or 0
+        future = asyncio.get_running_loop().create_future()
+        routes = self._queues.get(guild_id)
+        if routes is None:
+            routes = self._queues[guild_id] = {}
+            self._wakeups[guild_id] = asyncio.Event()
+        if guild_id not in self._running:
+            self._running[guild_id] = asyncio.Semaphore(config.REST_GUILD_CONCURRENCY)
+        heapq.heappush(routes.setdefault(route, []),
+                       (priority, next(self._sequence), time.monotonic(), route, call, future))
+        self.stats[PRIORITY_NAMES[priority]]['submitted'] += 1
+        self._wakeups[guild_id].set()
+
+        dispatcher = self._dispatchers.get(guild_id)
+        if dispatcher is None or dispatcher.done():
+            self._dispatchers[guild_id] = asyncio.create_task(self._dispatch(guild_id))
+        return await future
+
+    def _pick(self, guild_id: int, routes: Dict[str, List[tuple]]) -> Tuple[Optional[tuple], Optional[float]]:
+        """
+        Take the most urgent call that may start now, spending its tokens.
+        Otherwise return how long until one might (None when nothing is queued).
+        """
+        best = None
+        wait = None
+        for route, heap in list(routes.items()):
+            while heap and heap[0][5].cancelled():
+                heapq.heappop(heap)
+            if not heap:
+                del routes[route]
+                continue
+            delay = self._route_bucket(guild_id, route).delay()
+            if delay:
+                wait = delay if wait is None else min(wait, delay)
+            elif best is None or heap[0][:2] < best[:2]:
+                best = heap[0]
+        if best is None:
+            return None, wait
+
+        guild_bucket = self._bucket(guild_id)
+        delay = guild_bucket.delay()
+        if delay:
+            return None, delay
+        heap = routes[best[3]]
+        heapq.heappop(heap)
+        if not heap:
+            del routes[best[3]]
+        guild_bucket.take()
+        self._route_bucket(guild_id, best[3]).take()
+        return best, None
+
+    async def _dispatch(self, guild_id: int):
+        routes = self._queues[guild_id]
+        wakeup = self._wakeups[guild_id]
+        running = self._running[guild_id]
+        while routes:
+            # Wait for a free slot before choosing, so later USER work can still jump ahead.
+            await running.acquire()
+            while True:
+                wakeup.clear()
+                item, wait = self._pick(guild_id, routes)
+                if item is not None or wait is None:
+                    break
+                # Sleep until a token frees up or new work arrives, then choose again.
+                try:
+                    await asyncio.wait_for(wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+            if item is None:
+                running.release()
+                break
+
+            priority, _, queued_at, route, call, future = item
+            name = PRIORITY_NAMES[priority]
+            stats = self.stats[name]
+            waited = time.monotonic() - queued_at
+            stats['wait_seconds'] += waited
+            stats['max_wait_seconds'] = max(stats['max_wait_seconds'], waited)
+            metrics.observe("rest_wait_seconds", waited, priority=name)
+            spawn(self._call(running, name, call, future), f"rest {route}")
+
+        del self._dispatchers[guild_id]
+        self._queues.pop(guild_id, None)
+        self._wakeups.pop(guild_id, None)
+
+    async def _call(self, running: asyncio.Semaphore, name: str, call, future: asyncio.Future):
+        stats = self.stats[name]
+        held = True
+        try:
+            for attempt in range(config.REST_RETRIES + 1):
+                try:
+                    result = await call()
+                except discord.HTTPException as e:
+                    if e.status != 429 or attempt == config.REST_RETRIES:
+                        raise
+                    stats['rate_limited'] += 1
+                    metrics.inc("rest_rate_limited_total", priority=name)
+                    # Sit out retry_after without a slot, so a limited route
+                    # can't hold the guild's other routes up.
+                    running.release()
+                    held = False
+                    await asyncio.sleep(getattr(e, 'retry_after', None) or 2 ** attempt)
+                    await running.acquire()
+                    held = True
+                else:
+                    break
+        except Exception as e:
+            stats['failed'] += 1
+            if not future.done():
+                future.set_exception(e)
+        else:
+            stats['completed'] += 1
+            if not future.done():
+                future.set_result(result)
+        finally:
+            if held:
+                running.release()
+
+    def _bucket(self, guild_id: int) -> TokenBucket:
+        bucket = self._guild_buckets.get(guild_id)
+        if bucket is None:
+            bucket = self._guild_buckets[guild_id] = TokenBucket(config.REST_GUILD_RATE, config.REST_GUILD_BURST)
+        return bucket
+
+    def _route_bucket(self, guild_id: int, route: str) -> TokenBucket:
+        key = (guild_id, route)
+        bucket = self._route_buckets.get(key)
+        if bucket is None:
+            if len(self._route_buckets) >= config.REST_MAX_ROUTES:
+                # Per-channel routes come and go; drop the ones that have refilled.
+                self._route_buckets = {
+                    key: value for key, value in self._route_buckets.items() if not value.idle()
+                }
+            bucket = self._route_buckets[key] = TokenBucket(config.REST_ROUTE_RATE, config.REST_ROUTE_BURST)
+        return bucket
+
+    def queue_stats(self) -> dict:
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        for routes in self._queues.values():
+            for heap in routes.values():
+                for item in heap:
+                    depth[PRIORITY_NAMES[item[0]]] += 1
+        report = {}
+        for name, stats in self.stats.items():
+            dispatched = stats['completed'] + stats['failed']
+            report[name] = {
+                **stats,
+                'queued': depth[name],
+                'avg_wait_ms': stats['wait_seconds'] * 1000 / dispatched if dispatched else 0.0
+            }
+        report['guilds'] = len(self._queues)
+        return report
+
+
+def message_route(channel: discord.abc.Snowflake) -> str:
+    return f"messages:{channel.id}"
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from . import config
+
+# Wizard states, in the order a setup normally walks through them.
+PANEL_NAME = 'panel_name'
+PANEL_TITLE = 'panel_title'
+PANEL_DESCRIPTION = 'panel_description'
+LOG_CHANNEL = 'log_channel'
+OPTION_NAME = 'option_name'
+OPTION_TITLE = 'option_title'
+OPTION_DESCRIPTION = 'option_description'
+QUESTION = 'question'
+MORE_QUESTIONS = 'more_questions'
+CATEGORY = 'category'
+ROLES = 'roles'
+MORE_OPTIONS = 'more_options'
+SAVE = 'save'
+
+
+class SetupSession:
+    """One admin's /setup_ticket_panel run."""
+    __slots__ = (
+        'guild_id', 'user_id', 'channel_id', 'state', 'panel_name', 'embed_title',
+        'embed_description', 'log_channel_id', 'options', 'draft', 'updated_at',
+        'followup', 'task'
+    )
+
+    def __init__(self, guild_id: int, user_id: int, channel_id: int):
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.channel_id = channel_id
+        self.state = PANEL_NAME
+        self.panel_name = None
+        self.embed_title = None
+        self.embed_description = None
+        self.log_channel_id = None
+        self.options: List[dict] = []
+        self.draft: dict = {}
+        self.updated_at = time.time()
+        # Runtime only: the interaction webhook to answer through, and the wizard task.
+        self.followup = None
+        self.task = None
+
+    @property
+    def key(self) -> Tuple[int, int]:
+        return (self.guild_id, self.user_id)
+
+    def data(self) -> str:
+        return json.dumps({
+            'panel_name': self.panel_name,
+            'embed_title': self.embed_title,
+            'embed_description': self.embed_description,
+            'log_channel_id': self.log_channel_id,
+            'options': self.options,
+            'draft': self.draft
+        })
+
+    @classmethod
+    def from_row(cls, guild_id: int, user_id: int, channel_id: int, state: str, data: str, updated_at: float):
+        session = cls(guild_id, user_id, channel_id)
+        session.state = state
+        session.updated_at = updated_at
+        for name, value in json.loads(data).items():
+            setattr(session, name, value)
+        return session
+
+
+class SetupSessions:
+    """
+    Running setup wizards keyed by (guild, user), oldest activity first.
+
+    Sessions idle longer than SETUP_SESSION_TTL seconds are dropped, and at
+    most SETUP_SESSION_MAX are kept; starting one more evicts the oldest.
+    Every state change is snapshotted to ``setup_sessions`` so a setup can
+    carry on after a restart.
+    """
+
+    def __init__(self, bot, ttl: float = config.SETUP_SESSION_TTL, max_sessions: int = config.SETUP_SESSION_MAX):
+        self.bot = bot
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[Tuple[int, int], SetupSession]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, guild_id: int, user_id: int) -> Optional[SetupSession]:
+        return self._sessions.get((guild_id, user_id))
+
+    async def load(self) -> List[SetupSession]:
+        """Restore snapshots that haven't expired. Returns them, oldest first."""
+        cutoff = time.time() - self.ttl
+        await self.bot.database.write("DELETE FROM setup_sessions WHERE updated_at < ?", (cutoff,))
+        rows = await self.bot.database.fetchall(
+            """SELECT guild_id, user_id, channel_id, state, data, updated_at
+               FROM setup_sessions ORDER BY updated_at DESC LIMIT ?""",
+            (self.max_sessions,)
+        )
+        for row in reversed(rows):
+            session = SetupSession.from_row(*row)
+            self._sessions[session.key] = session
+        return list(self._sessions.values())
+
+    async def start(self, guild_id: int, user_id: int, channel_id: int) -> SetupSession:
+        """Begin a fresh session, replacing any the same admin had in this guild."""
+        await self.end(self.get(guild_id, user_id))
+        await self.evict()
+        while len(self._sessions) >= self.max_sessions:
+            await self.end(next(iter(self._sessions.values())))
+
+        session = SetupSession(guild_id, user_id, channel_id)
+        self._sessions[session.key] = session
+        await self.save(session)
+        return session
+
+    async def advance(self, session: SetupSession, state: str):
+        session.state = state
+        await self.save(session)
+
+    async def save(self, session: SetupSession):
+        if self._sessions.get(session.key) is not session:
+            return
+        session.updated_at = time.time()
+        self._sessions.move_to_end(session.key)
+        await self.bot.database.write(
+            """INSERT OR REPLACE INTO setup_sessions
+               (guild_id, user_id, channel_id, state, data, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (session.guild_id, session.user_id, session.channel_id, session.state,
+             session.data(), session.updated_at)
+        )
+
+    async def end(self, session: Optional[SetupSession]):
+        if session is None or self._sessions.get(session.key) is not session:
+            return
+        del self._sessions[session.key]
+        if session.task is not None and session.task is not asyncio.current_task():
+            session.task.cancel()
+        await self.bot.database.write(
+            "DELETE FROM setup_sessions WHERE guild_id = ? AND user_id = ?",
+            session.key
+        )
+
+    async def evict(self):
+        """Drop sessions idle longer than the TTL."""
+        cutoff = time.time() - self.ttl
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.updated_at >= cutoff:
+                break
+            await self.end(oldest)
@@ -0,0 +1,67 @@
+import asyncio
+from collections import Counter
+from typing import Dict, Optional, Tuple
+import discord
+
+
+class Superseded(Exception):
+    """Raised in a wait that a newer wait for the same admin and channel replaced."""
+
+
+class WaiterRegistry:
+    """
+    Pending "wait for this admin's next message" steps of the setup wizard,
+    keyed by (channel id, user id).
+
+    ``bot.wait_for`` checks every incoming message against every pending
+    predicate; here a message costs one set lookup when its channel has no
+    wizard running, and one dict lookup when it does.
+    """
+
+    def __init__(self):
+        self._waiters: Dict[Tuple[int, int], asyncio.Future] = {}
+        self._channels: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self._waiters)
+
+    async def wait(self, channel_id: int, user_id: int, timeout: Optional[float] = None) -> discord.Message:
+        """
+        The next message ``user_id`` sends in ``channel_id``. Raises
+        asyncio.TimeoutError, or Superseded if another wait takes the key.
+        """
+        key = (channel_id, user_id)
+        previous = self._waiters.get(key)
+        if previous is not None and not previous.done():
+            # The same admin started another prompt here; the old one is abandoned.
+            previous.set_exception(Superseded())
+
+        future = asyncio.get_running_loop().create_future()
+        self._add(key, future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            if self._waiters.get(key) is future:
+                self._remove(key)
+
+    def dispatch(self, message: discord.Message) -> bool:
+        """Hand ``message`` to the step waiting for it. Returns whether one was."""
+        channel_id = message.channel.id
+        if channel_id not in self._channels:
+            return False
+        future = self._waiters.get((channel_id, message.author.id))
+        if future is None or future.done():
+            return False
+        future.set_result(message)
+        return True
+
+    def _add(self, key: Tuple[int, int], future: asyncio.Future):
+        if key not in self._waiters:
+            self._channels[key[0]] += 1
+        self._waiters[key] = future
+
+    def _remove(self, key: Tuple[int, int]):
+        del self._waiters[key]
+        self._channels[key[0]] -= 1
+        if not self._channels[key[0]]:
+            del self._channels[key[0]]
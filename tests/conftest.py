@@ -0,0 +1,37 @@
+import asyncio
+import os
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules import each other as the ``cogs`` package, which this directory is.
+if "cogs" not in sys.modules:
+    package = types.ModuleType("cogs")
+    package.__path__ = [ROOT]
+    sys.modules["cogs"] = package
+
+# bot.py starts the client on import when a token is set; only its schema is wanted here.
+os.environ["DISCORD_BOT_TOKEN"] = ""
+
+
+@pytest.fixture
+def with_database(tmp_path, monkeypatch):
+    """Run ``scenario(database)`` against a freshly migrated database in a temporary directory."""
+    monkeypatch.chdir(tmp_path)
+
+    def run(scenario):
+        from cogs import bot
+
+        async def main():
+            database = await bot.database_db()
+            try:
+                return await scenario(database)
+            finally:
+                await database.close()
+
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,21 @@
+import asyncio
+
+from cogs import background
+from cogs.background import spawn
+
+
+def test_spawned_tasks_are_kept_until_they_finish(capsys):
+    async def fail():
+        await asyncio.sleep(0)
+        raise RuntimeError("boom")
+
+    async def scenario():
+        task = spawn(fail(), "failing job")
+        assert task in background._tasks
+        await asyncio.wait([task])
+        await asyncio.sleep(0)
+        return task
+
+    task = asyncio.run(scenario())
+    assert task not in background._tasks
+    assert "Background task failing job failed: RuntimeError('boom')" in capsys.readouterr().out
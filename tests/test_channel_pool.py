@@ -0,0 +1,107 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+
+from cogs import config
+from cogs.benchmarks.fakes import FakeBot, FakeGuild, FakeRest, FakeTextChannel
+from cogs.channel_pool import ChannelPool
+from cogs.panel_cache import PanelCache
+from cogs.panel_io import insert_panel
+from cogs.rest_scheduler import RestScheduler
+from cogs.ticket_views import CompiledOption
+
+
+class EditedChannel(FakeTextChannel):
+    """Like discord.py: edit() returns a new channel object and leaves this one as it was."""
+    fail_with = None
+
+    async def edit(self, **changes):
+        if self.fail_with:
+            raise self.fail_with
+        edited = EditedChannel(self.guild, self.name, self.category_id, self.overwrites, self.topic)
+        edited.id = self.id
+        for name, value in changes.items():
+            setattr(edited, name, value)
+        return edited
+
+
+def setup_pool(database):
+    rest = FakeRest(latency=0, jitter=0)
+    bot = FakeBot()
+    bot.database = database
+    bot.rest = RestScheduler()
+    guild = FakeGuild(rest, "guild")
+    bot.guilds[guild.id] = guild
+    category = guild.add_category("tickets")
+    option = CompiledOption({
+        'id': 7, 'name': "help", 'roles': [], 'category_id': category.id, 'questions': [],
+        'embed_title': "Help", 'embed_description': "..."
+    })
+    pooled = EditedChannel(guild, "pool-7", category.id)
+    guild.channels[pooled.id] = pooled
+    return ChannelPool(bot, enabled=True), guild, option, pooled
+
+
+async def add_to_pool(pool, guild, option, channel):
+    await pool.bot.database.write(
+        "INSERT INTO channel_pool (channel_id, guild_id, option_id, category_id) VALUES (?, ?, ?, ?)",
+        (channel.id, guild.id, option.option_id, option.category_id)
+    )
+    pool._channels.setdefault(option.option_id, []).append(channel.id)
+
+
+def test_claim_returns_the_edited_channel(with_database):
+    async def scenario(database):
+        pool, guild, option, pooled = setup_pool(database)
+        await add_to_pool(pool, guild, option, pooled)
+        claimed = await pool.claim(guild, option, "help-alice", {}, "Ticket created by alice")
+        rows = await database.fetchall("SELECT channel_id FROM channel_pool")
+        return claimed, pooled, rows, pool.size(option.option_id)
+
+    claimed, pooled, rows, size = with_database(scenario)
+    assert claimed.id == pooled.id and claimed.name == "help-alice"
+    assert rows == [] and size == 0
+
+
+def test_failed_edit_keeps_the_channel_pooled(with_database):
+    async def scenario(database):
+        pool, guild, option, pooled = setup_pool(database)
+        await add_to_pool(pool, guild, option, pooled)
+        pooled.fail_with = discord.HTTPException(SimpleNamespace(status=500, reason="Server Error"), "boom")
+        claimed = await pool.claim(guild, option, "help-alice", {}, "Ticket created by alice")
+        rows = await database.fetchall("SELECT channel_id FROM channel_pool")
+        return claimed, pooled, rows, pool.size(option.option_id)
+
+    claimed, pooled, rows, size = with_database(scenario)
+    assert claimed is None
+    assert rows == [(pooled.id,)] and size == 1
+
+
+def test_load_fills_every_option_to_the_minimum(with_database, monkeypatch):
+    monkeypatch.setattr(config, "CHANNEL_POOL_MIN", 2)
+    monkeypatch.setattr(config, "CHANNEL_POOL_MAX", 5)
+    monkeypatch.setattr(config, "CHANNEL_POOL_REFILL_DELAY", 0)
+
+    async def scenario(database):
+        pool, guild, option, _ = setup_pool(database)
+        pool.bot.panel_cache = PanelCache(pool.bot)
+
+        async def create(connection):
+            return await insert_panel(connection, guild.id, {
+                'panel_name': "support", 'embed_title': "Support", 'embed_description': "Pick one",
+                'log_channel_id': None, 'options': [{
+                    'name': "help", 'category_id': option.category_id, 'embed_title': "Help",
+                    'embed_description': "...", 'roles': [], 'questions': []
+                }]
+            })
+        option_id = (await database.transaction(create))['options'][0]['id']
+
+        await pool.load()
+        while pool.size(option_id) < 2 or guild.id in pool._refilling:
+            await asyncio.sleep(0.01)
+        return pool.size(option_id), await database.fetchall("SELECT option_id FROM channel_pool")
+
+    size, rows = with_database(scenario)
+    assert size == 2
+    assert len(rows) == 2
@@ -0,0 +1,33 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from cogs.close_timers import PENDING, CloseTimers
+
+
+def test_start_keeps_timers_added_while_it_loads(with_database):
+    async def scenario(database):
+        await database.write(
+            """INSERT INTO close_requests (message_id, guild_id, channel_id, creator_id, reason, deadline, status)
+               VALUES (1, 1, 1, 1, 'old', ?, ?)""",
+            (time.time() + 3600, PENDING)
+        )
+        added = asyncio.Event()
+
+        async def fetchall(query, parameters=()):
+            # Read before the new request is written, return after it has been queued.
+            rows = await database.fetchall(query, parameters)
+            await added.wait()
+            return rows
+
+        timers = CloseTimers(SimpleNamespace(database=SimpleNamespace(fetchall=fetchall, write=database.write)))
+
+        async def add():
+            await timers.add(2, 1, 2, 1, None, "new", hours=2)
+            added.set()
+
+        await asyncio.gather(timers.start(), add())
+        timers.stop()
+        return sorted(message_id for _, message_id in timers._heap)
+
+    assert with_database(scenario) == [1, 2]
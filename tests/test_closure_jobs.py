@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+from cogs.closure_jobs import JOB_COLUMNS, NOTIFIED, PENDING, ClosureJob, ClosureQueue
+from cogs.transcripts import TranscriptWriter
+
+
+def closure_bot(database):
+    return SimpleNamespace(database=database, transcript_capture=SimpleNamespace(untrack=lambda channel_id: None))
+
+
+async def open_ticket_and_enqueue(database, queue):
+    await database.write(
+        "INSERT INTO tickets (user_id, channel_id, guild_id, option_name) VALUES (5, 500, 1, 'help')"
+    )
+    channel = SimpleNamespace(id=500, name="ticket-5", guild=SimpleNamespace(id=1))
+    return await queue.enqueue(channel, SimpleNamespace(id=7), "done", 5, None)
+
+
+def test_start_does_not_queue_a_job_enqueue_already_queued(with_database):
+    async def scenario(database):
+        queue = ClosureQueue(closure_bot(database), workers=0)
+        await open_ticket_and_enqueue(database, queue)
+        await queue.start()
+        return queue.queue_depth()
+
+    assert with_database(scenario) == 1
+
+
+def test_a_stale_run_does_not_repeat_a_step(with_database):
+    async def scenario(database):
+        queue = ClosureQueue(closure_bot(database), workers=0)
+        job_id = await open_ticket_and_enqueue(database, queue)
+        row = await database.fetchone(f"SELECT {JOB_COLUMNS} FROM closure_jobs WHERE id = ?", (job_id,))
+        first, second = ClosureJob(row), ClosureJob(row)
+
+        stored = []
+        for job in (first, second):
+            transcript = TranscriptWriter()
+            try:
+                stored.append(await queue.store_transcript(job, None, transcript))
+            finally:
+                transcript.close()
+        moved = [await queue._set_state(job, NOTIFIED) for job in (first, second)]
+        closed = await database.fetchone("SELECT SUM(closed) FROM ticket_rollups")
+        state = await database.fetchone("SELECT state FROM closure_jobs WHERE id = ?", (job_id,))
+        return stored, moved, (first.state, second.state), closed, state
+
+    stored, moved, states, closed, state = with_database(scenario)
+    assert stored == [True, False]
+    assert moved == [True, False]
+    assert states == (NOTIFIED, PENDING)
+    assert closed == (1,)
+    assert state == (NOTIFIED,)
@@ -0,0 +1,32 @@
+import asyncio
+
+
+def test_a_failing_job_only_rolls_back_its_own_writes(with_database):
+    async def scenario(database):
+        await database.write("CREATE TABLE notes (id INTEGER PRIMARY KEY, text TEXT)")
+
+        def insert(text, fail=False):
+            async def job(connection):
+                await connection.execute("INSERT INTO notes (text) VALUES (?)", (text,))
+                if fail:
+                    raise ValueError(text)
+                return text
+            return job
+
+        batches = database.stats['batches']
+        results = await asyncio.gather(
+            database.transaction(insert("first")),
+            database.transaction(insert("broken", fail=True)),
+            database.write("INSERT INTO notes (text) VALUES (?)", ("third",)),
+            return_exceptions=True
+        )
+        rows = await database.fetchall("SELECT text FROM notes ORDER BY id")
+        return results, rows, database.stats['batches'] - batches
+
+    results, rows, batches = with_database(scenario)
+    assert results[0] == "first"
+    assert isinstance(results[1], ValueError)
+    assert rows == [("first",), ("third",)]
+    # All three shared one transaction and one commit.
+    assert batches == 1
+
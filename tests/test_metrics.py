@@ -0,0 +1,48 @@
+from cogs.metrics import BUCKETS, Metrics
+
+
+def test_counters_render_in_prometheus_text_format():
+    metrics = Metrics(enabled=True)
+    metrics.inc("tickets_opened_total", guild=1)
+    metrics.inc("tickets_opened_total", 2, guild=1)
+    metrics.gauge("queue_depth", lambda: 4, "Jobs waiting.")
+    lines = metrics.render().splitlines()
+    assert lines == [
+        "# HELP tickets_opened_total Tickets opened.",
+        "# TYPE tickets_opened_total counter",
+        'tickets_opened_total{guild="1"} 3',
+        "# HELP queue_depth Jobs waiting.",
+        "# TYPE queue_depth gauge",
+        "queue_depth 4",
+    ]
+
+
+def test_label_values_are_escaped():
+    metrics = Metrics(enabled=True)
+    metrics.inc("odd_total", reason='say "hi"\\now\nplease')
+    assert 'odd_total{reason="say \\"hi\\"\\\\now\\nplease"} 1' in metrics.render().splitlines()
+
+
+def test_histograms_render_cumulative_buckets_sum_and_count():
+    metrics = Metrics(enabled=True)
+    for seconds in (0.0001, 0.003, 0.003, 100.0):
+        metrics.observe("ticket_open_seconds", seconds, stage="channel")
+    lines = metrics.render().splitlines()
+    buckets = [line for line in lines if line.startswith("ticket_open_seconds_bucket")]
+    assert len(buckets) == len(BUCKETS) + 1
+    assert buckets[0] == f'ticket_open_seconds_bucket{{stage="channel",le="{BUCKETS[0]}"}} 1'
+    assert 'ticket_open_seconds_bucket{stage="channel",le="0.005"} 3' in buckets
+    # Past the last bound: only +Inf counts it.
+    assert buckets[-2] == f'ticket_open_seconds_bucket{{stage="channel",le="{BUCKETS[-1]}"}} 3'
+    assert buckets[-1] == 'ticket_open_seconds_bucket{stage="channel",le="+Inf"} 4'
+    assert 'ticket_open_seconds_sum{stage="channel"} 100.0061' in lines
+    assert 'ticket_open_seconds_count{stage="channel"} 4' in lines
+    assert "# TYPE ticket_open_seconds histogram" in lines
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics(enabled=False)
+    metrics.inc("tickets_opened_total")
+    with metrics.span("ticket_open_seconds", stage="channel"):
+        pass
+    assert metrics.render() == "\n"
@@ -0,0 +1,157 @@
+import sqlite3
+
+import pytest
+
+from cogs import config
+from cogs.transcript_search import search_transcripts
+from cogs.transcripts import decode_transcript
+
+TRANSCRIPT = "[2024-05-01] alice: hello\n[2024-05-01] bob: the printer is broken"
+
+# What a bot that last ran the baseline code left on disk: schema v4, panels
+# without a primary key, transcripts in-row, roles and questions comma-joined.
+LEGACY_SCHEMA = """
+    CREATE TABLE db_version (version INTEGER PRIMARY KEY);
+    INSERT INTO db_version VALUES (4);
+    CREATE TABLE tickets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ticket_name TEXT,
+        user_id INTEGER,
+        channel_id INTEGER,
+        guild_id INTEGER,
+        log_channel_id INTEGER,
+        closed BOOLEAN DEFAULT 0,
+        transcript TEXT,
+        reason TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        closed_at TIMESTAMP
+    );
+    CREATE TABLE panels (
+        id INT, panel_name TEXT, category_id INT, log_channel_id INT, guild_id INT,
+        embed_title TEXT, embed_description TEXT, embed_color TEXT
+    );
+    CREATE TABLE ticket_options (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        panel_id INTEGER,
+        option_name TEXT NOT NULL,
+        roles TEXT,
+        category_id INTEGER NOT NULL,
+        embed_title TEXT NOT NULL,
+        embed_description TEXT NOT NULL,
+        ticket_question TEXT
+    );
+    INSERT INTO panels VALUES (1, 'support', NULL, 30, 100, 'Support', 'Pick one', '3447003');
+    INSERT INTO panels VALUES (NULL, 'sales', NULL, 31, 100, 'Sales', 'Pick one', '3447003');
+    INSERT INTO ticket_options (panel_id, option_name, roles, category_id, embed_title, embed_description, ticket_question)
+        VALUES (1, 'help', '20,21', 10, 'Help', 'Describe it', 'What happened?,When?');
+    INSERT INTO ticket_options (panel_id, option_name, roles, category_id, embed_title, embed_description, ticket_question)
+        VALUES (NULL, 'quote', '22', 10, 'Quote', 'What do you need?', NULL);
+    INSERT INTO tickets (ticket_name, user_id, channel_id, guild_id, log_channel_id, closed, created_at, closed_at)
+        VALUES ('ticket-1', 5, 500, NULL, 30, 1, '2024-05-01 10:00:00', '2024-05-01 10:30:00');
+    INSERT INTO tickets (ticket_name, user_id, channel_id, guild_id, log_channel_id, closed, created_at)
+        VALUES ('ticket-2', 6, 501, 100, 30, 0, '2024-05-02 09:00:00');
+"""
+
+
+@pytest.fixture
+def upgrade(with_database, tmp_path, monkeypatch):
+    """Create a legacy database.db and run ``scenario`` on it after the current migrations."""
+    monkeypatch.setattr(config, "ARCHIVE_AFTER_DAYS", 0)
+
+    def run(scenario):
+        connection = sqlite3.connect(tmp_path / "database.db")
+        connection.executescript(LEGACY_SCHEMA)
+        connection.execute("UPDATE tickets SET transcript = ? WHERE id = 1", (TRANSCRIPT,))
+        connection.commit()
+        connection.close()
+        return with_database(scenario)
+
+    return run
+
+
+def test_upgrade_reaches_the_latest_version(upgrade):
+    async def scenario(database):
+        return await database.fetchone("SELECT version FROM db_version")
+
+    assert upgrade(scenario) == (9,)
+
+
+def test_transcripts_move_into_compressed_blobs(upgrade):
+    async def scenario(database):
+        ticket = await database.fetchone(
+            "SELECT transcript, transcript_hash, transcript_size, transcript_stored_size FROM tickets WHERE id = 1"
+        )
+        blob = await database.fetchone("SELECT codec, data FROM transcript_blobs WHERE hash = ?", (ticket[1],))
+        return ticket, await decode_transcript(None, *blob)
+
+    (legacy, digest, size, stored_size), text = upgrade(scenario)
+    assert legacy is None
+    assert text == TRANSCRIPT
+    assert size == len(TRANSCRIPT.encode())
+    assert 0 < stored_size
+
+
+def test_closed_transcripts_are_searchable_after_upgrade(upgrade):
+    async def scenario(database):
+        schema = await database.fetchone("SELECT sql FROM sqlite_master WHERE name = 'transcript_fts'")
+        guild = await database.fetchone("SELECT guild_id FROM tickets WHERE id = 1")
+        return schema, guild, await search_transcripts(database, 100, "printer broken")
+
+    (schema,), guild, rows = upgrade(scenario)
+    assert "content=''" in schema
+    # Recovered from the panel that owns the ticket's log channel.
+    assert guild == (100,)
+    assert [row[0] for row in rows] == [1]
+    assert "**printer**" in rows[0][5]
+
+
+def test_panels_get_keys_and_options_get_child_rows(upgrade):
+    async def scenario(database):
+        panels = await database.fetchall("SELECT id, panel_name FROM panels ORDER BY id")
+        options = await database.fetchall(
+            "SELECT id, panel_id, option_name, roles, ticket_question FROM ticket_options ORDER BY id"
+        )
+        roles = await database.fetchall("SELECT option_id, position, role_id FROM ticket_option_roles ORDER BY 1, 2")
+        questions = await database.fetchall(
+            "SELECT option_id, position, question FROM ticket_option_questions ORDER BY 1, 2"
+        )
+        indexes = {row[0] for row in await database.fetchall("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        return panels, options, roles, questions, indexes
+
+    panels, options, roles, questions, indexes = upgrade(scenario)
+    assert panels == [(1, "support"), (2, "sales")]
+    # The one keyless panel's options are reattached to its new id.
+    assert options == [(1, 1, "help", None, None), (2, 2, "quote", None, None)]
+    assert roles == [(1, 0, 20), (1, 1, 21), (2, 0, 22)]
+    assert questions == [(1, 0, "What happened?"), (1, 1, "When?")]
+    assert {"idx_panels_guild_name", "idx_tickets_channel", "idx_tickets_open"} <= indexes
+
+
+def test_rollups_are_built_from_existing_tickets(upgrade):
+    async def scenario(database):
+        return (
+            await database.fetchall("SELECT * FROM ticket_rollups ORDER BY day"),
+            await database.fetchall("SELECT guild_id, day, tickets FROM ticket_close_times"),
+            await database.fetchall("SELECT * FROM ticket_closer_rollups")
+        )
+
+    rollups, close_times, closers = upgrade(scenario)
+    assert rollups == [(100, "2024-05-01", "", 1, 1), (100, "2024-05-02", "", 1, 0)]
+    assert close_times == [(100, "2024-05-01", 1)]
+    # Closed before closure jobs recorded who closed it.
+    assert closers == []
+
+
+async def auto_vacuum(database):
+    cursor = await database.writer.execute("PRAGMA auto_vacuum")
+    return (await cursor.fetchone())[0]
+
+
+def test_no_vacuum_conversion_without_archiving(with_database, monkeypatch):
+    monkeypatch.setattr(config, "ARCHIVE_AFTER_DAYS", 0)
+    assert with_database(auto_vacuum) == 0
+
+
+def test_archiving_switches_to_incremental_vacuum(with_database, monkeypatch):
+    monkeypatch.setattr(config, "ARCHIVE_AFTER_DAYS", 30)
+    assert with_database(auto_vacuum) == 2
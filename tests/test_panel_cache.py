@@ -0,0 +1,102 @@
+import gc
+from types import SimpleNamespace
+
+from cogs.benchmarks.fakes import FakeGuild, FakeRest
+from cogs.panel_cache import PanelCache
+from cogs.panel_index import PanelSearchIndex
+from cogs.panel_io import insert_panel
+from cogs.ticket_views import CompiledOption, compiled_options
+from cogs.ticketsetup import TicketHandler
+
+from test_panel_io import option, panel
+
+
+def test_edit_panel_writes_through_the_cache(with_database):
+    async def scenario(database):
+        bot = SimpleNamespace(database=database)
+        bot.panel_cache = PanelCache(bot)
+        handler = TicketHandler(bot)
+
+        async def create(connection):
+            return await insert_panel(connection, 1, panel())
+        created = await database.transaction(create)
+        cached = await bot.panel_cache.get_panel(1, "support")
+        compiled_options(cached)
+
+        await handler.update_panel(1, created['id'], lambda edited: edited.update({'embed_title': "Help desk"}))
+        await handler.update_panel(1, created['id'], lambda edited: edited.update({'category_id': 40}))
+
+        reloaded = await PanelCache(bot).get_panel(1, "support")
+        return created, await bot.panel_cache.get_panel(1, "support"), reloaded
+
+    created, cached, reloaded = with_database(scenario)
+    assert cached['embed_title'] == reloaded['embed_title'] == "Help desk"
+    assert cached['category_id'] == reloaded['category_id'] == 40
+    assert 'compiled' not in cached
+    assert [option['id'] for option in cached['options']] == [option['id'] for option in created['options']]
+
+
+def test_deleted_roles_and_evicted_panels_leave_the_role_index(with_database):
+    async def scenario(database):
+        rest = FakeRest(latency=0, jitter=0)
+        guild = FakeGuild(rest, "guild")
+        staff, admins = guild.add_role("staff"), guild.add_role("admins")
+        bot = SimpleNamespace(database=database)
+        bot.panel_cache = PanelCache(bot, max_guilds=1)
+
+        async def create(connection):
+            await insert_panel(connection, guild.id, panel(options=[option("help", roles=[staff.id, admins.id])]))
+            await insert_panel(connection, guild.id + 1, panel())
+        await database.transaction(create)
+
+        record = next(iter(compiled_options(await bot.panel_cache.get_panel(guild.id, "support")).values()))
+        before = (set(record.overwrites_for(guild, guild.me)), record.role_mentions(guild))
+        del guild.roles[admins.id]
+        CompiledOption.role_deleted(admins.id)
+        after = (set(record.overwrites_for(guild, guild.me)), record.role_mentions(guild))
+        deleted_indexed = admins.id in CompiledOption.by_role
+
+        # Loading another guild evicts this one; nothing else holds its records.
+        await bot.panel_cache.get_panels(guild.id + 1)
+        del record
+        gc.collect()
+        return staff, admins, before, after, deleted_indexed, set(CompiledOption.by_role.get(staff.id, ()))
+
+    staff, admins, before, after, deleted_indexed, staff_records = with_database(scenario)
+    assert {staff, admins} <= before[0] and before[1] == f"<@&{staff.id}> <@&{admins.id}>"
+    assert staff in after[0] and admins not in after[0] and after[1] == f"<@&{staff.id}>"
+    assert not deleted_indexed
+    assert staff_records == set()
+
+
+def test_prefix_matches_rank_ahead_of_substring_matches():
+    index = PanelSearchIndex(["Billing Support", "Support", "support-eu", "Tech"])
+    assert index.search("sup") == ["Support", "support-eu", "Billing Support"]
+    assert index.search("support", limit=2) == ["Support", "support-eu"]
+    assert index.search("zzz") == []
+
+
+def test_short_names_and_queries():
+    index = PanelSearchIndex(["a", "ab", "abc", "b", "cab"])
+    assert index.search("a") == ["a", "ab", "abc", "cab"]
+    assert index.search("b") == ["b", "ab", "abc", "cab"]
+    assert index.search("ab") == ["ab", "abc", "cab"]
+    assert index.search("abc") == ["abc"]
+    assert index.search("") == ["a", "ab", "abc", "b", "cab"]
+
+
+def test_remove_and_rename_keep_postings_consistent():
+    index = PanelSearchIndex(["Support", "Sales", "Tech Support"])
+    index.remove("Tech Support")
+    # A rename is a remove and an add.
+    index.remove("Sales")
+    index.add("Sales EU")
+    index.remove("Not there")
+
+    fresh = PanelSearchIndex(["Support", "Sales EU"])
+    assert index._grams == fresh._grams
+    assert index._sorted == fresh._sorted
+    assert len(index) == 2
+    assert index.search("port") == ["Support"]
+    assert index.search("es e") == ["Sales EU"]
+    assert index.search("tech") == []
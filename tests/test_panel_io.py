@@ -0,0 +1,168 @@
+import json
+from types import SimpleNamespace
+
+import discord
+
+from cogs.panel_io import (
+    MAX_EMBED_TITLE, MAX_OPTIONS, MAX_QUESTIONS, diff_panels, dumps, export_panels, insert_panel, validate_import
+)
+
+
+def option(name, **fields):
+    return {
+        'name': name, 'category_id': 10, 'embed_title': f"{name} title",
+        'embed_description': "Describe the problem", 'roles': [20], 'questions': ["What happened?"],
+        **fields
+    }
+
+
+def panel(name="support", options=None, **fields):
+    return {
+        'panel_name': name, 'embed_title': "Support", 'embed_description': "Pick a type",
+        'embed_color': "3447003", 'category_id': None, 'log_channel_id': 30,
+        'options': options if options is not None else [option("help"), option("bug")],
+        **fields
+    }
+
+
+def test_valid_document_has_no_errors():
+    panels, errors = validate_import({'version': 1, 'panels': [panel()]})
+    assert errors == []
+    assert len(panels) == 1
+
+
+def test_non_string_panel_name_is_a_validation_error():
+    _, errors = validate_import({'version': 1, 'panels': [panel(name=["a"]), panel(name={"b": 1})]})
+    assert any("panel_name" in error for error in errors)
+
+
+def test_non_string_option_name_is_a_validation_error():
+    _, errors = validate_import({'version': 1, 'panels': [panel(options=[option({"x": 1}), option(["y"])])]})
+    assert sum("`name`" in error for error in errors) == 2
+
+
+def test_duplicates_are_reported():
+    _, errors = validate_import({'version': 1, 'panels': [panel(options=[option("a"), option("a")]), panel()]})
+    assert any("option `a` appears more than once" in error for error in errors)
+    assert any("panel `support` appears more than once" in error for error in errors)
+
+
+def test_bad_shapes_are_reported():
+    assert validate_import([])[1]
+    _, errors = validate_import({'version': 2, 'panels': [panel(options=[]), "x"]})
+    assert len(errors) == 3
+
+
+def test_reordered_options_are_unchanged():
+    existing = {'support': {**panel(), 'id': 1}}
+    assert diff_panels(existing, [panel(options=[option("bug"), option("help")])]) == ["= support"]
+
+
+def test_reimport_keeps_option_ids(with_database):
+    async def scenario(database):
+        async def create(connection):
+            return await insert_panel(connection, 1, panel())
+        created = await database.transaction(create)
+        ids = {option['name']: option['id'] for option in created['options']}
+
+        updated_panel = panel(options=[option("bug", embed_title="Bugs"), option("billing")])
+
+        async def update(connection):
+            return await insert_panel(connection, 1, updated_panel, created['id'])
+        updated = await database.transaction(update)
+
+        rows = await database.fetchall(
+            "SELECT id, option_name, embed_title FROM ticket_options WHERE panel_id = ? ORDER BY id", (created['id'],)
+        )
+        return ids, updated, rows
+
+    ids, updated, rows = with_database(scenario)
+    assert rows[0] == (ids['bug'], "bug", "Bugs")
+    assert [name for _, name, _ in rows] == ["bug", "billing"]
+    assert [option['id'] for option in updated['options']] == [row[0] for row in rows]
+
+
+def test_discord_limits_are_enforced():
+    too_big = panel(
+        embed_title="t" * (MAX_EMBED_TITLE + 1),
+        options=[option(f"o{n}") for n in range(MAX_OPTIONS + 1)]
+    )
+    too_many_questions = panel(name="other", options=[option("help", questions=["q"] * (MAX_QUESTIONS + 1))])
+    _, errors = validate_import({'version': 1, 'panels': [too_big, too_many_questions]})
+    assert any("`embed_title` is longer than" in error for error in errors)
+    assert any(f"1 to {MAX_OPTIONS} ticket options" in error for error in errors)
+    assert any(f"at most {MAX_QUESTIONS} questions" in error for error in errors)
+
+
+def test_ids_must_be_snowflakes():
+    bad = panel(log_channel_id=True, options=[option("help", category_id=None, roles=["20", -1])])
+    _, errors = validate_import({'version': 1, 'panels': [bad]})
+    assert sum("must be a channel/role id" in error for error in errors) == 4
+
+
+def test_export_validates_and_diffs_as_unchanged():
+    cached = {**panel(options=[{**option("help"), 'id': 7, 'roles': ["20"]}]), 'id': 1}
+    document = json.loads(dumps(export_panels({'support': cached})))
+    panels, errors = validate_import(document)
+    assert errors == []
+    assert diff_panels({'support': cached}, panels) == ["= support"]
+    changed = panel(embed_title="New", options=[option("help"), option("bug")])
+    assert diff_panels({'support': cached}, [changed]) == ["~ support (fields: embed_title; added options: bug)"]
+
+
+class Guild:
+    def __init__(self, categories=(), channels=(), roles=()):
+        self.channels = {channel_id: SimpleNamespace(type=discord.ChannelType.category) for channel_id in categories}
+        self.channels.update({channel_id: SimpleNamespace(type=discord.ChannelType.text) for channel_id in channels})
+        self.roles = {role_id: SimpleNamespace(id=role_id) for role_id in roles}
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    def get_role(self, role_id):
+        return self.roles.get(role_id)
+
+
+def test_ids_must_exist_in_the_guild():
+    document = {'version': 1, 'panels': [panel(options=[option("help"), option("bug", category_id=30, roles=[21])])]}
+    assert validate_import(document, Guild(categories=[10], channels=[30], roles=[20, 21]))[1] == [
+        "panels[0].options[1]: `category_id` 30 is not a category in this server"
+    ]
+    _, errors = validate_import(document, Guild(categories=[10, 30], roles=[20]))
+    assert errors == [
+        "panels[0]: `log_channel_id` 30 is not a text channel in this server",
+        "panels[0].options[1]: `roles` 21 is not a role in this server"
+    ]
+
+
+def test_duplicate_option_rows_are_matched_in_order(with_database):
+    async def scenario(database):
+        async def create(connection):
+            return await insert_panel(connection, 1, panel(options=[option("help")]))
+        created = await database.transaction(create)
+        # Saved before duplicate names were rejected.
+        await database.write(
+            "INSERT INTO ticket_options (panel_id, option_name, category_id, embed_title, embed_description) VALUES (?, 'help', 10, 't', 'd')",
+            (created['id'],)
+        )
+        before = [row[0] for row in await database.fetchall("SELECT id FROM ticket_options ORDER BY id")]
+
+        async def update(connection):
+            return await insert_panel(connection, 1, panel(options=[option("help"), option("help", embed_title="Second")]), created['id'])
+        updated = await database.transaction(update)
+        rows = await database.fetchall("SELECT id, embed_title FROM ticket_options ORDER BY id")
+
+        async def shrink(connection):
+            return await insert_panel(connection, 1, panel(options=[option("help")]), created['id'])
+        await database.transaction(shrink)
+        left = await database.fetchall("SELECT id FROM ticket_options")
+        orphans = await database.fetchall(
+            "SELECT option_id FROM ticket_option_roles WHERE option_id NOT IN (SELECT id FROM ticket_options)"
+        )
+        return before, updated, rows, left, orphans
+
+    before, updated, rows, left, orphans = with_database(scenario)
+    assert rows == [(before[0], "help title"), (before[1], "Second")]
+    assert [option['id'] for option in updated['options']] == before
+    assert left == [(before[0],)]
+    assert orphans == []
@@ -0,0 +1,20 @@
+import pytest
+
+from cogs.query_plans import HOT_QUERIES, explain, is_table_scan
+
+
+@pytest.mark.parametrize("name, query, parameters", HOT_QUERIES, ids=[name for name, _, _ in HOT_QUERIES])
+def test_hot_query_plan(with_database, name, query, parameters):
+    async def scenario(database):
+        async with database.reader() as connection:
+            return await explain(connection, query, parameters)
+
+    plan = with_database(scenario)
+    assert plan
+    assert not [step for step in plan if is_table_scan(step)], plan
+
+
+def test_table_scan_is_detected():
+    assert is_table_scan("SCAN tickets")
+    assert not is_table_scan("SCAN t USING COVERING INDEX idx_tickets_open")
+    assert not is_table_scan("SEARCH tickets USING INDEX idx_tickets_channel (channel_id=?)")
@@ -0,0 +1,25 @@
+from cogs.query_profiler import normalize_sql
+
+
+def test_literals_become_placeholders():
+    assert normalize_sql("SELECT * FROM tickets WHERE id = 42 AND reason = 'it''s broken' AND score > 1.5") == \
+        "SELECT * FROM tickets WHERE id = ? AND reason = ? AND score > ?"
+
+
+def test_identifiers_with_digits_are_kept():
+    assert normalize_sql("SELECT * FROM panels_v7 WHERE t1.id = 3") == "SELECT * FROM panels_v7 WHERE t1.id = ?"
+
+
+def test_in_lists_fold_to_one_form():
+    short = normalize_sql("DELETE FROM ticket_options WHERE id IN (?,?)")
+    long = normalize_sql("DELETE FROM ticket_options WHERE id IN (1, 2, 3, 4)")
+    assert short == long == "DELETE FROM ticket_options WHERE id IN (?, ...)"
+    # A one-value list is left as it is.
+    assert normalize_sql("SELECT 1 FROM tickets WHERE id IN (?)") == "SELECT ? FROM tickets WHERE id IN (?)"
+
+
+def test_whitespace_is_collapsed():
+    assert normalize_sql("""
+        SELECT id
+          FROM tickets\tWHERE channel_id = ?
+    """) == "SELECT id FROM tickets WHERE channel_id = ?"
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import discord
+
+from cogs import config
+from cogs.rest_scheduler import BACKGROUND, USER, RestScheduler
+
+
+async def call(log, label):
+    log.append((label, time.monotonic()))
+
+
+def test_user_work_is_not_held_up_by_a_busy_background_route():
+    async def scenario():
+        scheduler = RestScheduler()
+        log = []
+        background = [
+            asyncio.create_task(scheduler.run(1, "messages:1", BACKGROUND, lambda n=n: call(log, f"bg{n}")))
+            for n in range(12)
+        ]
+        await asyncio.sleep(0.3)
+        started = time.monotonic()
+        await scheduler.run(1, "channel_create", USER, lambda: call(log, "user"))
+        waited = time.monotonic() - started
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        return waited, [label for label, _ in log]
+
+    waited, labels = asyncio.run(scenario())
+    assert waited < 0.1
+    # The route's burst went out; the rest were still waiting for tokens.
+    assert labels[-1] == "user" and len(labels) < 12
+
+
+def test_user_work_goes_first_on_a_shared_route():
+    async def scenario():
+        scheduler = RestScheduler()
+        log = []
+        tasks = [
+            asyncio.create_task(scheduler.run(1, "messages:1", BACKGROUND, lambda n=n: call(log, f"bg{n}")))
+            for n in range(8)
+        ]
+        while len(log) < 5:
+            await asyncio.sleep(0.01)
+        # The route's burst is spent and three BACKGROUND calls are waiting on it.
+        tasks.append(asyncio.create_task(scheduler.run(1, "messages:1", USER, lambda: call(log, "user"))))
+        while len(log) < 6:
+            await asyncio.sleep(0.01)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return [label for label, _ in log]
+
+    labels = asyncio.run(scenario())
+    assert labels == ["bg0", "bg1", "bg2", "bg3", "bg4", "user"]
+
+
+class RateLimited(discord.HTTPException):
+    def __init__(self, retry_after):
+        super().__init__(SimpleNamespace(status=429, reason="Too Many Requests"), "rate limited")
+        self.retry_after = retry_after
+
+
+def test_user_work_completes_while_a_background_route_is_rate_limited():
+    async def scenario():
+        scheduler = RestScheduler()
+        log = []
+
+        async def limited(n):
+            log.append(f"bg{n}")
+            raise RateLimited(5)
+
+        # More than REST_GUILD_CONCURRENCY calls, all held at a 429 on the same route.
+        background = [
+            asyncio.create_task(scheduler.run(1, "messages:1", BACKGROUND, lambda n=n: limited(n)))
+            for n in range(config.REST_GUILD_CONCURRENCY + 1)
+        ]
+        while len(log) < config.REST_GUILD_CONCURRENCY:
+            await asyncio.sleep(0.01)
+        started = time.monotonic()
+        await asyncio.wait_for(scheduler.run(1, "channel_create", USER, lambda: call(log, "user")), 1)
+        waited = time.monotonic() - started
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        return waited, scheduler.stats['background']['rate_limited']
+
+    waited, rate_limited = asyncio.run(scenario())
+    assert waited < 0.5
+    assert rate_limited >= config.REST_GUILD_CONCURRENCY
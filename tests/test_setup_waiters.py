@@ -0,0 +1,68 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from cogs.setup_waiters import Superseded, WaiterRegistry
+
+
+def message(channel_id, user_id, content=""):
+    return SimpleNamespace(channel=SimpleNamespace(id=channel_id), author=SimpleNamespace(id=user_id), content=content)
+
+
+def test_messages_reach_the_waiter_for_their_channel_and_author():
+    async def scenario():
+        waiters = WaiterRegistry()
+        alice = asyncio.create_task(waiters.wait(1, 10))
+        bob = asyncio.create_task(waiters.wait(1, 20))
+        elsewhere = asyncio.create_task(waiters.wait(2, 10))
+        await asyncio.sleep(0)
+
+        handled = [
+            waiters.dispatch(message(1, 30, "not waited for")),
+            waiters.dispatch(message(1, 20, "bob")),
+            waiters.dispatch(message(2, 10, "alice in 2")),
+            waiters.dispatch(message(1, 10, "alice in 1")),
+        ]
+        replies = [(await task).content for task in (alice, bob, elsewhere)]
+        return handled, replies, len(waiters), waiters._channels
+
+    handled, replies, pending, channels = asyncio.run(scenario())
+    assert handled == [False, True, True, True]
+    assert replies == ["alice in 1", "bob", "alice in 2"]
+    assert pending == 0 and not channels
+
+
+def test_channels_without_a_wizard_are_ignored():
+    async def scenario():
+        waiters = WaiterRegistry()
+        task = asyncio.create_task(waiters.wait(1, 10, timeout=0.05))
+        await asyncio.sleep(0)
+        handled = waiters.dispatch(message(2, 10))
+        with pytest.raises(asyncio.TimeoutError):
+            await task
+        return handled, len(waiters), waiters._channels
+
+    handled, pending, channels = asyncio.run(scenario())
+    assert not handled
+    assert pending == 0 and not channels
+
+
+def test_reusing_a_key_supersedes_the_older_waiter():
+    async def scenario():
+        waiters = WaiterRegistry()
+        older = asyncio.create_task(waiters.wait(1, 10))
+        await asyncio.sleep(0)
+        newer = asyncio.create_task(waiters.wait(1, 10))
+        await asyncio.sleep(0)
+        with pytest.raises(Superseded):
+            await older
+        # The older waiter's cleanup must not remove its replacement.
+        still_waiting = len(waiters)
+        waiters.dispatch(message(1, 10, "reply"))
+        return still_waiting, (await newer).content, len(waiters)
+
+    still_waiting, reply, pending = asyncio.run(scenario())
+    assert still_waiting == 1
+    assert reply == "reply"
+    assert pending == 0
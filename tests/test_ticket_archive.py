@@ -0,0 +1,72 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from cogs.ticket_archive import GuildArchive, TicketArchive
+from cogs.transcript_search import index_transcript, search_transcripts
+from cogs.transcripts import compress_transcript, save_blob
+
+GUILD = 1
+
+
+async def close_ticket(database, ticket_id, transcript, closed_at):
+    digest, raw_size, data = compress_transcript(transcript)
+
+    async def job(connection):
+        await save_blob(connection, digest, raw_size, data)
+        await connection.execute(
+            """INSERT INTO tickets (id, ticket_name, user_id, guild_id, closed, created_at, closed_at, transcript_hash)
+               VALUES (?, ?, 2, ?, 1, ?, ?, ?)""",
+            (ticket_id, f"ticket-{ticket_id}", GUILD, closed_at, closed_at, digest)
+        )
+        await index_transcript(connection, ticket_id, GUILD, transcript.split("\n"))
+
+    await database.transaction(job)
+
+
+def test_old_tickets_round_trip_through_the_archive(with_database, tmp_path):
+    async def scenario(database):
+        await close_ticket(database, 1, "alice: the printer is on fire", "2020-01-01 10:00:00")
+        await close_ticket(database, 2, "bob: printer fixed, thanks", "2020-01-02 10:00:00")
+        # Same transcript as ticket 1, but recent: it keeps the shared blob.
+        await close_ticket(database, 3, "alice: the printer is on fire", "2999-01-01 10:00:00")
+
+        archive = TicketArchive(SimpleNamespace(database=database), after_days=30, root=str(tmp_path / "archive"))
+        archived = await archive.archive_old_tickets()
+        return (
+            archived,
+            await database.fetchall("SELECT id FROM tickets ORDER BY id"),
+            await database.fetchone("SELECT COUNT(*) FROM transcript_blobs"),
+            [row[0] for row in await search_transcripts(database, GUILD, "printer")],
+            await archive.fetch(GUILD, 1),
+            await archive.fetch(GUILD, 3)
+        )
+
+    archived, remaining, blobs, found, record, missing = with_database(scenario)
+    assert archived == 2
+    assert remaining == [(3,)]
+    assert blobs == (1,)
+    assert found == [3]
+    assert record['ticket_name'] == "ticket-1"
+    assert record['closed_at'] == "2020-01-01 10:00:00"
+    assert record['transcript'] == "alice: the printer is on fire"
+    assert missing is None
+
+
+def test_segments_roll_over_and_detect_corruption(tmp_path):
+    archive = GuildArchive(str(tmp_path), GUILD, segment_bytes=64)
+    records = [(ticket_id, random.Random(ticket_id).randbytes(100)) for ticket_id in range(1, 4)]
+    archive.append(records)
+    # Archived again after an interrupted pass: the newest copy wins.
+    archive.append([(2, b"again")])
+
+    assert len(list((tmp_path / str(GUILD)).glob("segment-*.z"))) == 4
+    assert archive.read(1) == records[0][1]
+    assert archive.read(2) == b"again"
+    assert archive.read(9) is None
+
+    segment = tmp_path / str(GUILD) / "segment-000001.z"
+    segment.write_bytes(bytes([segment.read_bytes()[0] ^ 1]) + segment.read_bytes()[1:])
+    with pytest.raises(ValueError):
+        archive.read(1)
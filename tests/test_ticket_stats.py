@@ -0,0 +1,69 @@
+from cogs.ticket_stats import CLOSE_BUCKETS, close_bucket, median_seconds, rebuild_rollups, record_closed, record_opened
+
+ROLLUP_TABLES = ('ticket_rollups', 'ticket_closer_rollups', 'ticket_close_times')
+
+
+async def rollups(database):
+    return {table: await database.fetchall(f"SELECT * FROM {table} ORDER BY 1, 2, 3") for table in ROLLUP_TABLES}
+
+
+def test_rebuild_matches_incremental_counts(with_database):
+    async def scenario(database):
+        # Open tickets the way TicketView does, then close some the way closure jobs do.
+        tickets = [(1, 100, "help"), (1, 101, "help"), (1, 102, "bug"), (2, 200, None)]
+        for guild_id, channel_id, option_name in tickets:
+            async def open_ticket(connection):
+                await connection.execute(
+                    "INSERT INTO tickets (user_id, channel_id, guild_id, option_name) VALUES (5, ?, ?, ?)",
+                    (channel_id, guild_id, option_name)
+                )
+                await record_opened(connection, guild_id, option_name)
+            await database.transaction(open_ticket)
+
+        for guild_id, channel_id, closer_id in ((1, 100, 7), (1, 102, 8), (2, 200, 7)):
+            async def close_ticket(connection):
+                await connection.execute(
+                    """INSERT INTO closure_jobs (guild_id, channel_id, channel_name, ticket_id, closer_id)
+                       VALUES (?, ?, 'ticket', (SELECT id FROM tickets WHERE channel_id = ?), ?)""",
+                    (guild_id, channel_id, channel_id, closer_id)
+                )
+                await record_closed(connection, channel_id, closer_id)
+                await connection.execute(
+                    "UPDATE tickets SET closed = 1, closed_at = CURRENT_TIMESTAMP WHERE channel_id = ?", (channel_id,)
+                )
+            await database.transaction(close_ticket)
+
+        incremental = await rollups(database)
+        await database.transaction(rebuild_rollups)
+        return incremental, await rollups(database)
+
+    incremental, rebuilt = with_database(scenario)
+    assert rebuilt == incremental
+    assert sum(row[3] for row in incremental['ticket_rollups']) == 4
+    assert sum(row[4] for row in incremental['ticket_rollups']) == 3
+    assert [row[2:] for row in incremental['ticket_closer_rollups']] == [(7, 1), (8, 1), (7, 1)]
+
+
+def test_rebuild_for_one_guild_leaves_the_others(with_database):
+    async def scenario(database):
+        async def seed(connection):
+            await connection.execute(
+                "INSERT INTO ticket_rollups VALUES (1, '2020-01-01', '', 3, 3), (2, '2020-01-01', '', 9, 9)"
+            )
+        await database.transaction(seed)
+
+        async def rebuild(connection):
+            await rebuild_rollups(connection, guild_id=1)
+        await database.transaction(rebuild)
+        return await database.fetchall("SELECT guild_id, opened FROM ticket_rollups")
+
+    assert with_database(scenario) == [(2, 9)]
+
+
+def test_close_time_buckets_and_median():
+    assert close_bucket(0) == 0
+    assert close_bucket(60) == 0
+    assert close_bucket(61) == 1
+    assert close_bucket(10 ** 9) == len(CLOSE_BUCKETS)
+    assert median_seconds({}) is None
+    assert median_seconds({1: 2}) == 180.0
@@ -0,0 +1,128 @@
+import asyncio
+from types import SimpleNamespace
+
+from cogs import config
+from cogs.benchmarks.fakes import FakeGuild, FakeRest, FakeUser
+from cogs.transcript_capture import TranscriptCapture
+from cogs.transcripts import TranscriptWriter
+
+
+def setup_capture(database):
+    rest = FakeRest(latency=0, jitter=0)
+    guild = FakeGuild(rest, "guild")
+    channel = guild.add_channel("ticket-1")
+    capture = TranscriptCapture(SimpleNamespace(database=database), enabled=True)
+    capture.track(channel.id)
+    return capture, channel, FakeUser(rest, "alice")
+
+
+async def stored(database, channel):
+    return await database.fetchall(
+        "SELECT message_id, content FROM transcript_messages WHERE channel_id = ? ORDER BY message_id", (channel.id,)
+    )
+
+
+def test_messages_are_buffered_until_a_batch_fills(with_database, monkeypatch):
+    monkeypatch.setattr(config, "TRANSCRIPT_CAPTURE_FLUSH_ROWS", 3)
+    monkeypatch.setattr(config, "TRANSCRIPT_CAPTURE_FLUSH_SECONDS", 60)
+
+    async def scenario(database):
+        capture, channel, alice = setup_capture(database)
+        other = channel.guild.add_channel("general")
+        capture.add_message(other.post(alice, "not a ticket"))
+        for n in range(2):
+            capture.add_message(channel.post(alice, f"message {n}"))
+        await asyncio.sleep(0.05)
+        buffered = await stored(database, channel)
+
+        capture.add_message(channel.post(alice, "message 2"))
+        await asyncio.sleep(0.05)
+        flushed = await stored(database, channel)
+        total = await database.fetchone("SELECT COUNT(*) FROM transcript_messages")
+        return buffered, flushed, total, capture._flush_handle
+
+    buffered, flushed, total, handle = with_database(scenario)
+    assert buffered == []
+    assert [content for _, content in flushed] == ["message 0", "message 1", "message 2"]
+    assert total == (3,)
+    # The batch flush cancelled the timer started by the first message.
+    assert handle is None
+
+
+def test_a_partial_batch_is_flushed_after_the_delay(with_database, monkeypatch):
+    monkeypatch.setattr(config, "TRANSCRIPT_CAPTURE_FLUSH_SECONDS", 0.05)
+
+    async def scenario(database):
+        capture, channel, alice = setup_capture(database)
+        capture.add_message(channel.post(alice, "hello"))
+        await asyncio.sleep(0.2)
+        return await stored(database, channel)
+
+    assert [content for _, content in with_database(scenario)] == ["hello"]
+
+
+def test_raw_edits_and_deletes_apply_to_stored_rows(with_database, monkeypatch):
+    monkeypatch.setattr(config, "TRANSCRIPT_CAPTURE_FLUSH_SECONDS", 60)
+
+    async def scenario(database):
+        capture, channel, alice = setup_capture(database)
+        messages = [channel.post(alice, f"message {n}") for n in range(3)]
+        for message in messages:
+            capture.add_message(message)
+
+        # Still buffered: the edit has to flush before it can update the row.
+        await capture.edit_message(SimpleNamespace(
+            channel_id=channel.id, message_id=messages[0].id, data={'content': "edited"}
+        ))
+        # An embed-only update carries no content and leaves the row alone.
+        await capture.edit_message(SimpleNamespace(channel_id=channel.id, message_id=messages[1].id, data={}))
+        await capture.delete_messages(channel.id, [messages[2].id])
+        return await stored(database, channel), [message.id for message in messages]
+
+    rows, ids = with_database(scenario)
+    assert rows == [(ids[0], "edited"), (ids[1], "message 1")]
+
+
+def test_fill_gap_crawls_only_after_the_last_captured_message(with_database, monkeypatch):
+    monkeypatch.setattr(config, "TRANSCRIPT_CAPTURE_FLUSH_ROWS", 2)
+
+    async def scenario(database):
+        capture, channel, alice = setup_capture(database)
+        before = [channel.post(alice, f"captured {n}") for n in range(2)]
+        for message in before:
+            capture.add_message(message)
+        await capture.flush()
+        # What the channel says now about a captured message; a crawl from the start would copy it.
+        before[0].content = "changed while offline"
+
+        # Restarted while these were posted.
+        await database.write(
+            "INSERT INTO tickets (ticket_name, user_id, channel_id, guild_id) VALUES ('ticket-1', ?, ?, ?)",
+            (alice.id, channel.id, channel.guild.id)
+        )
+        await capture.load()
+        for n in range(3):
+            channel.post(alice, f"missed {n}")
+        crawled = []
+        history = channel.history
+
+        def recorded_history(**kwargs):
+            crawled.append(kwargs['after'].id)
+            return history(**kwargs)
+        channel.history = recorded_history
+
+        writer = TranscriptWriter()
+        try:
+            captured = await capture.write_transcript(channel, writer)
+            lines = list(writer.lines())
+        finally:
+            writer.close()
+        return captured, crawled, [message.id for message in before], lines, capture.gaps
+
+    captured, crawled, before_ids, lines, gaps = with_database(scenario)
+    assert captured
+    assert crawled == [before_ids[-1]]
+    assert [line.split(": ", 1)[1] for line in lines] == [
+        "captured 0", "captured 1", "missed 0", "missed 1", "missed 2"
+    ]
+    assert gaps == {}
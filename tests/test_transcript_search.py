@@ -0,0 +1,88 @@
+from cogs.transcript_search import find_snippet, index_chunks, index_transcript, search_transcripts, unindex_transcript
+from cogs.transcripts import compress_transcript, save_blob
+
+GUILD = 1
+
+
+async def close_ticket(database, ticket_id, transcript, guild_id=GUILD):
+    digest, raw_size, data = compress_transcript(transcript)
+
+    async def job(connection):
+        await save_blob(connection, digest, raw_size, data)
+        await connection.execute(
+            """INSERT INTO tickets (id, ticket_name, user_id, guild_id, closed, closed_at, transcript_hash)
+               VALUES (?, ?, 2, ?, 1, '2024-05-01 12:00:00', ?)""",
+            (ticket_id, f"ticket-{ticket_id}", guild_id, digest)
+        )
+        await index_transcript(connection, ticket_id, guild_id, transcript.split("\n"))
+
+    await database.transaction(job)
+
+
+def test_chunks_keep_whole_lines():
+    lines = [f"line {n}" for n in range(50)]
+    chunks = list(index_chunks(lines, 40))
+    assert len(chunks) > 1
+    assert "\n".join(chunks).split("\n") == lines
+
+
+def test_terms_may_match_in_different_chunks(with_database):
+    async def scenario(database):
+        await close_ticket(database, 1, "refund please\n" + "filler\n" * 5000 + "invoice attached")
+        await close_ticket(database, 2, "refund only")
+        return await search_transcripts(database, GUILD, "refund invoice")
+
+    rows = with_database(scenario)
+    assert [row[0] for row in rows] == [1]
+    assert rows[0][5] == "**refund** please"
+
+
+def test_candidates_come_only_from_the_guild(with_database):
+    async def scenario(database):
+        # Other guilds' better matches must not use up this guild's candidates.
+        for ticket_id in range(1, 21):
+            await close_ticket(database, ticket_id, "refund " * 5, guild_id=2)
+        for ticket_id in range(21, 24):
+            await close_ticket(database, ticket_id, "refund requested for order " + "x " * ticket_id)
+        return await search_transcripts(database, GUILD, "refund", candidates=3)
+
+    assert sorted(row[0] for row in with_database(scenario)) == [21, 22, 23]
+
+
+def test_keyset_pagination_visits_every_match_once(with_database):
+    async def scenario(database):
+        for ticket_id in range(1, 8):
+            await close_ticket(database, ticket_id, "printer " * ticket_id + "jammed")
+        seen = []
+        after = None
+        while True:
+            page = await search_transcripts(database, GUILD, "printer", after=after, limit=3)
+            if not page:
+                return seen
+            seen.extend(row[0] for row in page)
+            after = (page[-1][6], page[-1][0])
+
+    assert sorted(with_database(scenario)) == list(range(1, 8))
+
+
+def test_unindex_removes_every_chunk(with_database):
+    transcript = "\n".join(f"message {n} about shipping" for n in range(3000))
+
+    async def scenario(database):
+        await close_ticket(database, 1, transcript)
+        await close_ticket(database, 2, "shipping late")
+
+        async def unindex(connection):
+            await unindex_transcript(connection, 1, GUILD, transcript)
+            # A ticket that was never indexed is left alone.
+            await unindex_transcript(connection, 3, GUILD, "shipping")
+
+        await database.transaction(unindex)
+        return await search_transcripts(database, GUILD, "shipping")
+
+    assert [row[0] for row in with_database(scenario)] == [2]
+
+
+def test_snippet_reads_legacy_text():
+    assert find_snippet("hello\nthe Printer is on fire", None, None, ['"printer"']) == "the **Printer** is on fire"
+    assert find_snippet(None, None, None, ['"printer"']) == ""
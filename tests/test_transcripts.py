@@ -0,0 +1,30 @@
+import asyncio
+import gzip
+import threading
+
+from cogs.transcripts import TranscriptWriter
+
+
+def test_gzip_upload_is_encoded_once_off_the_event_loop():
+    async def scenario():
+        writer = TranscriptWriter(compress=True, spool_size=64)
+        for n in range(500):
+            writer.write_line(f"line {n}")
+        threads = []
+        gzip_once = writer._gzip
+
+        def encode():
+            threads.append(threading.current_thread())
+            return gzip_once()
+        writer._gzip = encode
+        try:
+            files = await asyncio.gather(writer.file("t-1"), writer.file("t-1"))
+            return [(file.filename, gzip.decompress(file.fp.read())) for file in files], threads
+        finally:
+            writer.close()
+
+    files, threads = asyncio.run(scenario())
+    expected = "\n".join(f"line {n}" for n in range(500)).encode()
+    assert files == [("transcript-t-1.txt.gz", expected)] * 2
+    assert len(threads) == 1
+    assert threads[0] is not threading.main_thread()
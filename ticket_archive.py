@@ -0,0 +1,217 @@
+import asyncio
+import json
+import os
+import struct
+import zlib
+from typing import Dict, List, Optional, Tuple
+from . import config
+from .closure_jobs import DELETED, FAILED
+from .transcripts import decode_transcript
+from .transcript_search import unindex_transcript
+from .queries import ARCHIVABLE_TICKETS, ARCHIVE_COLUMNS
+
+# One index entry per archived ticket: ticket id, segment number, offset, length, crc32.
+INDEX_ENTRY = struct.Struct("<QIQII")
+INDEX_FILE = "index.bin"
+SEGMENT_FILE = "segment-{:06d}.z"
+
+
+class GuildArchive:
+    """
+    One guild's archived tickets: append-only segment files of individually
+    zlib-compressed records, and an index of where each record starts. A
+    ticket is read back with one index scan and one seek, without touching
+    the rest of its segment. Blocking; callers run it in a thread.
+    """
+
+    def __init__(self, root: str, guild_id: int, segment_bytes: int = config.ARCHIVE_SEGMENT_BYTES):
+        self.path = os.path.join(root, str(guild_id))
+        self.segment_bytes = segment_bytes
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.path, SEGMENT_FILE.format(number))
+
+    def _current_segment(self) -> int:
+        numbers = [
+            int(name[8:14]) for name in os.listdir(self.path)
+            if name.startswith("segment-") and name.endswith(".z")
+        ]
+        return max(numbers, default=1)
+
+    def append(self, records: List[Tuple[int, bytes]]):
+        """Write ``(ticket_id, compressed record)`` pairs; durable once this returns."""
+        os.makedirs(self.path, exist_ok=True)
+        number = self._current_segment()
+        entries = []
+        segment = open(self._segment_path(number), "ab")
+        try:
+            for ticket_id, data in records:
+                if segment.tell() and segment.tell() + len(data) > self.segment_bytes:
+                    segment.flush()
+                    os.fsync(segment.fileno())
+                    segment.close()
+                    number += 1
+                    segment = open(self._segment_path(number), "ab")
+                entries.append(INDEX_ENTRY.pack(ticket_id, number, segment.tell(), len(data), zlib.crc32(data)))
+                segment.write(data)
+            segment.flush()
+            os.fsync(segment.fileno())
+        finally:
+            segment.close()
+
+        # Records are on disk before the index points at them.
+        with open(os.path.join(self.path, INDEX_FILE), "ab") as index:
+            index.write(b"".join(entries))
+            index.flush()
+            os.fsync(index.fileno())
+
+    def read(self, ticket_id: int) -> Optional[bytes]:
+        """The compressed record for ``ticket_id``, or None if it isn't archived."""
+        try:
+            with open(os.path.join(self.path, INDEX_FILE), "rb") as index:
+                data = index.read()
+        except FileNotFoundError:
+            return None
+
+        found = None
+        usable = len(data) - len(data) % INDEX_ENTRY.size
+        for entry in INDEX_ENTRY.iter_unpack(data[:usable]):
+            if entry[0] == ticket_id:
+                # Archived twice after an interrupted pass; the last copy wins.
+                found = entry
+        if found is None:
+            return None
+
+        _, number, offset, length, checksum = found
+        with open(self._segment_path(number), "rb") as segment:
+            segment.seek(offset)
+            record = segment.read(length)
+        if zlib.crc32(record) != checksum:
+            raise ValueError(f"Archived ticket {ticket_id} is corrupt")
+        return record
+
+
+def _encode(record: dict) -> bytes:
+    return zlib.compress(json.dumps(record, ensure_ascii=False).encode("utf-8"), config.TRANSCRIPT_COMPRESSION_LEVEL)
+
+
+def _decode(data: bytes) -> dict:
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+class TicketArchive:
+    """
+    Moves tickets closed more than ARCHIVE_AFTER_DAYS ago out of the
+    database into per-guild archive files under ARCHIVE_DIR.
+
+    Every ARCHIVE_INTERVAL_HOURS it takes the oldest closed tickets in
+    batches of ARCHIVE_BATCH: their rows and transcripts are written to the
+    archive and synced, then deleted from ``tickets``, the search index and
+    ``transcript_blobs`` in one transaction, and up to ARCHIVE_VACUUM_PAGES
+    freed pages are returned to the filesystem. A pass interrupted between
+    the two steps archives the same tickets again next time, which is
+    harmless: lookups take the newest copy.
+    """
+
+    def __init__(self, bot, after_days: int = config.ARCHIVE_AFTER_DAYS, root: str = config.ARCHIVE_DIR):
+        self.bot = bot
+        self.after_days = after_days
+        self.root = root
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.after_days > 0
+
+    def start(self):
+        if self.enabled:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    def guild(self, guild_id: Optional[int]) -> GuildArchive:
+        return GuildArchive(self.root, guild_id or 0)
+
+    async def _run(self):
+        while True:
+            try:
+                archived = await self.archive_old_tickets()
+                if archived:
+                    print(f"Archived {archived} closed tickets")
+            except Exception as e:
+                print(f"Ticket archival failed: {e}")
+            await asyncio.sleep(config.ARCHIVE_INTERVAL_HOURS * 3600)
+
+    async def archive_old_tickets(self) -> int:
+        """Run one archival pass. Returns how many tickets were moved."""
+        total = 0
+        while True:
+            rows = await self.bot.database.fetchall(
+                ARCHIVABLE_TICKETS, (f"-{self.after_days} days", config.ARCHIVE_BATCH)
+            )
+            if not rows:
+                return total
+            await self._archive(rows)
+            total += len(rows)
+            if len(rows) < config.ARCHIVE_BATCH:
+                return total
+
+    async def _archive(self, rows: List[tuple]):
+        by_guild: Dict[int, List[Tuple[int, bytes]]] = {}
+        hashes = set()
+        indexed = []
+        for row in rows:
+            record = dict(zip(ARCHIVE_COLUMNS, row))
+            legacy, transcript_hash, codec, data = row[len(ARCHIVE_COLUMNS):]
+            record['transcript'] = await decode_transcript(legacy, codec, data)
+            encoded = await asyncio.to_thread(_encode, record)
+            by_guild.setdefault(record['guild_id'] or 0, []).append((record['id'], encoded))
+            if transcript_hash:
+                hashes.add(transcript_hash)
+            if record['transcript'] is not None:
+                indexed.append((record['id'], record['guild_id'], record['transcript']))
+
+        for guild_id, records in by_guild.items():
+            await asyncio.to_thread(self.guild(guild_id).append, records)
+
+        ticket_ids = tuple(row[0] for row in rows)
+        hashes = tuple(hashes)
+
+        async def delete(connection):
+            marks = ','.join('?' * len(ticket_ids))
+            for ticket_id, guild_id, transcript in indexed:
+                await unindex_transcript(connection, ticket_id, guild_id, transcript)
+            await connection.execute(
+                f"DELETE FROM closure_jobs WHERE ticket_id IN ({marks}) AND state IN (?, ?)",
+                ticket_ids + (DELETED, FAILED)
+            )
+            await connection.execute(f"DELETE FROM tickets WHERE id IN ({marks})", ticket_ids)
+            if hashes:
+                # Identical transcripts share a blob; keep it while a hot ticket still uses it.
+                await connection.execute(
+                    f"""DELETE FROM transcript_blobs
+                        WHERE hash IN ({','.join('?' * len(hashes))})
+                          AND NOT EXISTS (SELECT 1 FROM tickets WHERE transcript_hash = transcript_blobs.hash)""",
+                    hashes
+                )
+
+        async def vacuum(connection):
+            cursor = await connection.execute("PRAGMA freelist_count")
+            free = (await cursor.fetchone())[0]
+            # The sqlite3 module steps a statement without result columns only
+            # once, and each step of incremental_vacuum frees a single page.
+            for _ in range(min(free, config.ARCHIVE_VACUUM_PAGES)):
+                cursor = await connection.execute("PRAGMA incremental_vacuum")
+                await cursor.close()
+
+        await self.bot.database.transaction(delete)
+        await self.bot.database.transaction(vacuum)
+
+    async def fetch(self, guild_id: int, ticket_id: int) -> Optional[dict]:
+        """An archived ticket with its transcript, or None."""
+        data = await asyncio.to_thread(self.guild(guild_id).read, ticket_id)
+        if data is None:
+            return None
+        return await asyncio.to_thread(_decode, data)
@@ -0,0 +1,211 @@
+import bisect
+import datetime
+import struct
+import zlib
+from typing import Dict, List, Optional, Tuple
+from .queries import (
+    OPEN_TICKET_FOR_ROLLUP, STATS_BACKLOG, STATS_CLOSE_TIMES, STATS_PER_CLOSER, STATS_PER_DAY, STATS_PER_OPTION
+)
+
+# Upper bounds, in seconds, of the time-to-close histogram buckets; one more bucket holds the rest.
+CLOSE_BUCKETS = (
+    60, 300, 900, 1800, 3600, 2 * 3600, 4 * 3600, 8 * 3600, 12 * 3600,
+    86400, 2 * 86400, 3 * 86400, 7 * 86400, 14 * 86400, 30 * 86400
+)
+
+_CLOSE_SECONDS = "CAST(strftime('%s', t.closed_at) AS INTEGER) - CAST(strftime('%s', t.created_at) AS INTEGER)"
+_BUCKET_CASE = "CASE " + " ".join(
+    f"WHEN {_CLOSE_SECONDS} <= {bound} THEN {index}" for index, bound in enumerate(CLOSE_BUCKETS)
+) + f" ELSE {len(CLOSE_BUCKETS)} END"
+
+
+def close_bucket(seconds: int) -> int:
+    return bisect.bisect_left(CLOSE_BUCKETS, seconds)
+
+
+async def record_opened(connection, guild_id: int, option_name: Optional[str]):
+    """Count a new ticket in today's rollup; run in the job that inserts it."""
+    await connection.execute(
+        """INSERT INTO ticket_rollups (guild_id, day, option_name, opened, closed)
+           VALUES (?, date('now'), ?, 1, 0)
+           ON CONFLICT (guild_id, day, option_name) DO UPDATE SET opened = opened + 1""",
+        (guild_id or 0, option_name or '')
+    )
+
+
+async def record_closed(connection, channel_id: int, closer_id: int):
+    """Count the closure of the channel's open ticket; run in the job that closes it, before the UPDATE."""
+    cursor = await connection.execute(OPEN_TICKET_FOR_ROLLUP, (channel_id,))
+    for guild_id, option_name, day, seconds in await cursor.fetchall():
+        guild_id = guild_id or 0
+        await connection.execute(
+            """INSERT INTO ticket_rollups (guild_id, day, option_name, opened, closed)
+               VALUES (?, ?, ?, 0, 1)
+               ON CONFLICT (guild_id, day, option_name) DO UPDATE SET closed = closed + 1""",
+            (guild_id, day, option_name or '')
+        )
+        await connection.execute(
+            """INSERT INTO ticket_closer_rollups (guild_id, day, closer_id, closed)
+               VALUES (?, ?, ?, 1)
+               ON CONFLICT (guild_id, day, closer_id) DO UPDATE SET closed = closed + 1""",
+            (guild_id, day, closer_id)
+        )
+        await connection.execute(
+            """INSERT INTO ticket_close_times (guild_id, day, bucket, tickets)
+               VALUES (?, ?, ?, 1)
+               ON CONFLICT (guild_id, day, bucket) DO UPDATE SET tickets = tickets + 1""",
+            (guild_id, day, close_bucket(max(seconds or 0, 0)))
+        )
+
+
+async def rebuild_rollups(connection, guild_id: Optional[int] = None, since: Optional[str] = None):
+    """
+    Recompute the rollups from ``tickets`` for one guild (or all of them)
+    from day ``since`` (or from the start). Days before ``since`` are left
+    alone, which keeps the counts of tickets already archived.
+    """
+    conditions = []
+    parameters: list = []
+    if guild_id is not None:
+        conditions.append("{guild} = ?")
+        parameters.append(guild_id)
+    if since is not None:
+        conditions.append("{day} >= ?")
+        parameters.append(since)
+
+    def where(guild: str, day: str, *extra: str) -> str:
+        clauses = [condition.format(guild=guild, day=day) for condition in conditions] + list(extra)
+        return "WHERE " + " AND ".join(clauses) if clauses else "WHERE 1"
+
+    for table in ('ticket_rollups', 'ticket_closer_rollups', 'ticket_close_times'):
+        await connection.execute(f"DELETE FROM {table} {where('guild_id', 'day')}", parameters)
+
+    await connection.execute(
+        f"""INSERT INTO ticket_rollups (guild_id, day, option_name, opened, closed)
+            SELECT COALESCE(t.guild_id, 0), date(t.created_at), COALESCE(t.option_name, ''), COUNT(*), 0
+            FROM tickets t
+            {where('COALESCE(t.guild_id, 0)', 'date(t.created_at)', 't.created_at IS NOT NULL')}
+            GROUP BY 1, 2, 3""",
+        parameters
+    )
+    closed = where('COALESCE(t.guild_id, 0)', 'date(t.closed_at)', 't.closed = 1', 't.closed_at IS NOT NULL')
+    await connection.execute(
+        f"""INSERT INTO ticket_rollups (guild_id, day, option_name, opened, closed)
+            SELECT COALESCE(t.guild_id, 0), date(t.closed_at), COALESCE(t.option_name, ''), 0, COUNT(*)
+            FROM tickets t
+            {closed}
+            GROUP BY 1, 2, 3
+            ON CONFLICT (guild_id, day, option_name) DO UPDATE SET closed = excluded.closed""",
+        parameters
+    )
+    # A closed ticket's last closure job is the one that closed it. Tickets
+    # closed before closure jobs existed have no recorded closer.
+    await connection.execute(
+        f"""INSERT INTO ticket_closer_rollups (guild_id, day, closer_id, closed)
+            SELECT COALESCE(t.guild_id, 0), date(t.closed_at), j.closer_id, COUNT(*)
+            FROM tickets t
+            JOIN closure_jobs j ON j.id = (SELECT MAX(id) FROM closure_jobs WHERE ticket_id = t.id)
+            {closed}
+            GROUP BY 1, 2, 3""",
+        parameters
+    )
+    await connection.execute(
+        f"""INSERT INTO ticket_close_times (guild_id, day, bucket, tickets)
+            SELECT COALESCE(t.guild_id, 0), date(t.closed_at), {_BUCKET_CASE}, COUNT(*)
+            FROM tickets t
+            {closed}
+            GROUP BY 1, 2, 3""",
+        parameters
+    )
+
+
+def median_seconds(histogram: Dict[int, int]) -> Optional[float]:
+    """Median time to close from bucket counts, interpolated within its bucket."""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    middle = total / 2
+    seen = 0
+    for bucket in sorted(histogram):
+        count = histogram[bucket]
+        if seen + count >= middle:
+            low = CLOSE_BUCKETS[bucket - 1] if bucket else 0
+            if bucket >= len(CLOSE_BUCKETS):
+                return float(low)
+            return low + (CLOSE_BUCKETS[bucket] - low) * (middle - seen) / count
+        seen += count
+    return None
+
+
+async def guild_stats(database, guild_id: int, days: int) -> dict:
+    """
+    Ticket statistics for the last ``days`` days, read from the rollups.
+    Each query touches at most a row per day and option, closer or bucket,
+    however many tickets the guild has.
+    """
+    since = f"-{days - 1} days"
+    per_day = await database.fetchall(STATS_PER_DAY, (guild_id, since))
+    per_option = await database.fetchall(STATS_PER_OPTION, (guild_id, since))
+    per_closer = await database.fetchall(STATS_PER_CLOSER, (guild_id, since))
+    buckets = await database.fetchall(STATS_CLOSE_TIMES, (guild_id, since))
+    backlog = await database.fetchone(STATS_BACKLOG, (guild_id,))
+    counts = {day: (opened, closed) for day, opened, closed in per_day}
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    per_day = [
+        (day, *counts.get(day, (0, 0)))
+        for day in ((today - datetime.timedelta(days=back)).isoformat() for back in range(days - 1, -1, -1))
+    ]
+    return {
+        'per_day': per_day,
+        'per_option': per_option,
+        'per_closer': per_closer,
+        'opened': sum(row[1] for row in per_day),
+        'closed': sum(row[2] for row in per_day),
+        'median_close_seconds': median_seconds(dict(buckets)),
+        'backlog': backlog[0] if backlog else 0
+    }
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def render_chart(per_day: List[Tuple[str, int, int]], height: int = 120) -> bytes:
+    """
+    A PNG bar chart of tickets opened (blue) and closed (green) per day,
+    oldest on the left. Drawn row by row in pure Python; small enough to
+    run in a thread per command.
+    """
+    background, opened_color, closed_color = b"\x2b\x2d\x31", b"\x58\x65\xf2", b"\x57\xf2\x87"
+    bar, gap = 6, 4
+    width = max(len(per_day), 1) * (2 * bar + gap) + gap
+    peak = max([max(opened, closed) for _, opened, closed in per_day] + [1])
+    heights = [(round(opened / peak * (height - 4)), round(closed / peak * (height - 4)))
+               for _, opened, closed in per_day]
+
+    rows = []
+    for y in range(height):
+        level = height - y
+        row = bytearray(background * width)
+        for index, (opened, closed) in enumerate(heights):
+            left = gap + index * (2 * bar + gap)
+            if level <= opened:
+                row[left * 3:(left + bar) * 3] = opened_color * bar
+            if level <= closed:
+                row[(left + bar) * 3:(left + 2 * bar) * 3] = closed_color * bar
+        rows.append(b"\x00" + bytes(row))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", header)
+            + _png_chunk(b"IDAT", zlib.compress(b"".join(rows), 9)) + _png_chunk(b"IEND", b""))
+
+
+def format_duration(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{max(minutes, 1)}m"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours}h {minutes}m"
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours}h"
@@ -1,4 +1,10 @@
+import time
+import weakref
+from typing import Dict, Iterable
 import discord
+from .metrics import metrics
+from .rest_scheduler import BACKGROUND, USER, message_route
+from .ticket_stats import record_opened
 
 class TicketModal(discord.ui.Modal):
     def __init__(self, questions: list, ticket_data: dict):
@@ -17,88 +23,202 @@ class TicketModal(discord.ui.Modal):
             self.add_item(text_input)
             self.responses.append(text_input)
 
-class TicketView(discord.ui.View):
-    def __init__(self, bot, options):
-        super().__init__(timeout=None)
-        self.bot = bot
-        self.options = options
-        
-                # Validate that we have options
-        if not options:
-            raise ValueError("Options are required for ticket panel")
-        
-        select_options = []
-        for idx, option in enumerate(options):
-            select_options.append(
-                discord.SelectOption(
-                    label=option['name'],
-                    description=f"Create a {option['name']} ticket",
-                    value=option['name'],
-                    emoji="🎫"
-                )
-            )
-        
-        self.select_menu = discord.ui.Select(
-            placeholder="Select a ticket type",
-            options=select_options,
-            custom_id="ticket_select",
-            min_values=1,
-            max_values=1
-        )
-        self.select_menu.callback = self.select_callback
-        self.add_item(self.select_menu)
+ALLOW = discord.PermissionOverwrite(view_channel=True, send_messages=True)
+DENY = discord.PermissionOverwrite(view_channel=False)
 
-    async def select_callback(self, interaction: discord.Interaction):
-        option = next(opt for opt in self.options if opt['name'] == self.select_menu.values[0])
-        
-        modal = TicketModal(option['questions'], option)
-        await interaction.response.send_modal(modal)
-        await modal.wait()
+class CompiledOption:
+    """
+    A ticket option prepared once when its panel view is built: role ids
+    parsed to ints, the embed skeleton, and (on first use in a guild) the
+    permission overwrites shared by every ticket of this type.
+    """
+    __slots__ = (
+        'option_id', 'value', 'name', 'role_ids', 'category_id', 'log_channel_id',
+        'questions', 'embed_description', 'embed_prototype', '_overwrites', '_role_mentions',
+        '__weakref__'
+    )
+
+    # role id -> records whose overwrite template includes that role
+    by_role: Dict[int, "weakref.WeakSet[CompiledOption]"] = {}
 
+    def __init__(self, option: dict):
+        self.option_id = option.get('id')
+        self.value = str(self.option_id) if self.option_id is not None else option['name']
+        self.name = option['name']
+        self.role_ids = tuple(int(role_id) for role_id in option['roles'])
+        self.category_id = option['category_id']
+        self.log_channel_id = option.get('log_channel_id')
+        self.questions = tuple(option['questions'])
+        self.embed_description = option['embed_description']
+        self.embed_prototype = discord.Embed(
+            title=option['embed_title'],
+            color=discord.Color.blue()
+        )
+        self._overwrites = None
+        self._role_mentions = None
+        for role_id in self.role_ids:
+            CompiledOption.by_role.setdefault(role_id, weakref.WeakSet()).add(self)
+
+    def _compile(self, guild: discord.Guild):
         overwrites = {
-            interaction.guild.default_role: discord.PermissionOverwrite(view_channel=False),
-            interaction.user: discord.PermissionOverwrite(view_channel=True, send_messages=True),
-            interaction.guild.me: discord.PermissionOverwrite(view_channel=True, send_messages=True)
+            guild.default_role: DENY,
+            guild.me: ALLOW
         }
-
-        for role_id in option['roles']:
-            role = interaction.guild.get_role(int(role_id))
+        mentions = []
+        for role_id in self.role_ids:
+            role = guild.get_role(role_id)
             if role:
-                overwrites[role] = discord.PermissionOverwrite(view_channel=True, send_messages=True)
+                overwrites[role] = ALLOW
+                mentions.append(f"<@&{role_id}>")
+        self._overwrites = overwrites
+        self._role_mentions = ' '.join(mentions)
 
-        channel = await interaction.guild.create_text_channel(
-            name=f"{option['name']}-{interaction.user.name}".lower(),
-            category=interaction.guild.get_channel(option['category_id']),
-            overwrites=overwrites,
-            topic=f"Ticket created by {interaction.user}"
-        )
+    def overwrites_for(self, guild: discord.Guild, member: discord.abc.Snowflake) -> dict:
+        if self._overwrites is None:
+            self._compile(guild)
+        overwrites = dict(self._overwrites)
+        overwrites[member] = ALLOW
+        return overwrites
 
-        await self.bot.database.execute(
-            """INSERT INTO tickets
-               (channel_id, user_id, log_channel_id, closed)
-               VALUES (?, ?, ?, 0)""",
-            (channel.id, interaction.user.id, option.get('log_channel_id'))
-        )
-        await self.bot.database.commit()
+    def role_mentions(self, guild: discord.Guild) -> str:
+        if self._role_mentions is None:
+            self._compile(guild)
+        return self._role_mentions
 
-        embed = discord.Embed(
-            title=option['embed_title'],
-            description=f"{option['embed_description']}\nCreated by: {interaction.user.mention}",
-            color=discord.Color.blue(),
-            timestamp=discord.utils.utcnow()
-        )
-
-        for question, response in zip(option['questions'], modal.responses):
+    def build_embed(self, member: discord.abc.User, responses) -> discord.Embed:
+        embed = self.embed_prototype.copy()
+        embed.description = f"{self.embed_description}\nCreated by: {member.mention}"
+        embed.timestamp = discord.utils.utcnow()
+        for question, response in zip(self.questions, responses):
             embed.add_field(
                 name=question,
                 value=response.value or "No response provided",
                 inline=False
             )
+        return embed
 
-        role_mentions = ' '.join(f"<@&{role_id}>" for role_id in option['roles'])
-        
-        await channel.send(role_mentions, embed=embed)
-        await interaction.followup.send(f"Ticket created: {channel.mention}", ephemeral=True)
+    def invalidate(self):
+        self._overwrites = None
+        self._role_mentions = None
+
+    @classmethod
+    def role_deleted(cls, role_id: int):
+        """Drop cached overwrites that still point at a deleted role."""
+        for record in cls.by_role.pop(role_id, ()):
+            record.invalidate()
+
+def compiled_options(panel: dict) -> Dict[str, CompiledOption]:
+    """A cached panel's options by select value, compiled on first use."""
+    compiled = panel.get('compiled')
+    if compiled is None:
+        compiled = panel['compiled'] = {}
+        for option in panel['options']:
+            record = CompiledOption(option)
+            compiled[record.value] = record
+    return compiled
+
+class TicketSelect(discord.ui.DynamicItem[discord.ui.Select], template=r"ticket_panel:(?P<panel_id>[0-9]+)"):
+    """
+    The ticket type menu on a posted panel. Its custom_id carries the panel
+    id, so a single registered handler serves every panel message, including
+    ones posted before a restart.
+    """
+    def __init__(self, panel_id: int, options: Iterable[CompiledOption] = ()):
+        super().__init__(
+            discord.ui.Select(
+                placeholder="Select a ticket type",
+                options=[
+                    discord.SelectOption(
+                        label=record.name,
+                        description=f"Create a {record.name} ticket",
+                        value=record.value,
+                        emoji="🎫"
+                    )
+                    for record in options
+                ],
+                custom_id=f"ticket_panel:{panel_id}",
+                min_values=1,
+                max_values=1
+            )
+        )
+        self.panel_id = panel_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Select, match):
+        return cls(int(match['panel_id']))
+
+    async def callback(self, interaction: discord.Interaction):
+        bot = interaction.client
+        started = time.perf_counter()
+        with metrics.span("ticket_open_seconds", stage="lookup"):
+            panel = await bot.panel_cache.get_panel_by_id(interaction.guild.id, self.panel_id)
+            option = compiled_options(panel).get(interaction.data['values'][0]) if panel else None
+        if option is None:
+            await interaction.response.send_message("This ticket type no longer exists.", ephemeral=True)
+            return
+
+        with metrics.span("ticket_open_seconds", stage="modal"):
+            modal = TicketModal(option.questions, option)
+            await interaction.response.send_modal(modal)
+            await modal.wait()
+
+        name = f"{option.name}-{interaction.user.name}".lower()
+        overwrites = option.overwrites_for(interaction.guild, interaction.user)
+        topic = f"Ticket created by {interaction.user}"
+
+        with metrics.span("ticket_open_seconds", stage="channel"):
+            channel = await bot.channel_pool.claim(interaction.guild, option, name, overwrites, topic)
+            if channel is None:
+                channel = await bot.rest.run(
+                    interaction.guild.id, "channel_create", USER,
+                    lambda: interaction.guild.create_text_channel(
+                        name=name,
+                        category=interaction.guild.get_channel(option.category_id),
+                        overwrites=overwrites,
+                        topic=topic
+                    )
+                )
+
+        async def insert(connection):
+            await connection.execute(
+                """INSERT INTO tickets
+                   (ticket_name, channel_id, user_id, guild_id, log_channel_id, option_name, closed)
+                   VALUES (?, ?, ?, ?, ?, ?, 0)""",
+                (channel.name, channel.id, interaction.user.id, interaction.guild.id,
+                 option.log_channel_id, option.name)
+            )
+            await record_opened(connection, interaction.guild.id, option.name)
+
+        with metrics.span("ticket_open_seconds", stage="db_insert"):
+            await bot.database.transaction(insert)
+        bot.transcript_capture.track(channel.id)
+        metrics.inc("tickets_opened_total", guild=interaction.guild.id)
+
+        embed = option.build_embed(interaction.user, modal.responses)
         
-        self.select_menu.values.clear()
-        await interaction.message.edit(view=self)
+        with metrics.span("ticket_open_seconds", stage="first_message"):
+            await bot.rest.run(
+                interaction.guild.id, message_route(channel), USER,
+                lambda: channel.send(option.role_mentions(interaction.guild), embed=embed)
+            )
+        with metrics.span("ticket_open_seconds", stage="followup"):
+            await interaction.followup.send(f"Ticket created: {channel.mention}", ephemeral=True)
+        metrics.observe("ticket_open_seconds", time.perf_counter() - started, stage="total")
+
+        # Re-render the panel so the menu doesn't stay on the chosen option.
+        with metrics.span("ticket_open_seconds", stage="rerender"):
+            await bot.rest.run(
+                interaction.guild.id, message_route(interaction.channel), BACKGROUND,
+                lambda: interaction.message.edit(view=TicketView(panel))
+            )
+
+class TicketView(discord.ui.View):
+    """The view sent with a panel. It isn't kept after sending; TicketSelect handles clicks."""
+    def __init__(self, panel: dict):
+        super().__init__(timeout=None)
+
+        # Validate that we have options
+        if not panel['options']:
+            raise ValueError("Options are required for ticket panel")
+
+        self.add_item(TicketSelect(panel['id'], compiled_options(panel).values()))
@@ -1,133 +1,115 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-from typing import List
+import asyncio
+from .ticket_views import TicketView, TicketSelect, CompiledOption
+from .transcript_search import search_transcripts
+from .close_timers import CONFIRMED
+from .panel_io import delete_options
+from .metrics import metrics
+from .background import spawn
+from .queries import OPEN_TICKET_BY_CHANNEL
+from .ticket_stats import guild_stats, rebuild_rollups, render_chart, format_duration
+from . import config
+import datetime
 import io
-from .ticket_views import TicketView
 
 class TicketCommands(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-    
-    async def execute_query(self, query: str, parameters: tuple = ()):
-        async with self.bot.database.execute(query, parameters) as cursor:
-            return await cursor.fetchall()
-            
+
+    async def cog_load(self):
+        # Every posted panel routes through TicketSelect; nothing is kept per message.
+        self.bot.add_dynamic_items(TicketSelect)
+        rows = await self.bot.database.fetchall(
+            """SELECT pp.guild_id, COUNT(*), COUNT(p.id)
+               FROM posted_panels pp
+               LEFT JOIN panels p ON p.id = pp.panel_id
+               GROUP BY pp.guild_id
+               ORDER BY COUNT(*) DESC"""
+        )
+        if any(posted != live for _, posted, live in rows):
+            await self.bot.database.write(
+                "DELETE FROM posted_panels WHERE panel_id NOT IN (SELECT id FROM panels)"
+            )
+        spawn(self.bot.panel_cache.preload([guild_id for guild_id, _, _ in rows]), "panel cache preload")
+
     async def handle_ticket_closure(self, channel, closer, reason, creator_id, log_channel_id, force_close=False):
         """Centralized ticket closing logic for all ticket closure operations."""
-        # Generate transcript
-        messages = []
-        async for message in channel.history(limit=None, oldest_first=True):
-            messages.append(f"[{message.created_at}] {message.author}: {message.content}")
-        ticket_transcript = "\n".join(messages)
-
-        # Update database
-        await self.execute_query(
-            """UPDATE tickets 
-               SET closed = 1, 
-                   closed_at = CURRENT_TIMESTAMP,
-                   reason = ?,
-                   transcript = ?
-               WHERE channel_id = ?""",
-            (reason, ticket_transcript, channel.id)
-        )
+        with metrics.span("ticket_close_seconds", stage="enqueue"):
+            return await self.bot.closures.enqueue(channel, closer, reason, creator_id, log_channel_id, force_close)
 
-        # Create embeds
-        closure_embed = discord.Embed(
-            title="Ticket Forcefully Closed" if force_close else "Ticket Closed",
-            description=f"Your ticket in **{channel.guild.name}** has been {'forcefully ' if force_close else ''}closed by {closer.mention}\n\n**Reason:** {reason}",
-            color=discord.Color.red() if force_close else discord.Color.blue(),
-            timestamp=discord.utils.utcnow()
-        )
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        self.bot.transcript_capture.add_message(message)
 
-        log_embed = discord.Embed(
-            title="Ticket Forcefully Closed" if force_close else "Ticket Closed",
-            description=f"**Ticket:** {channel.name}\n**Closed by:** {closer.mention}\n**Reason:** {reason}",
-            color=discord.Color.red() if force_close else discord.Color.blue(),
-            timestamp=discord.utils.utcnow()
-        )
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        await self.bot.transcript_capture.edit_message(payload)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        await self.bot.transcript_capture.delete_messages(payload.channel_id, [payload.message_id])
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        await self.bot.transcript_capture.delete_messages(payload.channel_id, payload.message_ids)
 
-        # Send to log channel
-        if log_channel_id:
-            log_channel = channel.guild.get_channel(log_channel_id)
-            if log_channel:
-                await log_channel.send(embed=log_embed)
-                await log_channel.send(file=discord.File(
-                    fp=io.StringIO(ticket_transcript),
-                    filename=f"transcript-{channel.name}.txt"
-                ))
-
-        # Notify creator
-        creator = channel.guild.get_member(creator_id)
-        if creator:
-            try:
-                await creator.send(embed=closure_embed)
-                await creator.send(file=discord.File(
-                    fp=io.StringIO(ticket_transcript),
-                    filename=f"transcript-{channel.name}.txt"
-                ))
-            except discord.Forbidden:
-                pass
-
-        return ticket_transcript
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        CompiledOption.role_deleted(role.id)
 
     async def panel_autocomplete(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
-        panels = await self.execute_query(
-            "SELECT panel_name FROM panels WHERE guild_id = ?", 
-            (interaction.guild_id,)
-        )
+        panel_names = await self.bot.panel_cache.search(interaction.guild_id, current, 25)
         return [
-            app_commands.Choice(name=panel[0], value=panel[0])
-            for panel in panels if current.lower() in panel[0].lower()
-        ][:25]
+            app_commands.Choice(name=panel_name, value=panel_name)
+            for panel_name in panel_names
+        ]
     
     @app_commands.command(name="send_panel", description="Send a ticket panel in the current channel")
     @app_commands.autocomplete(panel_name=panel_autocomplete)
     async def send_panel(self, interaction: discord.Interaction, panel_name: str):
         await interaction.response.defer(ephemeral=True)
 
-        panel_data = await self.execute_query(
-            "SELECT id, panel_name, embed_title, embed_description, embed_color FROM panels WHERE panel_name = ? AND guild_id = ?",
-            (panel_name, interaction.guild.id)
-        )
+        panel = await self.bot.panel_cache.get_panel(interaction.guild.id, panel_name)
 
-        if not panel_data:
+        if not panel:
             await interaction.followup.send("Panel not found!", ephemeral=True)
             return
 
-        ticket_options = await self.execute_query(
-            """SELECT option_name, roles, category_id, embed_title, 
-               embed_description, ticket_question 
-               FROM ticket_options WHERE panel_id = ?""",
-            (panel_data[0][0],)
-        )
-
-        if not ticket_options:
+        if not panel['options']:
             await interaction.followup.send("This panel has no ticket options configured. Please add options first!", ephemeral=True)
             return
 
-        formatted_options = [
-            {
-                "name": option[0],
-                "roles": option[1].split(',') if option[1] else [],
-                "category_id": option[2],
-                "embed_title": option[3],
-                "embed_description": option[4],
-                "questions": option[5].split(',') if option[5] else []
-            }
-            for option in ticket_options
-        ]
-
         embed = discord.Embed(
-            title=panel_data[0][2],
-            description=panel_data[0][3],
+            title=panel['embed_title'],
+            description=panel['embed_description'],
             color=discord.Color.blue()
         )
 
-        view = TicketView(self.bot, formatted_options)
+        view = TicketView(panel)
         message = await interaction.channel.send(embed=embed, view=view)
+        await self.bot.database.write(
+            "INSERT OR REPLACE INTO posted_panels (message_id, channel_id, guild_id, panel_id) VALUES (?, ?, ?, ?)",
+            (message.id, message.channel.id, interaction.guild.id, panel['id'])
+        )
         await interaction.followup.send("Panel sent successfully!", ephemeral=True)
 
+    async def delete_panels(self, where: str, parameters: tuple):
+        """Delete matching panels along with their options, roles and questions."""
+        async def delete(connection):
+            cursor = await connection.execute(f"SELECT id FROM panels WHERE {where}", parameters)
+            panel_ids = tuple(panel[0] for panel in await cursor.fetchall())
+            if not panel_ids:
+                return
+
+            marks = ','.join('?' * len(panel_ids))
+            await delete_options(connection, panel_ids)
+            await connection.execute(f"DELETE FROM posted_panels WHERE panel_id IN ({marks})", panel_ids)
+            await connection.execute(f"DELETE FROM panels WHERE id IN ({marks})", panel_ids)
+
+        await self.bot.database.transaction(delete)
+
     @app_commands.command(name="clear_panels", description="Clear ticket panels")
     @app_commands.choices(clear_type=[
         app_commands.Choice(name="Single Panel", value="single"),
@@ -137,16 +119,12 @@ class TicketCommands(commands.Cog):
         await interaction.response.defer(ephemeral=True)
 
         if clear_type == "all":
-            await self.execute_query(
-                "DELETE FROM panels WHERE guild_id = ?",
-                (interaction.guild.id,)
-            )
+            await self.delete_panels("guild_id = ?", (interaction.guild.id,))
+            self.bot.panel_cache.clear_guild(interaction.guild.id)
             await interaction.followup.send("All panels have been cleared!", ephemeral=True)
         elif panel_name:
-            await self.execute_query(
-                "DELETE FROM panels WHERE panel_name = ? AND guild_id = ?",
-                (panel_name, interaction.guild.id)
-            )
+            await self.delete_panels("panel_name = ? AND guild_id = ?", (panel_name, interaction.guild.id))
+            self.bot.panel_cache.remove_panel(interaction.guild.id, panel_name)
             await interaction.followup.send(f"Panel `{panel_name}` has been cleared!", ephemeral=True)
         else:
             await interaction.followup.send("Please provide a panel name to clear.", ephemeral=True)
@@ -156,8 +134,8 @@ class TicketCommands(commands.Cog):
     async def close_request(self, interaction: discord.Interaction, reason: str, hours: int = None):
         await interaction.response.defer()
         
-        ticket_data = await self.execute_query(
-            "SELECT user_id, log_channel_id FROM tickets WHERE channel_id = ? AND closed = 0",
+        ticket_data = await self.bot.database.fetchall(
+            OPEN_TICKET_BY_CHANNEL,
             (interaction.channel.id,)
         )
         
@@ -168,24 +146,32 @@ class TicketCommands(commands.Cog):
         ticket_creator_id = ticket_data[0][0]
         log_channel_id = ticket_data[0][1]
 
-        view = ConfirmClose(self, ticket_creator_id, reason, log_channel_id, hours)
+        view = ConfirmClose(self)
         embed = discord.Embed(
             title="Ticket Close Request",
             description=f"{interaction.user.mention} has requested to close this ticket.\n\n**Reason:** {reason}",
             color=discord.Color.blue()
         )
+        if hours:
+            closes_at = discord.utils.utcnow() + datetime.timedelta(hours=hours)
+            embed.add_field(name="Closes automatically", value=discord.utils.format_dt(closes_at, "R"))
         
         user = interaction.guild.get_member(ticket_creator_id)
         if user:
-            await interaction.followup.send(f"{user.mention}", embed=embed, view=view)
+            message = await interaction.followup.send(f"{user.mention}", embed=embed, view=view)
         else:
-            await interaction.followup.send(embed=embed, view=view)
+            message = await interaction.followup.send(embed=embed, view=view)
+
+        await self.bot.close_timers.add(
+            message.id, interaction.guild.id, interaction.channel.id,
+            ticket_creator_id, log_channel_id, reason, hours
+        )
 
     @app_commands.command(name="closeticket", description="Immediately close a ticket")
     @app_commands.default_permissions(administrator=True)
     async def close_ticket(self, interaction: discord.Interaction, reason: str):
-        ticket_data = await self.execute_query(
-            "SELECT user_id, log_channel_id FROM tickets WHERE channel_id = ? AND closed = 0",
+        ticket_data = await self.bot.database.fetchall(
+            OPEN_TICKET_BY_CHANNEL,
             (interaction.channel.id,)
         )
 
@@ -194,7 +180,8 @@ class TicketCommands(commands.Cog):
             return
 
         creator_id, log_channel_id = ticket_data[0]
-        
+        await interaction.response.send_message("Closing ticket...", ephemeral=True)
+
         await self.handle_ticket_closure(
             interaction.channel,
             interaction.user,
@@ -204,31 +191,252 @@ class TicketCommands(commands.Cog):
             force_close=True
         )
 
-        await interaction.response.send_message("Closing ticket...", ephemeral=True)
-        await interaction.channel.delete(reason=f"Ticket force closed by {interaction.user}")
+    @app_commands.command(name="db_stats", description="Show the database statements taking the most time")
+    @app_commands.describe(reset="Clear the collected timings afterwards")
+    @app_commands.default_permissions(administrator=True)
+    async def db_stats(self, interaction: discord.Interaction, reset: bool = False):
+        database = self.bot.database
+        profiler = database.profiler
+        writes = database.write_stats()
+
+        embed = discord.Embed(title="Database statistics", color=discord.Color.blue())
+        embed.description = (
+            f"Write batches: {writes['batches']} (avg {writes['avg_batch']:.1f} jobs, "
+            f"avg commit {writes['avg_commit_ms']:.1f}ms, {writes['queued']} queued)"
+        )
+        if not profiler.enabled:
+            embed.description += "\nPer-statement profiling is off; set `DB_PROFILE=1` to collect it."
+        else:
+            embed.set_footer(text=f"Since {datetime.datetime.fromtimestamp(profiler.started):%Y-%m-%d %H:%M} · "
+                                  f"slow means over {profiler.slow_seconds * 1000:g}ms")
+            for sql, stats in profiler.top(10):
+                embed.add_field(
+                    name=(f"{stats.seconds * 1000:.0f}ms total · {stats.calls} calls · "
+                          f"avg {stats.seconds * 1000 / stats.calls:.2f}ms · max {stats.max_seconds * 1000:.1f}ms · "
+                          f"{stats.rows} rows · {stats.slow} slow")[:256],
+                    value=f"```sql\n{sql[:1000]}\n```",
+                    inline=False
+                )
+            if reset:
+                profiler.reset()
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    async def option_autocomplete(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+        options = await self.bot.panel_cache.get_options(interaction.guild_id)
+        names = sorted({option['name'] for option in options if current.lower() in option['name'].lower()})
+        return [app_commands.Choice(name=name, value=name) for name in names][:25]
+
+    @app_commands.command(name="ticket_search", description="Search closed ticket transcripts")
+    @app_commands.describe(
+        query="Words to look for in the transcript",
+        user="Only tickets opened by this member",
+        option="Only tickets of this type",
+        since="Closed on or after this date (YYYY-MM-DD)",
+        until="Closed on or before this date (YYYY-MM-DD)"
+    )
+    @app_commands.autocomplete(option=option_autocomplete)
+    @app_commands.default_permissions(manage_messages=True)
+    async def ticket_search(self, interaction: discord.Interaction, query: str, user: discord.Member = None,
+                            option: str = None, since: str = None, until: str = None):
+        await interaction.response.defer(ephemeral=True)
+
+        for value in (since, until):
+            if value:
+                try:
+                    datetime.date.fromisoformat(value)
+                except ValueError:
+                    await interaction.followup.send(f"`{value}` is not a valid date, use YYYY-MM-DD.", ephemeral=True)
+                    return
+
+        view = SearchResults(self, interaction.guild_id, query, user.id if user else None, option, since, until)
+        await view.load_page()
+        if not view.rows:
+            await interaction.followup.send("No closed tickets match that search.", ephemeral=True)
+            return
+
+        await interaction.followup.send(embed=view.embed(), view=view, ephemeral=True)
+
+    @app_commands.command(name="ticket_archive_fetch", description="Fetch an archived ticket and its transcript")
+    @app_commands.describe(ticket_id="The ticket number, as shown by /ticket_search")
+    @app_commands.default_permissions(manage_messages=True)
+    async def ticket_archive_fetch(self, interaction: discord.Interaction, ticket_id: int):
+        await interaction.response.defer(ephemeral=True)
+
+        try:
+            ticket = await self.bot.archive.fetch(interaction.guild_id, ticket_id)
+        except (OSError, ValueError) as e:
+            await interaction.followup.send(f"Could not read archived ticket #{ticket_id}: {e}", ephemeral=True)
+            return
+        if ticket is None:
+            await interaction.followup.send(f"Ticket #{ticket_id} is not in this server's archive.", ephemeral=True)
+            return
+
+        embed = discord.Embed(
+            title=f"#{ticket['id']} {ticket['ticket_name'] or ''}"[:256],
+            description=f"**Reason:** {ticket['reason'] or 'None given'}"[:4096],
+            color=discord.Color.blue()
+        )
+        embed.add_field(name="Opened by", value=f"<@{ticket['user_id']}>")
+        embed.add_field(name="Type", value=ticket['option_name'] or "Unknown")
+        embed.add_field(name="Opened", value=ticket['created_at'] or "Unknown")
+        embed.add_field(name="Closed", value=ticket['closed_at'] or "Unknown")
+
+        transcript = ticket['transcript']
+        if transcript:
+            file = discord.File(io.BytesIO(transcript.encode("utf-8")), filename=f"transcript-{ticket['ticket_name'] or ticket['id']}.txt")
+            await interaction.followup.send(embed=embed, file=file, ephemeral=True)
+        else:
+            await interaction.followup.send(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="ticket_stats", description="Show ticket statistics for this server")
+    @app_commands.describe(days="How many days back to cover", chart="Attach a chart of tickets per day")
+    @app_commands.default_permissions(administrator=True)
+    async def ticket_stats(self, interaction: discord.Interaction,
+                           days: app_commands.Range[int, 1, 90] = 14, chart: bool = False):
+        stats = await guild_stats(self.bot.database, interaction.guild_id, days)
+        median = stats['median_close_seconds']
+
+        embed = discord.Embed(title=f"Tickets, last {days} days", color=discord.Color.blue())
+        embed.add_field(name="Opened", value=str(stats['opened']))
+        embed.add_field(name="Closed", value=str(stats['closed']))
+        embed.add_field(name="Open now", value=str(stats['backlog']))
+        embed.add_field(name="Median time to close", value=format_duration(median) if median is not None else "No closures")
+        if stats['per_option']:
+            embed.add_field(
+                name="By type (opened / closed)",
+                value="\n".join(f"{name or 'Unknown'}: {opened} / {closed}"
+                                 for name, opened, closed in stats['per_option'][:10])[:1024],
+                inline=False
+            )
+        if stats['per_closer']:
+            embed.add_field(
+                name="Closed by",
+                value="\n".join(f"<@{closer_id}>: {closed}" for closer_id, closed in stats['per_closer'][:10]),
+                inline=False
+            )
+
+        if not chart:
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        image = await asyncio.to_thread(render_chart, stats['per_day'])
+        embed.set_image(url="attachment://ticket-stats.png")
+        embed.set_footer(text="Blue: opened · Green: closed")
+        await interaction.response.send_message(
+            embed=embed, file=discord.File(io.BytesIO(image), filename="ticket-stats.png"), ephemeral=True
+        )
+
+    @app_commands.command(name="ticket_stats_rebuild", description="Recompute this server's ticket statistics")
+    @app_commands.default_permissions(administrator=True)
+    async def ticket_stats_rebuild(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+
+        # Archived tickets are gone from the table; keep the days they were counted in.
+        since = None
+        if config.ARCHIVE_AFTER_DAYS > 0:
+            today = datetime.datetime.now(datetime.timezone.utc).date()
+            since = (today - datetime.timedelta(days=config.ARCHIVE_AFTER_DAYS - 1)).isoformat()
+
+        async def rebuild(connection):
+            await rebuild_rollups(connection, interaction.guild_id, since)
+
+        await self.bot.database.transaction(rebuild)
+        await interaction.followup.send(
+            f"Ticket statistics rebuilt{f' from {since}' if since else ''}.", ephemeral=True
+        )
+
+class SearchResults(discord.ui.View):
+    PAGE_SIZE = 5
+
+    def __init__(self, cog, guild_id, query, user_id, option_name, since, until):
+        super().__init__(timeout=600)
+        self.cog = cog
+        self.guild_id = guild_id
+        self.query = query
+        self.filters = {'user_id': user_id, 'option_name': option_name, 'since': since, 'until': until}
+        # Keyset cursors for the start of each page we've visited
+        self.cursors = [None]
+        self.rows = []
+        self.has_next = False
+
+    async def load_page(self):
+        rows = await search_transcripts(
+            self.cog.bot.database,
+            self.guild_id,
+            self.query,
+            after=self.cursors[-1],
+            limit=self.PAGE_SIZE + 1,
+            **self.filters
+        )
+        self.has_next = len(rows) > self.PAGE_SIZE
+        self.rows = rows[:self.PAGE_SIZE]
+        self.previous_page.disabled = len(self.cursors) == 1
+        self.next_page.disabled = not self.has_next
+
+    def embed(self) -> discord.Embed:
+        embed = discord.Embed(
+            title=f"Ticket search: {self.query}"[:256],
+            color=discord.Color.blue()
+        )
+        for ticket_id, ticket_name, user_id, option_name, closed_at, snippet, _ in self.rows:
+            details = f"<@{user_id}> · {option_name or 'Unknown type'} · closed {closed_at}"
+            embed.add_field(
+                name=f"#{ticket_id} {ticket_name or ''}"[:256],
+                value=f"{details}\n{snippet}"[:1024],
+                inline=False
+            )
+        embed.set_footer(text=f"Page {len(self.cursors)}")
+        return embed
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, button_interaction: discord.Interaction, button: discord.ui.Button):
+        self.cursors.pop()
+        await self.load_page()
+        await button_interaction.response.edit_message(embed=self.embed(), view=self)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.primary)
+    async def next_page(self, button_interaction: discord.Interaction, button: discord.ui.Button):
+        last = self.rows[-1]
+        self.cursors.append((last[6], last[0]))
+        await self.load_page()
+        await button_interaction.response.edit_message(embed=self.embed(), view=self)
 
 class ConfirmClose(discord.ui.View):
-    def __init__(self, cog, creator_id, reason, log_channel_id, hours=None):
-        super().__init__(timeout=hours * 3600 if hours else None)
+    """
+    Persistent Confirm Close button. One instance is registered at startup
+    and serves every close request; the request itself is looked up by the
+    message the button is on.
+    """
+    def __init__(self, cog):
+        super().__init__(timeout=None)
         self.cog = cog
-        self.creator_id = creator_id
-        self.reason = reason
-        self.log_channel_id = log_channel_id
 
-    @discord.ui.button(label="Confirm Close", style=discord.ButtonStyle.primary)
+    @discord.ui.button(label="Confirm Close", style=discord.ButtonStyle.primary, custom_id="ticket_close_confirm")
     async def confirm(self, button_interaction: discord.Interaction, button: discord.ui.Button):
-        if button_interaction.user.id != self.creator_id:
+        timers = self.cog.bot.close_timers
+        request = await timers.get(button_interaction.message.id)
+        if not request:
+            await button_interaction.response.send_message("This close request is no longer active.", ephemeral=True)
+            return
+
+        message_id, _, _, creator_id, log_channel_id, reason, _ = request
+        if button_interaction.user.id != creator_id:
             await button_interaction.response.send_message("Only the ticket creator can close this ticket!", ephemeral=True)
             return
 
+        await button_interaction.response.defer()
+        if not await timers.resolve(message_id, CONFIRMED):
+            return
         await self.cog.handle_ticket_closure(
             button_interaction.channel,
             button_interaction.user,
-            self.reason,
-            self.creator_id,
-            self.log_channel_id
+            reason,
+            creator_id,
+            log_channel_id
         )
-        await button_interaction.channel.delete(reason="Ticket closed by confirmation.")
 
 async def setup(bot: commands.Bot):
-    await bot.add_cog(TicketCommands(bot))
\ No newline at end of file
+    cog = TicketCommands(bot)
+    await bot.add_cog(cog)
+    bot.add_view(ConfirmClose(cog))
\ No newline at end of file
@@ -0,0 +1,157 @@
+import asyncio
+from typing import Dict, List, Optional, Set
+import discord
+from . import config
+from .transcripts import TranscriptWriter, format_line
+from .background import spawn
+from .queries import CAPTURED_TRANSCRIPT, OPEN_TICKET_CHANNELS
+
+
+class TranscriptCapture:
+    """
+    Records messages in open ticket channels as they are posted, edited and
+    deleted, so closing a ticket only has to read back what is already stored.
+
+    Open ticket channels are held in memory; messages from any other channel
+    are rejected with a single set lookup. Rows are buffered and written in
+    batches. Channels that were open while the bot was offline remember the
+    last message they captured and fill the gap from channel history when
+    the ticket closes.
+    """
+
+    def __init__(self, bot, enabled: bool = config.TRANSCRIPT_CAPTURE):
+        self.bot = bot
+        self.enabled = enabled
+        self.open_channels: Set[int] = set()
+        self.gaps: Dict[int, Optional[int]] = {}
+        self._pending: List[tuple] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_lock = asyncio.Lock()
+
+    async def load(self):
+        """Read the open tickets once at startup."""
+        rows = await self.bot.database.fetchall(OPEN_TICKET_CHANNELS)
+
+        self.open_channels = {row[0] for row in rows}
+        # Anything could have been posted while we were offline.
+        self.gaps = {row[0]: row[1] for row in rows}
+
+    def track(self, channel_id: int):
+        self.open_channels.add(channel_id)
+
+    def untrack(self, channel_id: int):
+        self.open_channels.discard(channel_id)
+        self.gaps.pop(channel_id, None)
+
+    def is_ticket(self, channel_id: int) -> bool:
+        return channel_id in self.open_channels
+
+    def add_message(self, message: discord.Message):
+        if not self.enabled or message.channel.id not in self.open_channels:
+            return
+        self._pending.append((
+            message.id,
+            message.channel.id,
+            str(message.created_at),
+            str(message.author),
+            message.content
+        ))
+        if len(self._pending) >= config.TRANSCRIPT_CAPTURE_FLUSH_ROWS:
+            spawn(self.flush(), "transcript capture flush")
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                config.TRANSCRIPT_CAPTURE_FLUSH_SECONDS,
+                lambda: spawn(self.flush(), "transcript capture flush")
+            )
+
+    async def edit_message(self, payload: discord.RawMessageUpdateEvent):
+        if not self.enabled or payload.channel_id not in self.open_channels:
+            return
+        if 'content' not in payload.data:
+            return
+        await self.flush()
+        await self.bot.database.write(
+            "UPDATE transcript_messages SET content = ? WHERE message_id = ?",
+            (payload.data['content'], payload.message_id)
+        )
+
+    async def delete_messages(self, channel_id: int, message_ids):
+        if not self.enabled or channel_id not in self.open_channels:
+            return
+        await self.flush()
+        await self.bot.database.write_many(
+            "DELETE FROM transcript_messages WHERE message_id = ?",
+            [(message_id,) for message_id in message_ids]
+        )
+
+    async def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            rows, self._pending = self._pending, []
+            await self.bot.database.write_many(
+                """INSERT OR IGNORE INTO transcript_messages
+                   (message_id, channel_id, created_at, author, content)
+                   VALUES (?, ?, ?, ?, ?)""",
+                rows
+            )
+
+    async def fill_gap(self, channel: discord.TextChannel):
+        """Copy whatever was posted after the last captured message."""
+        after = self.gaps.pop(channel.id, None)
+        rows = []
+        async for message in channel.history(
+            limit=None,
+            oldest_first=True,
+            after=discord.Object(after) if after else None
+        ):
+            rows.append((
+                message.id,
+                channel.id,
+                str(message.created_at),
+                str(message.author),
+                message.content
+            ))
+            if len(rows) >= config.TRANSCRIPT_CAPTURE_FLUSH_ROWS:
+                await self._write_crawled(rows)
+                rows = []
+        if rows:
+            await self._write_crawled(rows)
+
+    async def _write_crawled(self, rows: List[tuple]):
+        # History is authoritative, so it overwrites anything captured live.
+        await self.bot.database.write_many(
+            """INSERT OR REPLACE INTO transcript_messages
+               (message_id, channel_id, created_at, author, content)
+               VALUES (?, ?, ?, ?, ?)""",
+            rows
+        )
+
+    async def write_transcript(self, channel: discord.TextChannel, writer: TranscriptWriter) -> bool:
+        """
+        Stream the stored transcript for ``channel`` into ``writer``.
+        Returns False when the channel isn't captured and the caller should
+        crawl history itself.
+        """
+        if not self.enabled or channel.id not in self.open_channels:
+            return False
+
+        await self.flush()
+        if channel.id in self.gaps:
+            await self.fill_gap(channel)
+
+        async for row in self.bot.database.iterate(CAPTURED_TRANSCRIPT, (channel.id,)):
+            writer.write_line(format_line(*row))
+        return True
+
+    async def discard(self, channel_id: int):
+        """Drop a closed ticket's captured messages."""
+        self.untrack(channel_id)
+        self._pending = [row for row in self._pending if row[1] != channel_id]
+        await self.bot.database.write(
+            "DELETE FROM transcript_messages WHERE channel_id = ?",
+            (channel_id,)
+        )
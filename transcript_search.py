@@ -0,0 +1,172 @@
+import asyncio
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+from . import config
+from .transcripts import transcript_lines
+
+SNIPPET_TOKENS = 16
+
+# transcript_fts is contentless: it holds only the index, in chunks of whole
+# lines. A chunk's rowid is its ticket id shifted left by CHUNK_BITS plus its
+# position in the transcript, and its ``guild`` column holds the ticket's
+# guild id as a single token, so a search only matches that guild's chunks.
+CHUNK_BITS = 16
+INDEX_CHUNK_CHARS = 16 * 1024
+
+_WORD = re.compile(r"\w+")
+
+
+def fts_terms(text: str) -> List[str]:
+    """Quote every term so user input can't be parsed as FTS5 syntax."""
+    return ['"' + term.replace('"', '""') + '"' for term in text.split()]
+
+
+def index_chunks(lines: Iterable[str], size: int = INDEX_CHUNK_CHARS) -> Iterator[str]:
+    """
+    Group lines into chunks of about ``size`` characters, never splitting a
+    line. The same lines always give the same chunks, which removing a
+    ticket from the contentless index relies on.
+    """
+    chunk: List[str] = []
+    length = 0
+    for line in lines:
+        if chunk and length + len(line) > size:
+            yield "\n".join(chunk)
+            chunk, length = [], 0
+        chunk.append(line)
+        length += len(line) + 1
+    if chunk:
+        yield "\n".join(chunk)
+
+
+async def index_transcript(connection, ticket_id: int, guild_id: Optional[int], lines: Iterable[str]):
+    """Add a closed ticket's transcript to the search index, one chunk at a time."""
+    for number, chunk in enumerate(index_chunks(lines)):
+        await connection.execute(
+            "INSERT INTO transcript_fts (rowid, guild, content) VALUES (?, ?, ?)",
+            ((ticket_id << CHUNK_BITS) + number, str(guild_id or 0), chunk)
+        )
+
+
+async def unindex_transcript(connection, ticket_id: int, guild_id: Optional[int], text: str):
+    """
+    Remove a ticket from the search index. A contentless table needs the
+    indexed text back, and deleting a chunk that was never indexed would
+    corrupt it, so only chunks present in the index are removed.
+    """
+    first = ticket_id << CHUNK_BITS
+    cursor = await connection.execute(
+        "SELECT rowid FROM transcript_fts WHERE rowid BETWEEN ? AND ?",
+        (first, first + (1 << CHUNK_BITS) - 1)
+    )
+    present = {rowid for (rowid,) in await cursor.fetchall()}
+    for number, chunk in enumerate(index_chunks(text.split("\n"))):
+        if first + number in present:
+            await connection.execute(
+                "INSERT INTO transcript_fts (transcript_fts, rowid, guild, content) VALUES ('delete', ?, ?, ?)",
+                (first + number, str(guild_id or 0), chunk)
+            )
+
+
+def find_snippet(legacy: Optional[str], codec: Optional[str], data: Optional[bytes], terms: List[str],
+                 tokens: int = SNIPPET_TOKENS) -> str:
+    """
+    The first transcript line containing a search term, cut to about
+    ``tokens`` words around it with the term in bold. Decompresses only as
+    far as that line.
+    """
+    try:
+        lines = transcript_lines(legacy, codec, data)
+    except ValueError:
+        return ""
+    words = [word.lower() for term in terms for word in _WORD.findall(term)]
+    for line in lines:
+        tokens_in_line = line.split()
+        for position, token in enumerate(tokens_in_line):
+            if any(word in token.lower() for word in words):
+                start = max(0, position - tokens // 2)
+                end = min(len(tokens_in_line), start + tokens)
+                shown = tokens_in_line[start:end]
+                shown[position - start] = f"**{token}**"
+                return ("…" if start else "") + " ".join(shown) + ("…" if end < len(tokens_in_line) else "")
+    return ""
+
+
+async def search_transcripts(
+    database,
+    guild_id: int,
+    query: str,
+    user_id: Optional[int] = None,
+    option_name: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    after: Optional[Tuple[float, int]] = None,
+    limit: int = 5,
+    candidates: int = config.SEARCH_CANDIDATES
+) -> List[tuple]:
+    """
+    Closed tickets whose transcript matches ``query``, best bm25 first.
+
+    Every term has to appear somewhere in the transcript, not necessarily
+    in the same chunk; a ticket's rank is the sum of its best chunk rank
+    for each term. Each term only scores the guild's chunks and keeps the
+    best SEARCH_CANDIDATES of them, which bounds the work per page however
+    large the index is. Rows are ``(ticket_id, ticket_name, user_id,
+    option_name, closed_at, snippet, rank)``. Pass the ``(rank, ticket_id)``
+    of the last row as ``after`` to fetch the next page; dates are
+    ``YYYY-MM-DD`` and ``until`` is inclusive.
+    """
+    terms = fts_terms(query)
+    if not terms:
+        return []
+
+    matches = [
+        f"""m{index} AS (
+                SELECT ticket_id, MIN(rank) AS rank FROM (
+                    SELECT rowid >> {CHUNK_BITS} AS ticket_id, rank
+                    FROM transcript_fts WHERE transcript_fts MATCH ?
+                    ORDER BY rank LIMIT {int(candidates)}
+                )
+                GROUP BY 1
+            )"""
+        for index in range(len(terms))
+    ]
+    joins = " ".join(f"JOIN m{index} ON m{index}.ticket_id = t.id" for index in range(len(terms)))
+    rank = " + ".join(f"m{index}.rank" for index in range(len(terms)))
+
+    conditions = ["t.guild_id = ?"]
+    guild = fts_terms(str(guild_id or 0))[0]
+    parameters: list = [f"guild : {guild} AND content : {term}" for term in terms] + [guild_id]
+    if user_id is not None:
+        conditions.append("t.user_id = ?")
+        parameters.append(user_id)
+    if option_name:
+        conditions.append("t.option_name = ?")
+        parameters.append(option_name)
+    if since:
+        conditions.append("t.closed_at >= ?")
+        parameters.append(since)
+    if until:
+        conditions.append("t.closed_at < date(?, '+1 day')")
+        parameters.append(until)
+    if after:
+        conditions.append(f"(({rank}) > ? OR (({rank}) = ? AND t.id > ?))")
+        parameters.extend((after[0], after[0], after[1]))
+    parameters.append(limit)
+
+    rows = await database.fetchall(
+        f"""WITH {', '.join(matches)}
+            SELECT t.id, t.ticket_name, t.user_id, t.option_name, t.closed_at,
+                   t.transcript, b.codec, b.data, {rank}
+            FROM tickets t
+            {joins}
+            LEFT JOIN transcript_blobs b ON b.hash = t.transcript_hash
+            WHERE {' AND '.join(conditions)}
+            ORDER BY {rank}, t.id
+            LIMIT ?""",
+        tuple(parameters)
+    )
+    return [
+        row[:5] + (await asyncio.to_thread(find_snippet, row[5], row[6], row[7], terms), row[8])
+        for row in rows
+    ]
@@ -0,0 +1,235 @@
+import asyncio
+import hashlib
+import io
+import tempfile
+import threading
+import zlib
+from typing import Iterable, Iterator, Optional, Tuple
+import discord
+from . import config
+
+CHUNK_SIZE = 64 * 1024
+TRANSCRIPT_CODEC = "zlib"
+
+
+def format_line(created_at, author, content) -> str:
+    return f"[{created_at}] {author}: {content}"
+
+
+def format_message(message: discord.Message) -> str:
+    return format_line(message.created_at, message.author, message.content)
+
+
+def split_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """The ``\\n``-separated lines of a transcript streamed as byte chunks."""
+    pending = b""
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8")
+    yield pending.decode("utf-8")
+
+
+class Spool:
+    """
+    Append-only byte buffer that stays in memory up to ``max_size`` and then
+    spills to a temporary file. Any number of readers can stream it at once.
+    """
+
+    def __init__(self, max_size: int):
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_size)
+        # Uploads read from executor threads; seek+read pairs must not interleave.
+        self._lock = threading.Lock()
+        self.size = 0
+
+    def write(self, data: bytes):
+        with self._lock:
+            self._file.seek(self.size)
+            self._file.write(data)
+        self.size += len(data)
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(min(size, self.size - offset))
+
+    def chunks(self, size: int = CHUNK_SIZE):
+        offset = 0
+        while offset < self.size:
+            chunk = self.read_at(offset, size)
+            offset += len(chunk)
+            yield chunk
+
+    def reader(self) -> "SpoolReader":
+        return SpoolReader(self)
+
+    def close(self):
+        self._file.close()
+
+
+class SpoolReader(io.RawIOBase):
+    """Independent read cursor over a Spool, suitable for ``discord.File``."""
+
+    def __init__(self, spool: Spool):
+        super().__init__()
+        self._spool = spool
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._spool.size
+        self._pos = max(0, offset)
+        return self._pos
+
+    def readinto(self, buffer):
+        if self._pos >= self._spool.size:
+            return 0
+        data = self._spool.read_at(self._pos, len(buffer))
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+class TranscriptWriter:
+    """
+    Streams a ticket transcript into a Spool as messages are formatted, so
+    memory stays flat however long the ticket is. The encoded upload (plain
+    or gzip) is produced once and shared by every ``file()`` it hands out.
+    """
+
+    def __init__(self, compress: bool = config.TRANSCRIPT_GZIP, spool_size: int = config.TRANSCRIPT_SPOOL_BYTES):
+        self.compress = compress
+        self.spool_size = spool_size
+        self.text = Spool(spool_size)
+        self.line_count = 0
+        self._upload = None
+        self._encoding = asyncio.Lock()
+
+    def write_line(self, line: str):
+        if self.line_count:
+            self.text.write(b"\n")
+        self.text.write(line.encode("utf-8"))
+        self.line_count += 1
+
+    async def write_history(self, channel: discord.TextChannel, **kwargs):
+        async for message in channel.history(limit=None, oldest_first=True, **kwargs):
+            self.write_line(format_message(message))
+
+    def lines(self) -> Iterator[str]:
+        """The transcript's lines, read from the spool a chunk at a time."""
+        return split_lines(self.text.chunks())
+
+    def _gzip(self) -> Spool:
+        upload = Spool(self.spool_size)
+        # wbits=31 writes a gzip container.
+        compressor = zlib.compressobj(wbits=31)
+        for chunk in self.text.chunks():
+            upload.write(compressor.compress(chunk))
+        upload.write(compressor.flush())
+        return upload
+
+    async def _encoded(self) -> Spool:
+        if not self.compress:
+            return self.text
+        # Concurrent deliveries wait for the one encode instead of each starting their own.
+        async with self._encoding:
+            if self._upload is None:
+                self._upload = await asyncio.to_thread(self._gzip)
+        return self._upload
+
+    async def file(self, name: str) -> discord.File:
+        """A fresh ``discord.File`` over the shared encoded transcript, gzipped off the event loop."""
+        filename = f"transcript-{name}.txt.gz" if self.compress else f"transcript-{name}.txt"
+        return discord.File(fp=(await self._encoded()).reader(), filename=filename)
+
+    def close(self):
+        self.text.close()
+        if self._upload is not None:
+            self._upload.close()
+
+
+def _compress(chunks) -> Tuple[str, int, bytes]:
+    hasher = hashlib.sha256()
+    compressor = zlib.compressobj(config.TRANSCRIPT_COMPRESSION_LEVEL)
+    raw_size = 0
+    parts = []
+    for chunk in chunks:
+        hasher.update(chunk)
+        raw_size += len(chunk)
+        parts.append(compressor.compress(chunk))
+    parts.append(compressor.flush())
+    return hasher.hexdigest(), raw_size, b"".join(parts)
+
+
+def compress_transcript(text: str) -> Tuple[str, int, bytes]:
+    """Returns ``(sha256, raw_size, zlib_data)`` for a transcript string."""
+    return _compress([text.encode("utf-8")])
+
+
+async def save_blob(connection, digest: str, raw_size: int, data: bytes):
+    await connection.execute(
+        """INSERT OR IGNORE INTO transcript_blobs (hash, codec, raw_size, stored_size, data)
+           VALUES (?, ?, ?, ?, ?)""",
+        (digest, TRANSCRIPT_CODEC, raw_size, len(data), data)
+    )
+
+
+async def compress_writer(writer: TranscriptWriter) -> Tuple[str, int, bytes]:
+    """
+    Compress a finished transcript off the event loop. Returns
+    ``(sha256, raw_size, zlib_data)`` for ``save_blob``; identical
+    transcripts share one blob.
+    """
+    return await asyncio.to_thread(_compress, writer.text.chunks())
+
+
+def _decompress(codec: str, data: bytes) -> str:
+    if codec != TRANSCRIPT_CODEC:
+        raise ValueError(f"Unknown transcript codec: {codec}")
+    return zlib.decompress(data).decode("utf-8")
+
+
+def transcript_lines(legacy: Optional[str], codec: Optional[str], data: Optional[bytes]) -> Iterator[str]:
+    """Like ``decode_transcript`` but line by line, decompressing only as far as it is read. Blocking."""
+    if data is None:
+        return iter(legacy.split("\n") if legacy is not None else ())
+    if codec != TRANSCRIPT_CODEC:
+        raise ValueError(f"Unknown transcript codec: {codec}")
+    decompressor = zlib.decompressobj()
+    return split_lines(
+        decompressor.decompress(data[offset:offset + CHUNK_SIZE]) for offset in range(0, len(data), CHUNK_SIZE)
+    )
+
+
+async def decode_transcript(legacy: Optional[str], codec: Optional[str], data: Optional[bytes]) -> Optional[str]:
+    """Turn a ``(tickets.transcript, blob codec, blob data)`` row into text."""
+    if data is None:
+        # Not migrated out of the row yet.
+        return legacy
+    return await asyncio.to_thread(_decompress, codec, data)
+
+
+async def load_transcript(database, ticket_id: int) -> Optional[str]:
+    """Read and decompress a ticket's transcript, or None if it has none."""
+    row = await database.fetchone(
+        """SELECT t.transcript, b.codec, b.data
+           FROM tickets t
+           LEFT JOIN transcript_blobs b ON b.hash = t.transcript_hash
+           WHERE t.id = ?""",
+        (ticket_id,)
+    )
+    if not row:
+        return None
+    return await decode_transcript(*row)